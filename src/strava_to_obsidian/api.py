@@ -1,5 +1,6 @@
 """Strava API client."""
 
+import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime
@@ -9,6 +10,8 @@ import requests
 
 from strava_to_obsidian.auth import ensure_valid_token
 from strava_to_obsidian.config import Config
+from strava_to_obsidian.streams import STREAM_TYPES
+from strava_to_obsidian.timing import timings
 
 STRAVA_API_BASE = "https://www.strava.com/api/v3"
 
@@ -48,6 +51,8 @@ class StravaClient:
     def __init__(self, config: Config):
         self.config = config
         self.rate_limit = RateLimitInfo()
+        self.requests_made = 0
+        self.stop: Optional[threading.Event] = None  # cuts rate limit waits short when set
         self._session = requests.Session()
 
     def _get_headers(self) -> dict[str, str]:
@@ -85,13 +90,15 @@ class StravaClient:
         url = f"{STRAVA_API_BASE}{endpoint}"
 
         try:
-            response = self._session.request(
-                method,
-                url,
-                headers=self._get_headers(),
-                params=params,
-                timeout=30,
-            )
+            self.requests_made += 1
+            with timings.phase("api.request"):
+                response = self._session.request(
+                    method,
+                    url,
+                    headers=self._get_headers(),
+                    params=params,
+                    timeout=30,
+                )
             self._update_rate_limits(response)
 
             if response.status_code == 429:
@@ -99,7 +106,11 @@ class StravaClient:
                 if retry_count < 3:
                     wait_time = 60 * (2**retry_count)  # Exponential backoff
                     print(f"Rate limited. Waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
+                    with timings.phase("api.rate_limit_wait"):
+                        if self.stop is None:
+                            time.sleep(wait_time)
+                        elif self.stop.wait(wait_time):
+                            raise StravaAPIError("Stopped while rate limited.", 429)
                     return self._request(method, endpoint, params, retry_count + 1)
                 raise StravaAPIError("Rate limit exceeded. Try again later.", 429)
 
@@ -117,7 +128,8 @@ class StravaClient:
 
         except requests.Timeout:
             if retry_count < 3:
-                time.sleep(5)
+                with timings.phase("api.retry_wait"):
+                    time.sleep(5)
                 return self._request(method, endpoint, params, retry_count + 1)
             raise StravaAPIError("Request timed out.")
 
@@ -171,6 +183,42 @@ class StravaClient:
         """Get detailed activity information."""
         return self._request("GET", f"/activities/{activity_id}")
 
+    def get_activity_streams(
+        self, activity_id: int, keys: tuple[str, ...] = STREAM_TYPES
+    ) -> dict[str, Any]:
+        """
+        Get stream data for an activity.
+
+        Args:
+            activity_id: Strava activity ID
+            keys: Stream types to request
+
+        Returns:
+            Streams keyed by type, each with a "data" list
+        """
+        return self._request(
+            "GET",
+            f"/activities/{activity_id}/streams",
+            {"keys": ",".join(keys), "key_by_type": "true"},
+        )
+
+    def get_activity_photos(self, activity_id: int, size: int = 2048) -> list[dict[str, Any]]:
+        """
+        Get all photos of an activity.
+
+        Args:
+            activity_id: Strava activity ID
+            size: Requested size of the longest edge, in pixels
+
+        Returns:
+            Photo objects, each with ``unique_id`` and ``urls`` keyed by size
+        """
+        return self._request(
+            "GET",
+            f"/activities/{activity_id}/photos",
+            {"size": size, "photo_sources": "true"},
+        )
+
     def get_rate_limit_status(self) -> str:
         """Get human-readable rate limit status."""
         return (
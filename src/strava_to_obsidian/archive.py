@@ -0,0 +1,345 @@
+"""Backfill from a Strava account export ("Download your data") archive.
+
+The archive is read in place: ``activities.csv`` is streamed row by row, and
+each activity's track file and photos are read from the ZIP only when that
+activity is exported, so nothing is extracted to disk and no API requests are
+made.
+"""
+
+import csv
+import gzip
+import io
+import math
+import re
+import zipfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import IO, Any, Callable, Optional
+from xml.etree import ElementTree
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity, ActivityPhoto
+from strava_to_obsidian.polyline import encode_polyline, simplify
+from strava_to_obsidian.spatial import distance_m
+from strava_to_obsidian.streams import ActivityStreams
+
+ACTIVITIES_CSV = "activities.csv"
+TRACK_SUFFIXES = (".gpx", ".tcx")  # FIT files are binary and aren't read
+PHOTO_SUFFIXES = (".jpg", ".jpeg")
+SUMMARY_TOLERANCE = 10.0  # meters; how closely the summary polyline follows the track
+
+# Trackpoint children (GPX and TCX names) -> stream type
+_POINT_FIELDS = {
+    "ele": "altitude",
+    "AltitudeMeters": "altitude",
+    "hr": "heartrate",
+    "cad": "cadence",
+    "Cadence": "cadence",
+    "power": "watts",
+    "Watts": "watts",
+    "DistanceMeters": "distance",
+}
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _number(row: dict[str, str], column: str) -> Optional[float]:
+    """A numeric CSV field, or None if it's empty or not a number."""
+    try:
+        return float(row.get(column, ""))
+    except ValueError:
+        return None
+
+
+def _timestamp(text: str) -> datetime:
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        from dateutil.parser import isoparse
+
+        return isoparse(text)
+
+
+def sport_type_from_label(label: str) -> str:
+    """Turn an archive's activity type ("Virtual Ride") into a sport type ("VirtualRide")."""
+    return re.sub(r"[\s-]", "", label) or "Workout"
+
+
+def activity_from_row(row: dict[str, str], distance_scale: float = 1.0) -> Activity:
+    """
+    Create an Activity from a row of ``activities.csv``.
+
+    Args:
+        row: The row, keyed by column name
+        distance_scale: Multiplier that turns the Distance column into meters
+
+    Raises:
+        ValueError: If the row has no usable activity ID
+    """
+    from dateutil.parser import parse as parse_date
+
+    activity_id = int(row.get("Activity ID", ""))
+    date_str = row.get("Activity Date", "")
+    max_heartrate = _number(row, "Max Heart Rate")
+    return Activity(
+        id=activity_id,
+        name=row.get("Activity Name") or "Untitled",
+        sport_type=sport_type_from_label(row.get("Activity Type", "")),
+        start_date_local=parse_date(date_str) if date_str else datetime.now(),
+        description=row.get("Activity Description") or None,
+        elapsed_time=int(_number(row, "Elapsed Time") or 0),
+        moving_time=int(_number(row, "Moving Time") or _number(row, "Elapsed Time") or 0),
+        distance=(_number(row, "Distance") or 0.0) * distance_scale,
+        average_speed=_number(row, "Average Speed") or 0.0,
+        max_speed=_number(row, "Max Speed"),
+        total_elevation_gain=_number(row, "Elevation Gain") or 0.0,
+        average_heartrate=_number(row, "Average Heart Rate"),
+        max_heartrate=round(max_heartrate) if max_heartrate else None,
+        calories=_number(row, "Calories"),
+        raw_data=dict(row),
+    )
+
+
+def parse_track(stream: IO[bytes]) -> Optional[ActivityStreams]:
+    """
+    Read a GPX or TCX file into streams, one trackpoint at a time.
+
+    TCX trackpoints carry the device's cumulative distance; GPX has none, so
+    it is summed from the coordinates. Points missing it keep the last value.
+
+    Returns:
+        Streams with whichever channels the file has, or None if it has no points
+    """
+    data: dict[str, list[Any]] = {
+        "latlng": [], "time": [], "distance": [], "altitude": [], "heartrate": [],
+        "cadence": [], "watts": [],
+    }
+    start: Optional[datetime] = None
+    for _, elem in ElementTree.iterparse(stream):
+        tag = _local_name(elem.tag)
+        if tag not in ("trkpt", "Trackpoint"):
+            continue
+
+        point: dict[str, Any] = {}
+        if tag == "trkpt":
+            point["lat"], point["lng"] = elem.get("lat"), elem.get("lon")
+        for child in elem.iter():
+            name = _local_name(child.tag)
+            text = (child.text or "").strip()
+            if name in ("time", "Time") and text:
+                point["time"] = _timestamp(text)
+            elif name == "LatitudeDegrees":
+                point["lat"] = text
+            elif name == "LongitudeDegrees":
+                point["lng"] = text
+            elif name == "HeartRateBpm":
+                value = child.find("{*}Value")
+                if value is not None and value.text:
+                    point["heartrate"] = float(value.text)
+            elif name in _POINT_FIELDS and text:
+                point[_POINT_FIELDS[name]] = float(text)
+        elem.clear()
+
+        when = point.get("time")
+        if when is not None and start is None:
+            start = when
+        latlng = None
+        if point.get("lat") and point.get("lng"):
+            latlng = [float(point["lat"]), float(point["lng"])]
+        data["latlng"].append(latlng)
+        data["time"].append((when - start).total_seconds() if when and start else None)
+        for key in ("distance", "altitude", "heartrate", "cadence", "watts"):
+            data[key].append(point.get(key))
+
+    if not data["time"]:
+        return None
+    data["distance"] = _cumulative_distance(data["distance"], data["latlng"])
+    return ActivityStreams.from_api_response(
+        {key: values for key, values in data.items() if any(v is not None for v in values)}
+    )
+
+
+def _cumulative_distance(
+    recorded: list[Optional[float]], latlng: list[Optional[list[float]]]
+) -> list[Optional[float]]:
+    """Recorded distances with gaps filled, or the distance along the coordinates."""
+    distances: list[Optional[float]] = []
+    if any(d is not None for d in recorded):
+        last = 0.0
+        for value in recorded:
+            last = value if value is not None else last
+            distances.append(last)
+        return distances
+    if not any(latlng):
+        return recorded
+    total = 0.0
+    previous = None
+    for point in latlng:
+        if point is not None:
+            if previous is not None:
+                total += distance_m(*previous, *point)
+            previous = point
+        distances.append(total)
+    return distances
+
+
+def summary_polyline(points: list[tuple[float, float]]) -> Optional[str]:
+    """A simplified polyline of a track, like the API's ``map.summary_polyline``."""
+    if len(points) < 2:
+        return None
+    lats = [lat for lat, _ in points]
+    lngs = [lng for _, lng in points]
+    scale = math.cos(math.radians(lats[0])) * 111_320
+    xs = [lng * scale for lng in lngs]
+    ys = [lat * 110_540 for lat in lats]
+    keep = simplify(xs, ys, SUMMARY_TOLERANCE)
+    return encode_polyline([lats[i] for i in keep], [lngs[i] for i in keep])
+
+
+@dataclass
+class ImportResult:
+    """Counts from one archive import."""
+
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+class StravaArchive:
+    """
+    A Strava account export ZIP, read without extracting it.
+
+    Times in the archive are UTC, so notes imported from it are dated in UTC
+    rather than the activity's local time.
+    """
+
+    def __init__(self, path: Path):
+        self.zip = zipfile.ZipFile(path)
+        names = [
+            name for name in self.zip.namelist()
+            if PurePosixPath(name).name == ACTIVITIES_CSV
+        ]
+        if not names:
+            self.zip.close()
+            raise ValueError(f"{path} has no {ACTIVITIES_CSV}; is it a Strava account export?")
+        self.csv_name = min(names, key=len)
+        self.prefix = self.csv_name[: -len(ACTIVITIES_CSV)]  # archives may nest one folder deep
+
+    def __enter__(self) -> "StravaArchive":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def activities(self) -> Iterator[Optional[Activity]]:
+        """
+        Activities from ``activities.csv``, without tracks or photos.
+
+        Rows that can't be read (no activity ID, say) are yielded as None so
+        callers can count them.
+        """
+        with self.zip.open(self.csv_name) as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+            header = next(reader, [])
+            # Newer exports repeat some columns: the first Distance is in km and a
+            # later one in meters. Later columns win, so a lone Distance is km.
+            distance_scale = 1000.0 if header.count("Distance") == 1 else 1.0
+            for values in reader:
+                try:
+                    yield activity_from_row(dict(zip(header, values)), distance_scale)
+                except ValueError:
+                    yield None
+
+    def _open(self, filename: str) -> Optional[IO[bytes]]:
+        try:
+            raw = self.zip.open(self.prefix + filename)
+        except KeyError:
+            return None
+        return gzip.open(raw) if filename.endswith(".gz") else raw
+
+    def read_track(self, activity: Activity) -> Optional[ActivityStreams]:
+        """Streams from an activity's GPX or TCX file, if it has one that's readable."""
+        filename = activity.raw_data.get("Filename", "")
+        if not filename.removesuffix(".gz").lower().endswith(TRACK_SUFFIXES):
+            return None
+        stream = self._open(filename)
+        if stream is None:
+            return None
+        try:
+            with stream:
+                return parse_track(stream)
+        except (ElementTree.ParseError, OSError, EOFError, ValueError):
+            return None
+
+    def read_photos(self, activity: Activity, exporter: ActivityExporter) -> list[ActivityPhoto]:
+        """Add an activity's photos to the exporter's photo store."""
+        photos = []
+        for name in filter(None, activity.raw_data.get("Media", "").split("|")):
+            path = PurePosixPath(name)
+            if path.suffix.lower() not in PHOTO_SUFFIXES:
+                continue  # videos
+            try:
+                content = self.zip.read(self.prefix + name)
+            except KeyError:
+                continue
+            exporter.photos.add_bytes(path.stem, content, path.suffix.lower())
+            photos.append(ActivityPhoto(path.stem, url=""))
+        return photos
+
+
+def import_archive(
+    archive: StravaArchive,
+    exporter: ActivityExporter,
+    force: bool = False,
+    media: bool = True,
+    progress: Optional[Callable[[Activity, str], None]] = None,
+) -> ImportResult:
+    """
+    Export every activity in an archive through the exporter.
+
+    Tracks and photos are only read for activities that are actually written,
+    so re-running an import over an existing vault is cheap.
+
+    Args:
+        archive: The archive to import
+        exporter: Exporter for the output directory (its hooks run as usual)
+        force: Overwrite notes that already exist
+        media: Import photos
+        progress: Called with each activity and "exported" or "skipped"
+    """
+    result = ImportResult()
+    for activity in archive.activities():
+        if activity is None:
+            result.failed += 1
+            continue
+        if not force and exporter.activity_exists(activity):
+            result.skipped += 1
+            if progress:
+                progress(activity, "skipped")
+            continue
+
+        activity.streams = archive.read_track(activity)
+        if activity.streams is not None:
+            # Gaps in the track are stored as 0,0
+            points = [p for p in activity.streams.latlng() if p != (0.0, 0.0)]
+            if points:
+                activity.start_latlng = list(points[0])
+                activity.end_latlng = list(points[-1])
+                activity.summary_polyline = summary_polyline(points)
+        if media:
+            activity.photos = archive.read_photos(activity, exporter)
+
+        if exporter.export_activity(activity, force=force, download_photo=media):
+            result.imported += 1
+            if progress:
+                progress(activity, "exported")
+        else:
+            result.skipped += 1
+    return result
@@ -1,17 +1,94 @@
 """Command-line interface for Strava to Obsidian exporter."""
 
+import cProfile
+import io
+import pstats
+import secrets
+import threading
+import time
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 import click
+import requests
 
 from strava_to_obsidian import __version__
 from strava_to_obsidian.api import StravaAPIError, StravaClient
+from strava_to_obsidian.archive import StravaArchive, import_archive
 from strava_to_obsidian.auth import authenticate, ensure_valid_token
 from strava_to_obsidian.config import Config
+from strava_to_obsidian.daemon import (
+    CLOCK_FILENAME,
+    ActivityClock,
+    PollScheduler,
+    poll_until_stopped,
+    stop_on_signals,
+)
+from strava_to_obsidian.database import (
+    ACTIVITY_COLUMNS,
+    DB_FILENAME,
+    LAP_COLUMNS,
+    STATS_GROUPS,
+    ActivityDatabase,
+    DatabaseHook,
+)
+from strava_to_obsidian.duplicates import DUPLICATE_POLICIES
 from strava_to_obsidian.exporter import ActivityExporter
-from strava_to_obsidian.models import Activity
+from strava_to_obsidian.heatmap import (
+    HEATMAP_FILENAME,
+    HEATMAP_IMAGE,
+    HeatmapGrid,
+    HeatmapHook,
+    write_heatmap,
+)
+from strava_to_obsidian.layout import DATA_DIRNAME, LAYOUTS, get_layout
+from strava_to_obsidian.maps import MAP_FORMATS
+from strava_to_obsidian.media import MediaOptions
+from strava_to_obsidian.migrate import migrate_layout
+from strava_to_obsidian.models import Activity, ActivityPhoto, format_duration, get_sport_icon
+from strava_to_obsidian.records import RECORDS_NOTE, RecordsHook
+from strava_to_obsidian.rollups import ROLLUPS_DIRNAME, RollupHook
+from strava_to_obsidian.routes import ROUTES_DIRNAME, ROUTES_FILENAME, RouteHook, RouteStore
+from strava_to_obsidian.runmetrics import METRICS_FORMATS, RunMetrics, write_metrics
+from strava_to_obsidian.scanner import rebuild_index
+from strava_to_obsidian.search import SEARCH_FILENAME, SearchHook, SearchIndex
+from strava_to_obsidian.spatial import (
+    SPATIAL_FILENAME,
+    PlaceFinder,
+    SpatialHook,
+    SpatialIndex,
+    load_places,
+)
+from strava_to_obsidian.stats import DISTANCE_BINS_KM, Totals, compute_stats
+from strava_to_obsidian.streams import ActivityStreams
+from strava_to_obsidian.tables import (
+    ACTIVITY_TYPES,
+    LAP_TYPES,
+    TABLE_FORMATS,
+    activity_rows_from_notes,
+    rows_from_database,
+    write_table,
+)
+from strava_to_obsidian.timing import PROFILE_FILENAME, timings
+from strava_to_obsidian.tracks import TRACK_FORMATS
+from strava_to_obsidian.training import HeartRateProfile, TrainingLoadHook
+from strava_to_obsidian.webhook import (
+    ASPECT_TYPES,
+    QUEUE_FILENAME,
+    WEBHOOK_PORT,
+    EventQueue,
+    EventSimulator,
+    QueuedWork,
+    WebhookEvent,
+    create_subscription,
+    make_server,
+    process_events,
+)
 
 
 @click.group()
@@ -88,6 +165,95 @@ def auth(ctx: click.Context, manual: bool) -> None:
     is_flag=True,
     help="Skip downloading photos",
 )
+@click.option(
+    "--layout",
+    type=click.Choice(sorted(LAYOUTS)),
+    help="Vault layout for a new output directory (existing ones keep theirs; see 'migrate')",
+)
+@click.option(
+    "--streams",
+    is_flag=True,
+    help="Fetch and store stream data (GPS, HR, power...); costs one extra request each",
+)
+@click.option(
+    "--photos",
+    is_flag=True,
+    help="Fetch every photo of an activity, not just the primary one; one extra request each",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    help="Make photo thumbnails for notes to embed (needs Pillow)",
+)
+@click.option(
+    "--maps",
+    is_flag=True,
+    help="Render route maps from GPS polylines (offline, no extra requests)",
+)
+@click.option(
+    "--map-format",
+    type=click.Choice(MAP_FORMATS),
+    default="png",
+    help="Image format for route maps",
+)
+@click.option(
+    "--tracks",
+    is_flag=True,
+    help="Write a GPX or TCX file per activity with stored streams to media/tracks/",
+)
+@click.option(
+    "--track-format",
+    type=click.Choice(TRACK_FORMATS),
+    default="gpx",
+    help="File format for activity tracks",
+)
+@click.option(
+    "--duplicates",
+    type=click.Choice(DUPLICATE_POLICIES),
+    help="Detect activities recorded twice and link, merge or skip them (default: off)",
+)
+@click.option(
+    "--timings",
+    "timings_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write per-phase timings (counts, total, p50/p95/p99) as JSON to this file",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Run under cProfile and write the stats to .strava/export.prof",
+)
+@click.option(
+    "--metrics",
+    "metrics_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Record the run's counts, API quota and phase timings in this file",
+)
+@click.option(
+    "--metrics-format",
+    type=click.Choice(METRICS_FORMATS),
+    help="jsonl (appended per run) or prometheus textfile (default: from the extension)",
+)
+@click.option(
+    "--rollups",
+    is_flag=True,
+    help="Write weekly and monthly rollup notes for the periods this run touched",
+)
+@click.option(
+    "--records",
+    is_flag=True,
+    help="Keep the Personal Records note up to date",
+)
+@click.option(
+    "--db",
+    is_flag=True,
+    help="Also store activities and laps in a local SQLite database for 'query' and 'stats'",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Add exported routes to the lifetime heatmap (media/heatmap.png)",
+)
 @click.option(
     "--dry-run",
     is_flag=True,
@@ -107,6 +273,23 @@ def export(
     before: Optional[datetime],
     force: bool,
     no_media: bool,
+    layout: Optional[str],
+    streams: bool,
+    photos: bool,
+    thumbnails: bool,
+    maps: bool,
+    map_format: str,
+    tracks: bool,
+    track_format: str,
+    duplicates: Optional[str],
+    timings_file: Optional[Path],
+    profile: bool,
+    metrics_file: Optional[Path],
+    metrics_format: Optional[str],
+    rollups: bool,
+    records: bool,
+    db: bool,
+    heatmap: bool,
     dry_run: bool,
     verbose: bool,
 ) -> None:
@@ -136,77 +319,429 @@ def export(
 
     # Initialize API client and exporter
     client = StravaClient(config)
-    exporter = ActivityExporter(output)
+    exporter = open_exporter(
+        output,
+        layout,
+        map_format if maps else None,
+        thumbnails and not no_media,
+        config,
+        track_format=track_format if tracks else None,
+        duplicates=duplicates or config.duplicate_policy,
+    )
+    add_export_hooks(
+        exporter,
+        config,
+        rollups=rollups,
+        records=records,
+        db=db,
+        heatmap=heatmap,
+        dry_run=dry_run,
+    )
 
     if not dry_run:
         exporter.setup_directories()
 
-    # Fetch and export activities
-    try:
-        click.echo("📥 Fetching activity list from Strava...")
-        activities_list = list(client.get_activities(after=after, before=before))
-        click.echo(f"   Found {len(activities_list)} activities")
-        click.echo("")
+    # Fetch and export activities, timing each phase
+    started = time.perf_counter()
+    counts = ExportCounts()
+    success = False
+    with instrumented(exporter.data_dir, timings_file, profile):
+        try:
+            click.echo("📥 Fetching activity list from Strava...")
+            activities_list = list(client.get_activities(after=after, before=before))
+            click.echo(f"   Found {len(activities_list)} activities")
+            click.echo("")
+
+            counts = export_activities(
+                client,
+                exporter,
+                activities_list,
+                force=force,
+                dry_run=dry_run,
+                streams=streams,
+                photos=photos and not no_media,
+                download_media=not no_media,
+                verbose=verbose,
+            )
+            if not dry_run:
+                exporter.flush()
+
+            click.echo("")
+            click.echo(f"✅ Export complete!")
+            click.echo(f"   Exported: {counts.exported}")
+            click.echo(f"   Skipped:  {counts.skipped}")
+            if counts.unchanged > 0:
+                click.echo(f"   Unchanged: {counts.unchanged}")
+            if counts.failed > 0:
+                click.echo(f"   Failed:   {counts.failed}")
+            report_duplicates(exporter)
+            click.echo(f"   {client.get_rate_limit_status()}")
+            success = True
+
+        except StravaAPIError as e:
+            if not dry_run:
+                exporter.flush()
+            click.echo(f"❌ API Error: {e}")
+            raise SystemExit(1)
+
+        finally:
+            if metrics_file and not dry_run:
+                metrics = run_metrics(ctx, client, exporter, counts, success, started)
+                write_metrics(metrics_file, metrics, metrics_format)
+
+
+@dataclass
+class ExportCounts:
+    """What happened to the activities of one run."""
+
+    exported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    unchanged: int = 0
+
+
+def export_activities(
+    client: StravaClient,
+    exporter: ActivityExporter,
+    summaries: list[dict[str, Any]],
+    force: bool = False,
+    dry_run: bool = False,
+    streams: bool = False,
+    photos: bool = False,
+    download_media: bool = True,
+    verbose: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> ExportCounts:
+    """
+    Fetch the details of each listed activity and export it.
 
-        exported = 0
-        skipped = 0
-        failed = 0
-
-        with click.progressbar(
-            activities_list,
-            label="Exporting activities",
-            show_pos=True,
-        ) as bar:
-            for activity_summary in bar:
-                activity_id = activity_summary["id"]
-                activity_name = activity_summary.get("name", "Untitled")
-
-                try:
-                    # Get detailed activity data
-                    detail = client.get_activity_detail(activity_id)
-                    activity = Activity.from_api_response(detail)
-
-                    # Check if exists
-                    if not force and exporter.activity_exists(activity):
-                        skipped += 1
-                        if verbose:
-                            click.echo(f"   ⏭️  Skipped (exists): {activity_name}")
-                        continue
-
-                    # Export
-                    if dry_run:
-                        exported += 1
-                        if verbose:
-                            click.echo(f"   📝 Would export: {activity_name}")
-                    else:
-                        filepath = exporter.export_activity(
-                            activity,
-                            force=force,
-                            download_photo=not no_media,
-                        )
-                        if filepath:
-                            exported += 1
-                            if verbose:
-                                click.echo(f"   ✅ Exported: {activity_name}")
-                        else:
-                            skipped += 1
-
-                except StravaAPIError as e:
-                    failed += 1
+    If ``stop`` is set, the activity being exported is finished and the rest
+    are left for the next run.
+    """
+    counts = ExportCounts()
+    with click.progressbar(
+        summaries,
+        label="Exporting activities",
+        show_pos=True,
+    ) as bar:
+        for activity_summary in bar:
+            if stop is not None and stop.is_set():
+                break
+            activity_id = activity_summary["id"]
+            activity_name = activity_summary.get("name", "Untitled")
+
+            try:
+                # Get detailed activity data
+                detail = client.get_activity_detail(activity_id)
+                activity = Activity.from_api_response(detail)
+
+                # Check if exists
+                if not force and exporter.activity_exists(activity):
+                    counts.skipped += 1
                     if verbose:
-                        click.echo(f"   ❌ Failed: {activity_name} - {e}")
+                        click.echo(f"   ⏭️  Skipped (exists): {activity_name}")
+                    continue
 
-        click.echo("")
-        click.echo(f"✅ Export complete!")
-        click.echo(f"   Exported: {exported}")
-        click.echo(f"   Skipped:  {skipped}")
-        if failed > 0:
-            click.echo(f"   Failed:   {failed}")
-        click.echo(f"   {client.get_rate_limit_status()}")
+                # Export
+                if dry_run:
+                    counts.exported += 1
+                    if verbose:
+                        click.echo(f"   📝 Would export: {activity_name}")
+                    continue
+                if streams and (force or not exporter.streams.exists(activity_id)):
+                    activity.streams = fetch_streams(client, activity_id)
+                if photos and (detail.get("photos") or {}).get("count"):
+                    activity.photos = fetch_photos(client, activity_id)
+                unchanged = exporter.unchanged
+                filepath = exporter.export_activity(
+                    activity,
+                    force=force,
+                    download_photo=download_media,
+                )
+                if filepath and exporter.unchanged > unchanged:
+                    counts.unchanged += 1
+                    if verbose:
+                        click.echo(f"   🟰 Unchanged: {activity_name}")
+                elif filepath:
+                    counts.exported += 1
+                    if verbose:
+                        click.echo(f"   ✅ Exported: {activity_name}")
+                else:
+                    counts.skipped += 1
 
-    except StravaAPIError as e:
-        click.echo(f"❌ API Error: {e}")
+            except StravaAPIError as e:
+                counts.failed += 1
+                if verbose:
+                    click.echo(f"   ❌ Failed: {activity_name} - {e}")
+    return counts
+
+
+def run_metrics(
+    ctx: click.Context,
+    client: StravaClient,
+    exporter: ActivityExporter,
+    counts: ExportCounts,
+    success: bool,
+    started: float,
+) -> RunMetrics:
+    """Collect what a run did and the API quota it left."""
+    return RunMetrics(
+        command=ctx.find_root().invoked_subcommand or ctx.info_name or "export",
+        duration_seconds=time.perf_counter() - started,
+        exported=counts.exported,
+        skipped=counts.skipped,
+        failed=counts.failed,
+        unchanged=counts.unchanged,
+        api_requests=client.requests_made,
+        remaining_15min=client.rate_limit.remaining_15min,
+        remaining_daily=client.rate_limit.remaining_daily,
+        media_bytes=exporter.downloaded_bytes,
+        success=success,
+        phases=timings.stats(),
+    )
+
+
+@contextmanager
+def instrumented(data_dir: Path, timings_file: Optional[Path], profile: bool) -> Iterator[None]:
+    """
+    Time the phases of a run and print a summary when it ends.
+
+    With ``profile``, the run is also wrapped in cProfile; the stats are dumped
+    to the data directory and the top functions printed.
+    """
+    timings.reset()
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        print_timings()
+        if timings_file:
+            timings.write_json(timings_file)
+            click.echo(f"   Timings written to {timings_file}")
+        if profiler:
+            path = data_dir / PROFILE_FILENAME
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(15)
+            click.echo(report.getvalue())
+            click.echo(f"🔬 Profile written to {path} (open with 'python -m pstats')")
+
+
+def _duration(seconds: float) -> str:
+    return f"{seconds:.2f}s" if seconds >= 1 else f"{seconds * 1000:.1f}ms"
+
+
+def print_timings() -> None:
+    """Print call counts, total time and percentiles of each timed phase."""
+    stats = timings.stats()
+    if not stats:
+        return
+    click.echo("")
+    click.echo("⏱️  Timings")
+    click.echo(f"   {'Phase':<22} {'Calls':>6} {'Total':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for phase in stats:
+        click.echo(
+            f"   {phase.phase:<22} {phase.count:>6} {_duration(phase.total):>9} "
+            f"{_duration(phase.p50):>9} {_duration(phase.p95):>9} {_duration(phase.p99):>9}"
+        )
+
+
+def open_exporter(
+    output: Path,
+    layout: Optional[str],
+    map_format: Optional[str],
+    thumbnails: bool,
+    config: Config,
+    track_format: Optional[str] = None,
+    duplicates: Optional[str] = None,
+) -> ActivityExporter:
+    """Create the exporter for a run and load its index, exiting if it can't be used."""
+    media = None
+    if thumbnails:
+        media = MediaOptions(
+            max_size=config.max_photo_size, keep_originals=config.keep_original_photos
+        )
+    try:
+        exporter = ActivityExporter(
+            output,
+            layout=get_layout(layout) if layout else None,
+            map_format=map_format,
+            media=media,
+            track_format=track_format,
+            duplicates=duplicates,
+        )
+    except RuntimeError as e:
+        click.echo(f"❌ {e}")
         raise SystemExit(1)
+    scan = exporter.ensure_index()
+    if scan and scan.entries:
+        click.echo(f"📇 Indexed {len(scan.entries)} existing notes")
+    if layout and exporter.layout.name != layout:
+        click.echo(
+            f"❌ {output} already uses the '{exporter.layout.name}' layout. "
+            f"Run 'strava-to-obsidian migrate --layout {layout}' to change it."
+        )
+        raise SystemExit(1)
+    return exporter
+
+
+def add_export_hooks(
+    exporter: ActivityExporter,
+    config: Config,
+    rollups: bool = False,
+    records: bool = False,
+    db: bool = False,
+    heatmap: bool = False,
+    dry_run: bool = False,
+) -> None:
+    """Attach the hooks that keep derived notes and indexes up to date."""
+    exporter.hooks.append(
+        TrainingLoadHook(
+            exporter.data_dir / "training_load.json",
+            HeartRateProfile(config.max_heartrate, config.resting_heartrate),
+        )
+    )
+    if records:
+        exporter.hooks.append(
+            RecordsHook(exporter.data_dir / "records.json", exporter.output_dir / RECORDS_NOTE)
+        )
+    if rollups:
+        exporter.hooks.append(
+            RollupHook(exporter.output_dir / ROLLUPS_DIRNAME, exporter.metrics, exporter.index)
+        )
+    if dry_run:
+        return
+    search_index = open_search_index(exporter)
+    exporter.hooks.append(SearchHook(search_index, exporter.output_dir))
+    exporter.hooks.append(SpatialHook(open_spatial_index(exporter), load_place_finder(config)))
+    exporter.hooks.append(
+        RouteHook(
+            RouteStore(exporter.data_dir / ROUTES_FILENAME),
+            exporter.output_dir / ROUTES_DIRNAME,
+            exporter.index,
+            exporter.output_dir,
+        )
+    )
+    if db:
+        database = ActivityDatabase(exporter.data_dir / DB_FILENAME)
+        if database.created and len(exporter.index):
+            added = database.backfill(exporter.output_dir, exporter.index)
+            click.echo(f"🗄️  Added {added} existing activities to the database")
+        exporter.hooks.append(DatabaseHook(database, exporter.output_dir))
+    if heatmap:
+        grid = open_heatmap(exporter)
+        exporter.hooks.append(HeatmapHook(grid, exporter.media_dir / HEATMAP_IMAGE))
+
+
+def report_duplicates(exporter: ActivityExporter) -> None:
+    """Say how many activities this run found recorded twice."""
+    if exporter.duplicates and exporter.duplicates.flagged:
+        past = {"link": "linked", "merge": "merged", "skip": "skipped"}[exporter.duplicates.policy]
+        click.echo(f"   Duplicates: {exporter.duplicates.flagged} ({past})")
+
+
+def fetch_streams(client: StravaClient, activity_id: int) -> Optional[ActivityStreams]:
+    """Fetch streams for an activity; manual entries without streams give None."""
+    try:
+        return ActivityStreams.from_api_response(client.get_activity_streams(activity_id))
+    except StravaAPIError as e:
+        if e.status_code == 404:
+            return None
+        raise
+
+
+def export_new_activities(
+    client: StravaClient,
+    exporter: ActivityExporter,
+    clock: ActivityClock,
+    since: datetime,
+    streams: bool = False,
+    photos: bool = False,
+    download_media: bool = True,
+    verbose: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> Optional[ExportCounts]:
+    """
+    List the activities since ``since`` and export the ones not in the vault yet.
+
+    The clock learns when activities happen from the whole first listing, and
+    after that from each activity exported.
+
+    Returns:
+        The export counts, or None if there was nothing new
+    """
+    summaries = list(client.get_activities(after=since))
+    learning = not len(clock)
+    for summary in summaries if learning else []:
+        clock.add_summary(summary)
+    new = [summary for summary in summaries if not exporter.is_known(summary["id"])]
+    if not new:
+        return None
+    counts = export_activities(
+        client,
+        exporter,
+        new,
+        streams=streams,
+        photos=photos,
+        download_media=download_media,
+        verbose=verbose,
+        stop=stop,
+    )
+    exporter.flush()
+    for summary in new if not learning else []:
+        if exporter.is_known(summary["id"]):
+            clock.add_summary(summary)
+    return counts
+
+
+def fetch_photos(client: StravaClient, activity_id: int) -> list[ActivityPhoto]:
+    """Fetch an activity's full photo set, leaving out entries without an image."""
+    photos = map(ActivityPhoto.from_api_response, client.get_activity_photos(activity_id))
+    return [photo for photo in photos if photo is not None]
+
+
+def apply_webhook_work(
+    client: StravaClient,
+    exporter: ActivityExporter,
+    work: QueuedWork,
+    streams: bool = False,
+    photos: bool = False,
+    download_media: bool = True,
+) -> str:
+    """
+    Carry out the queued work for one activity with as few requests as it needs.
+
+    A delete makes no request. Anything else is one detail fetch and a
+    re-render; streams are only fetched if none are stored yet, and photos
+    (with ``photos``) only if the activity has some.
+
+    Returns:
+        What was done: exported, updated, skipped, deleted or gone
+    """
+    activity_id = work.activity_id
+    if work.action == "delete":
+        return "deleted" if exporter.delete_activity(activity_id) else "gone"
+    try:
+        detail = client.get_activity_detail(activity_id)
+    except StravaAPIError as e:
+        if e.status_code == 404:  # deleted or made private since the event
+            return "gone"
+        raise
+    activity = Activity.from_api_response(detail)
+    known = exporter.is_known(activity_id)
+    if streams and not exporter.streams.exists(activity_id):
+        activity.streams = fetch_streams(client, activity_id)
+    if photos and (detail.get("photos") or {}).get("count"):
+        activity.photos = fetch_photos(client, activity_id)
+    filepath = exporter.export_activity(activity, force=known, download_photo=download_media)
+    if filepath is None:
+        return "skipped"
+    return "updated" if known else "exported"
 
 
 @main.command()
@@ -226,6 +761,90 @@ def export(
     is_flag=True,
     help="Skip downloading photos",
 )
+@click.option(
+    "--streams",
+    is_flag=True,
+    help="Fetch and store stream data (GPS, HR, power...); costs one extra request each",
+)
+@click.option(
+    "--photos",
+    is_flag=True,
+    help="Fetch every photo of an activity, not just the primary one; one extra request each",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    help="Make photo thumbnails for notes to embed (needs Pillow)",
+)
+@click.option(
+    "--maps",
+    is_flag=True,
+    help="Render route maps from GPS polylines (offline, no extra requests)",
+)
+@click.option(
+    "--map-format",
+    type=click.Choice(MAP_FORMATS),
+    default="png",
+    help="Image format for route maps",
+)
+@click.option(
+    "--tracks",
+    is_flag=True,
+    help="Write a GPX or TCX file per activity with stored streams to media/tracks/",
+)
+@click.option(
+    "--track-format",
+    type=click.Choice(TRACK_FORMATS),
+    default="gpx",
+    help="File format for activity tracks",
+)
+@click.option(
+    "--duplicates",
+    type=click.Choice(DUPLICATE_POLICIES),
+    help="Detect activities recorded twice and link, merge or skip them (default: off)",
+)
+@click.option(
+    "--timings",
+    "timings_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write per-phase timings (counts, total, p50/p95/p99) as JSON to this file",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Run under cProfile and write the stats to .strava/export.prof",
+)
+@click.option(
+    "--metrics",
+    "metrics_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Record the run's counts, API quota and phase timings in this file",
+)
+@click.option(
+    "--metrics-format",
+    type=click.Choice(METRICS_FORMATS),
+    help="jsonl (appended per run) or prometheus textfile (default: from the extension)",
+)
+@click.option(
+    "--rollups",
+    is_flag=True,
+    help="Write weekly and monthly rollup notes for the periods this run touched",
+)
+@click.option(
+    "--records",
+    is_flag=True,
+    help="Keep the Personal Records note up to date",
+)
+@click.option(
+    "--db",
+    is_flag=True,
+    help="Also store activities and laps in a local SQLite database for 'query' and 'stats'",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Add exported routes to the lifetime heatmap (media/heatmap.png)",
+)
 @click.option(
     "--verbose", "-v",
     is_flag=True,
@@ -237,6 +856,22 @@ def sync(
     output: Path,
     force: bool,
     no_media: bool,
+    streams: bool,
+    photos: bool,
+    thumbnails: bool,
+    maps: bool,
+    map_format: str,
+    tracks: bool,
+    track_format: str,
+    duplicates: Optional[str],
+    timings_file: Optional[Path],
+    profile: bool,
+    metrics_file: Optional[Path],
+    metrics_format: Optional[str],
+    rollups: bool,
+    records: bool,
+    db: bool,
+    heatmap: bool,
     verbose: bool,
 ) -> None:
     """Sync new activities (incremental export)."""
@@ -248,29 +883,1190 @@ def sync(
         days=30,
         force=force,
         no_media=no_media,
+        streams=streams,
+        photos=photos,
+        thumbnails=thumbnails,
+        maps=maps,
+        map_format=map_format,
+        tracks=tracks,
+        track_format=track_format,
+        duplicates=duplicates,
+        rollups=rollups,
+        records=records,
+        db=db,
+        heatmap=heatmap,
+        timings_file=timings_file,
+        profile=profile,
+        metrics_file=metrics_file,
+        metrics_format=metrics_format,
         verbose=verbose,
     )
 
 
 @main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory for exported files",
+)
+@click.option(
+    "--days",
+    type=int,
+    default=30,
+    help="Days to catch up on when the daemon starts",
+)
+@click.option(
+    "--lookback-hours",
+    type=int,
+    default=48,
+    help="How far back each poll lists activities (for late uploads)",
+)
+@click.option(
+    "--daily-polls",
+    type=int,
+    default=48,
+    help="Polls to spread over a day, fewer if the daily quota runs low",
+)
+@click.option(
+    "--min-interval",
+    type=int,
+    default=5,
+    help="Minimum minutes between polls",
+)
+@click.option(
+    "--max-interval",
+    type=int,
+    default=60,
+    help="Maximum minutes between polls, while the quota allows",
+)
+@click.option(
+    "--reserve",
+    type=int,
+    default=100,
+    help="Daily API requests to leave for other commands",
+)
+@click.option(
+    "--no-media",
+    is_flag=True,
+    help="Skip downloading photos",
+)
+@click.option(
+    "--streams",
+    is_flag=True,
+    help="Fetch and store stream data (GPS, HR, power...); costs one extra request each",
+)
+@click.option(
+    "--photos",
+    is_flag=True,
+    help="Fetch every photo of an activity, not just the primary one; one extra request each",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    help="Make photo thumbnails for notes to embed (needs Pillow)",
+)
+@click.option(
+    "--maps",
+    is_flag=True,
+    help="Render route maps from GPS polylines (offline, no extra requests)",
+)
+@click.option(
+    "--map-format",
+    type=click.Choice(MAP_FORMATS),
+    default="png",
+    help="Image format for route maps",
+)
+@click.option(
+    "--tracks",
+    is_flag=True,
+    help="Write a GPX or TCX file per activity with stored streams to media/tracks/",
+)
+@click.option(
+    "--track-format",
+    type=click.Choice(TRACK_FORMATS),
+    default="gpx",
+    help="File format for activity tracks",
+)
+@click.option(
+    "--duplicates",
+    type=click.Choice(DUPLICATE_POLICIES),
+    help="Detect activities recorded twice and link, merge or skip them (default: off)",
+)
+@click.option(
+    "--metrics",
+    "metrics_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Record each poll's counts, API quota and phase timings in this file",
+)
+@click.option(
+    "--metrics-format",
+    type=click.Choice(METRICS_FORMATS),
+    help="jsonl (appended per poll) or prometheus textfile (default: from the extension)",
+)
+@click.option(
+    "--rollups",
+    is_flag=True,
+    help="Write weekly and monthly rollup notes for the periods each poll touched",
+)
+@click.option(
+    "--records",
+    is_flag=True,
+    help="Keep the Personal Records note up to date",
+)
+@click.option(
+    "--db",
+    is_flag=True,
+    help="Also store activities and laps in a local SQLite database for 'query' and 'stats'",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Add exported routes to the lifetime heatmap (media/heatmap.png)",
+)
+@click.option(
+    "--verbose", "-v",
+    is_flag=True,
+    help="Show detailed output",
+)
 @click.pass_context
-def status(ctx: click.Context) -> None:
-    """Show authentication and sync status."""
+def daemon(
+    ctx: click.Context,
+    output: Path,
+    days: int,
+    lookback_hours: int,
+    daily_polls: int,
+    min_interval: int,
+    max_interval: int,
+    reserve: int,
+    no_media: bool,
+    streams: bool,
+    photos: bool,
+    thumbnails: bool,
+    maps: bool,
+    map_format: str,
+    tracks: bool,
+    track_format: str,
+    duplicates: Optional[str],
+    metrics_file: Optional[Path],
+    metrics_format: Optional[str],
+    rollups: bool,
+    records: bool,
+    db: bool,
+    heatmap: bool,
+    verbose: bool,
+) -> None:
+    """Stay running and sync new activities as they turn up."""
     config: Config = ctx.obj["config"]
 
-    click.echo("Strava to Obsidian Status")
-    click.echo("=" * 40)
+    if not config.has_tokens():
+        click.echo("❌ Not authenticated. Run 'strava-to-obsidian auth' first.")
+        raise SystemExit(1)
 
-    # Credentials
-    if config.has_valid_credentials():
-        click.echo(f"✅ API credentials configured")
-        click.echo(f"   Client ID: {config.strava.client_id[:8]}...")
-    else:
-        click.echo("❌ API credentials not configured")
-        click.echo("   Set STRAVA_CLIENT_ID and STRAVA_CLIENT_SECRET")
+    # One client, exporter and set of hooks for the life of the daemon, so the
+    # HTTP session, token and indexes stay warm between polls
+    client = StravaClient(config)
+    exporter = open_exporter(
+        output,
+        None,
+        map_format if maps else None,
+        thumbnails and not no_media,
+        config,
+        track_format=track_format if tracks else None,
+        duplicates=duplicates or config.duplicate_policy,
+    )
+    add_export_hooks(
+        exporter,
+        config,
+        rollups=rollups,
+        records=records,
+        db=db,
+        heatmap=heatmap,
+        dry_run=False,
+    )
+    exporter.setup_directories()
+    clock = ActivityClock(exporter.data_dir / CLOCK_FILENAME)
+    scheduler = PollScheduler(
+        clock,
+        daily_polls=daily_polls,
+        min_interval=min_interval * 60,
+        max_interval=max_interval * 60,
+        reserve=reserve,
+    )
 
-    # Tokens
-    if config.has_tokens():
+    stop = threading.Event()
+    client.stop = stop
+    since = datetime.now() - timedelta(days=days)
+
+    def poll() -> None:
+        nonlocal since
+        timings.reset()
+        client.requests_made = 0
+        media_bytes = exporter.downloaded_bytes
+        started = time.perf_counter()
+        counts = ExportCounts()
+        success = False
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        try:
+            new = export_new_activities(
+                client,
+                exporter,
+                clock,
+                since,
+                streams=streams,
+                photos=photos and not no_media,
+                download_media=not no_media,
+                verbose=verbose,
+                stop=stop,
+            )
+            if new is not None:
+                counts = new
+                click.echo(
+                    f"{stamp} ✅ Exported {counts.exported}, skipped {counts.skipped}"
+                    + (f", failed {counts.failed}" if counts.failed else "")
+                )
+            elif verbose:
+                click.echo(f"{stamp} No new activities")
+            since = datetime.now() - timedelta(hours=lookback_hours)
+            success = True
+        except StravaAPIError as e:
+            click.echo(f"{stamp} ❌ API Error: {e}")
+            exporter.flush()
+        except Exception as e:  # one bad poll mustn't end the daemon
+            click.echo(f"{stamp} ❌ Poll failed: {e!r}")
+            exporter.flush()
+        finally:
+            clock.save()
+            if metrics_file:
+                metrics = run_metrics(ctx, client, exporter, counts, success, started)
+                metrics.media_bytes -= media_bytes
+                write_metrics(metrics_file, metrics, metrics_format)
+
+    def waiting(delay: float) -> None:
+        if verbose:
+            click.echo(f"   Next poll in {delay / 60:.0f} min ({client.get_rate_limit_status()})")
+
+    click.echo(f"🔁 Syncing to {output.absolute()} until stopped (Ctrl+C)")
+    with stop_on_signals(stop, lambda: click.echo("🛑 Stopping after the current activity...")):
+        polls = poll_until_stopped(poll, scheduler, client.rate_limit, stop, on_wait=waiting)
+    click.echo(f"👋 Stopped after {polls} polls")
+
+
+@main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory for exported files",
+)
+@click.option(
+    "--host",
+    default="localhost",
+    help="Address to listen on (put a tunnel or reverse proxy in front for Strava)",
+)
+@click.option(
+    "--port",
+    type=int,
+    default=WEBHOOK_PORT,
+    help="Port to listen on",
+)
+@click.option(
+    "--verify-token",
+    help="Token Strava must echo when validating (default: STRAVA_WEBHOOK_VERIFY_TOKEN)",
+)
+@click.option(
+    "--subscribe",
+    "callback_url",
+    help="Register this public URL for events once the receiver is listening",
+)
+@click.option(
+    "--subscription-id",
+    type=int,
+    help="Only accept events for this subscription",
+)
+@click.option(
+    "--no-media",
+    is_flag=True,
+    help="Skip downloading photos",
+)
+@click.option(
+    "--streams",
+    is_flag=True,
+    help="Fetch and store stream data (GPS, HR, power...); costs one extra request each",
+)
+@click.option(
+    "--photos",
+    is_flag=True,
+    help="Fetch every photo of an activity, not just the primary one; one extra request each",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    help="Make photo thumbnails for notes to embed (needs Pillow)",
+)
+@click.option(
+    "--maps",
+    is_flag=True,
+    help="Render route maps from GPS polylines (offline, no extra requests)",
+)
+@click.option(
+    "--map-format",
+    type=click.Choice(MAP_FORMATS),
+    default="png",
+    help="Image format for route maps",
+)
+@click.option(
+    "--tracks",
+    is_flag=True,
+    help="Write a GPX or TCX file per activity with stored streams to media/tracks/",
+)
+@click.option(
+    "--track-format",
+    type=click.Choice(TRACK_FORMATS),
+    default="gpx",
+    help="File format for activity tracks",
+)
+@click.option(
+    "--duplicates",
+    type=click.Choice(DUPLICATE_POLICIES),
+    help="Detect activities recorded twice and link, merge or skip them (default: off)",
+)
+@click.option(
+    "--rollups",
+    is_flag=True,
+    help="Write weekly and monthly rollup notes for the periods events touched",
+)
+@click.option(
+    "--records",
+    is_flag=True,
+    help="Keep the Personal Records note up to date",
+)
+@click.option(
+    "--db",
+    is_flag=True,
+    help="Also store activities and laps in a local SQLite database for 'query' and 'stats'",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Add exported routes to the lifetime heatmap (media/heatmap.png)",
+)
+@click.option(
+    "--verbose", "-v",
+    is_flag=True,
+    help="Show detailed output",
+)
+@click.pass_context
+def webhook(
+    ctx: click.Context,
+    output: Path,
+    host: str,
+    port: int,
+    verify_token: Optional[str],
+    callback_url: Optional[str],
+    subscription_id: Optional[int],
+    no_media: bool,
+    streams: bool,
+    photos: bool,
+    thumbnails: bool,
+    maps: bool,
+    map_format: str,
+    tracks: bool,
+    track_format: str,
+    duplicates: Optional[str],
+    rollups: bool,
+    records: bool,
+    db: bool,
+    heatmap: bool,
+    verbose: bool,
+) -> None:
+    """Receive Strava webhook events and sync each activity as it changes."""
+    config: Config = ctx.obj["config"]
+
+    if not config.has_tokens():
+        click.echo("❌ Not authenticated. Run 'strava-to-obsidian auth' first.")
+        raise SystemExit(1)
+
+    client = StravaClient(config)
+    exporter = open_exporter(
+        output,
+        None,
+        map_format if maps else None,
+        thumbnails and not no_media,
+        config,
+        track_format=track_format if tracks else None,
+        duplicates=duplicates or config.duplicate_policy,
+    )
+    add_export_hooks(
+        exporter,
+        config,
+        rollups=rollups,
+        records=records,
+        db=db,
+        heatmap=heatmap,
+        dry_run=False,
+    )
+    exporter.setup_directories()
+
+    verify_token = verify_token or config.webhook_verify_token
+    if not verify_token:
+        verify_token = secrets.token_urlsafe(16)
+        click.echo(f"🔑 Verify token for this session: {verify_token}")
+
+    def received(event: WebhookEvent, queued: bool) -> None:
+        if event.object_type == "athlete" and event.updates.get("authorized") == "false":
+            click.echo("⚠️  Access was revoked on Strava. Run 'strava-to-obsidian auth' again.")
+        elif verbose:
+            action = f"{event.aspect_type} {event.object_type} {event.object_id}"
+            click.echo(f"   📨 {action}: {'queued' if queued else 'ignored'}")
+
+    def apply(work: QueuedWork) -> None:
+        outcome = apply_webhook_work(
+            client,
+            exporter,
+            work,
+            streams=streams,
+            photos=photos and not no_media,
+            download_media=not no_media,
+        )
+        click.echo(f"{datetime.now():%Y-%m-%d %H:%M} {outcome}: activity {work.activity_id}")
+
+    def failed(work: QueuedWork, error: Exception) -> None:
+        reason = error if isinstance(error, StravaAPIError) else repr(error)
+        click.echo(f"❌ Activity {work.activity_id}: {reason} (will retry)")
+
+    try:
+        athlete_id = int(client.get_athlete()["id"])
+    except (StravaAPIError, KeyError, TypeError, ValueError) as e:
+        click.echo(f"❌ Could not look up the authenticated athlete: {e}")
+        raise SystemExit(1)
+
+    queue = EventQueue(exporter.data_dir / QUEUE_FILENAME)
+    server = make_server(
+        queue, verify_token, host, port, subscription_id, received, owner_id=athlete_id
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    click.echo(
+        f"📡 Listening on http://{host}:{server.server_port}/ for athlete {athlete_id}"
+        f" ({len(queue)} queued)"
+    )
+
+    if callback_url:
+        try:
+            subscribed = create_subscription(config, callback_url, verify_token)
+            click.echo(f"✅ Subscribed {callback_url} (subscription {subscribed})")
+        except (StravaAPIError, requests.RequestException) as e:
+            click.echo(f"❌ {e}")
+
+    stop = threading.Event()
+    client.stop = stop
+    with stop_on_signals(stop, lambda: click.echo("🛑 Stopping after the current activity...")):
+        done = process_events(queue, apply, stop, on_idle=exporter.flush, on_error=failed)
+    server.shutdown()
+    server.server_close()
+    click.echo(f"👋 Stopped after {done} activities ({len(queue)} left queued)")
+
+
+@main.command("simulate-event")
+@click.argument("aspect_type", type=click.Choice(ASPECT_TYPES))
+@click.argument("activity_id", type=int)
+@click.option(
+    "--url",
+    default=f"http://localhost:{WEBHOOK_PORT}/",
+    help="Receiver to send the event to",
+)
+@click.option("--title", help="New title, for an update")
+@click.option("--type", "sport_type", help="New sport type, for an update")
+@click.option(
+    "--verify-token",
+    help="Also try the validation handshake with this token",
+)
+@click.option(
+    "--owner-id",
+    type=int,
+    default=0,
+    help="Athlete the event is for; the receiver only queues its own athlete's (it prints the ID)",
+)
+@click.option(
+    "--subscription-id",
+    type=int,
+    default=0,
+    help="Subscription the event is for, if the receiver was given one",
+)
+def simulate_event(
+    aspect_type: str,
+    activity_id: int,
+    url: str,
+    title: Optional[str],
+    sport_type: Optional[str],
+    verify_token: Optional[str],
+    owner_id: int,
+    subscription_id: int,
+) -> None:
+    """Send a Strava-style webhook event to a running receiver."""
+    simulator = EventSimulator(url, owner_id=owner_id, subscription_id=subscription_id)
+    try:
+        if verify_token is not None:
+            challenge = simulator.validate(verify_token)
+            click.echo(f"🤝 Validation {'passed' if challenge else 'failed'}")
+        updates = {"title": title, "type": sport_type}
+        response = simulator.send(
+            aspect_type, activity_id, {key: value for key, value in updates.items() if value}
+        )
+    except requests.RequestException as e:
+        click.echo(f"❌ {e}")
+        raise SystemExit(1)
+    click.echo(f"📨 {aspect_type} {activity_id}: HTTP {response.status_code} {response.text}")
+
+
+@main.command("import-archive")
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory for exported files",
+)
+@click.option(
+    "--force", "-f",
+    is_flag=True,
+    help="Overwrite existing files",
+)
+@click.option(
+    "--no-media",
+    is_flag=True,
+    help="Skip importing photos",
+)
+@click.option(
+    "--layout",
+    type=click.Choice(sorted(LAYOUTS)),
+    help="Vault layout for a new output directory (existing ones keep theirs; see 'migrate')",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    help="Make photo thumbnails for notes to embed (needs Pillow)",
+)
+@click.option(
+    "--maps",
+    is_flag=True,
+    help="Render route maps from the archive's GPS tracks",
+)
+@click.option(
+    "--map-format",
+    type=click.Choice(MAP_FORMATS),
+    default="png",
+    help="Image format for route maps",
+)
+@click.option(
+    "--tracks",
+    is_flag=True,
+    help="Write a GPX or TCX file per activity with stored streams to media/tracks/",
+)
+@click.option(
+    "--track-format",
+    type=click.Choice(TRACK_FORMATS),
+    default="gpx",
+    help="File format for activity tracks",
+)
+@click.option(
+    "--duplicates",
+    type=click.Choice(DUPLICATE_POLICIES),
+    help="Detect activities recorded twice and link, merge or skip them (default: off)",
+)
+@click.option(
+    "--rollups",
+    is_flag=True,
+    help="Write weekly and monthly rollup notes for the periods this import touched",
+)
+@click.option(
+    "--records",
+    is_flag=True,
+    help="Keep the Personal Records note up to date",
+)
+@click.option(
+    "--db",
+    is_flag=True,
+    help="Also store activities in the local SQLite database",
+)
+@click.option(
+    "--heatmap",
+    is_flag=True,
+    help="Add imported routes to the lifetime heatmap (media/heatmap.png)",
+)
+@click.option(
+    "--verbose", "-v",
+    is_flag=True,
+    help="Show detailed output",
+)
+@click.pass_context
+def import_archive_command(
+    ctx: click.Context,
+    archive: Path,
+    output: Path,
+    force: bool,
+    no_media: bool,
+    layout: Optional[str],
+    thumbnails: bool,
+    maps: bool,
+    map_format: str,
+    tracks: bool,
+    track_format: str,
+    duplicates: Optional[str],
+    rollups: bool,
+    records: bool,
+    db: bool,
+    heatmap: bool,
+    verbose: bool,
+) -> None:
+    """Import activities from a Strava account export ZIP, without using the API.
+
+    Request the archive under Settings > My Account > Download or Delete Your
+    Account on strava.com. Afterwards, 'sync' only needs to fetch new activities.
+    """
+    config: Config = ctx.obj["config"]
+    try:
+        source = StravaArchive(archive)
+    except (zipfile.BadZipFile, ValueError) as e:
+        click.echo(f"❌ Could not read {archive}: {e}")
+        raise SystemExit(1)
+
+    click.echo(f"📦 Importing {archive}")
+    click.echo(f"📁 Output directory: {output.absolute()}")
+    click.echo("")
+    exporter = open_exporter(
+        output,
+        layout,
+        map_format if maps else None,
+        thumbnails and not no_media,
+        config,
+        track_format=track_format if tracks else None,
+        duplicates=duplicates or config.duplicate_policy,
+    )
+    add_export_hooks(exporter, config, rollups=rollups, records=records, db=db, heatmap=heatmap)
+    exporter.setup_directories()
+
+    def report(activity: Activity, outcome: str) -> None:
+        if verbose:
+            icon = "✅ Imported" if outcome == "exported" else "⏭️  Skipped (exists)"
+            click.echo(f"   {icon}: {activity.name}")
+
+    start = time.perf_counter()
+    with source:
+        try:
+            result = import_archive(
+                source, exporter, force=force, media=not no_media, progress=report
+            )
+        finally:
+            exporter.flush()
+    elapsed = time.perf_counter() - start
+
+    click.echo("")
+    click.echo(f"✅ Import complete in {elapsed:.1f}s")
+    click.echo(f"   Imported: {result.imported}")
+    click.echo(f"   Skipped:  {result.skipped}")
+    if result.failed:
+        click.echo(f"   Failed:   {result.failed} (rows without an activity ID)")
+    report_duplicates(exporter)
+
+
+@main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option(
+    "--layout",
+    type=click.Choice(sorted(LAYOUTS)),
+    required=True,
+    help="Layout to move the vault to",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Show what would be moved without touching files",
+)
+def migrate(output: Path, layout: str, dry_run: bool) -> None:
+    """Move existing notes and media to a different vault layout."""
+    if not output.is_dir():
+        click.echo(f"❌ {output} does not exist")
+        raise SystemExit(1)
+    exporter = ActivityExporter(output)
+    scan = exporter.ensure_index()
+    if scan and scan.entries:
+        click.echo(f"📇 Indexed {len(scan.entries)} existing notes")
+    index = exporter.index
+    target = get_layout(layout)
+
+    if index.layout == target.name:
+        click.echo(f"✅ {output} already uses the '{target.name}' layout")
+        return
+
+    click.echo(f"📦 Migrating {len(index)} activities: {index.layout} → {target.name}")
+    if dry_run:
+        click.echo("🔍 DRY RUN - no files will be moved")
+
+    result = migrate_layout(output, index, target, dry_run=dry_run)
+    if not dry_run:
+        index.save()
+
+    click.echo(f"   Notes moved:     {result.notes_moved}")
+    click.echo(f"   Media moved:     {result.media_moved}")
+    click.echo(f"   Notes rewritten: {result.notes_rewritten}")
+    if result.missing:
+        click.echo(f"   ⚠️  Missing notes: {len(result.missing)} (left in index)")
+
+
+@main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option(
+    "--workers",
+    type=int,
+    help="Number of parallel readers (default: based on CPU count)",
+)
+def reindex(output: Path, workers: Optional[int]) -> None:
+    """Rebuild the activity index by scanning existing notes."""
+    if not output.is_dir():
+        click.echo(f"❌ {output} does not exist")
+        raise SystemExit(1)
+
+    exporter = ActivityExporter(output)
+    start = time.perf_counter()
+    result = rebuild_index(output, exporter.index, workers=workers)
+    exporter.index.save()
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"📇 Scanned {result.notes_scanned} notes in {elapsed:.2f}s")
+    click.echo(f"   Indexed: {len(result.entries)} activities ({result.layout} layout)")
+    if result.duplicates:
+        click.echo(f"   ⚠️  {len(result.duplicates)} activities have more than one note:")
+        for paths in result.duplicates.values():
+            click.echo(f"      {', '.join(paths)}")
+
+
+def open_search_index(exporter: ActivityExporter) -> SearchIndex:
+    """Open the search index, filling it from existing notes the first time."""
+    search_index = SearchIndex(exporter.data_dir / SEARCH_FILENAME)
+    if search_index.created and len(exporter.index):
+        added = search_index.backfill(exporter.output_dir, exporter.index)
+        click.echo(f"🔎 Added {added} existing notes to the search index")
+    return search_index
+
+
+def open_spatial_index(exporter: ActivityExporter) -> SpatialIndex:
+    """Open the spatial index, filling it from existing notes the first time."""
+    spatial_index = SpatialIndex(exporter.data_dir / SPATIAL_FILENAME)
+    if not spatial_index.exists() and len(exporter.index):
+        spatial_index.backfill(exporter.output_dir, exporter.index)
+        spatial_index.save()
+    return spatial_index
+
+
+def open_heatmap(exporter: ActivityExporter) -> HeatmapGrid:
+    """Open the heatmap grid, adding activities with stored streams the first time."""
+    grid = HeatmapGrid(exporter.data_dir / HEATMAP_FILENAME)
+    if not grid.exists() and len(exporter.index):
+        added = grid.backfill(exporter.streams, exporter.index)
+        grid.save()
+        if added:
+            click.echo(f"🔥 Added {added} existing activities to the heatmap")
+    return grid
+
+
+def load_place_finder(config: Config) -> Optional[PlaceFinder]:
+    """Load the configured places file, exiting if it can't be read."""
+    if config.places_file is None:
+        return None
+    try:
+        return PlaceFinder(load_places(config.places_file))
+    except (OSError, ValueError) as e:
+        click.echo(f"❌ Could not load places from {config.places_file}: {e}")
+        raise SystemExit(1)
+
+
+def open_database(output: Path) -> ActivityDatabase:
+    """Open the database of an output directory, exiting if there isn't one."""
+    path = output / DATA_DIRNAME / DB_FILENAME
+    if not path.exists():
+        click.echo(f"❌ No database in {output}. Run 'strava-to-obsidian export --db' first.")
+        raise SystemExit(1)
+    return ActivityDatabase(path)
+
+
+@main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option("--sport", help="Sport type, e.g. Ride or Run")
+@click.option("--year", type=int, help="Only activities from this year")
+@click.option(
+    "--after",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only activities on or after this date (YYYY-MM-DD)",
+)
+@click.option(
+    "--before",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only activities before this date (YYYY-MM-DD)",
+)
+@click.option("--min-km", type=float, help="Minimum distance in kilometers")
+@click.option("--max-km", type=float, help="Maximum distance in kilometers")
+@click.option(
+    "--sort",
+    type=click.Choice(["date", "distance", "time"]),
+    default="date",
+    help="Sort order (newest, longest or longest moving time first)",
+)
+@click.option("--limit", type=int, default=50, help="Maximum number of results")
+def query(
+    output: Path,
+    sport: Optional[str],
+    year: Optional[int],
+    after: Optional[datetime],
+    before: Optional[datetime],
+    min_km: Optional[float],
+    max_km: Optional[float],
+    sort: str,
+    limit: int,
+) -> None:
+    """Find activities in the local database."""
+    database = open_database(output)
+    if year:
+        after = max(after, datetime(year, 1, 1)) if after else datetime(year, 1, 1)
+        before = min(before, datetime(year + 1, 1, 1)) if before else datetime(year + 1, 1, 1)
+
+    rows = database.find(
+        sport=sport,
+        after=after,
+        before=before,
+        min_distance=min_km * 1000 if min_km is not None else None,
+        max_distance=max_km * 1000 if max_km is not None else None,
+        order_by=sort,
+        limit=limit,
+    )
+    for row in rows:
+        click.echo(
+            f"{row['start_date'][:10]}  {get_sport_icon(row['sport_type'])} "
+            f"{row['sport_type']:<12} {row['distance'] / 1000:>7.1f} km  "
+            f"{format_duration(row['moving_time']):>8}  {row['name']}"
+        )
+    click.echo(f"{len(rows)} activities")
+
+
+@main.command()
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option(
+    "--by",
+    "group_by",
+    type=click.Choice(sorted(STATS_GROUPS)),
+    default="sport",
+    help="Group totals by sport, year or month",
+)
+def stats(output: Path, group_by: str) -> None:
+    """Show activity totals from the local database."""
+    database = open_database(output)
+    rows = database.stats(group_by)
+
+    header = f"{group_by.capitalize():<14} {'Count':>6} {'Distance':>12} {'Time':>10} {'Elev':>9}"
+    click.echo(header)
+    click.echo("-" * len(header))
+    for row in rows:
+        click.echo(
+            f"{row['grp']:<14} {row['count']:>6} {row['distance'] / 1000:>9.1f} km "
+            f"{format_duration(row['moving_time']):>10} {row['elevation_gain']:>7.0f} m"
+        )
+
+
+@main.command()
+@click.argument("terms", nargs=-1, required=True)
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option("--sport", help="Sport type, e.g. Ride or Run")
+@click.option(
+    "--after",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only activities on or after this date (YYYY-MM-DD)",
+)
+@click.option(
+    "--before",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only activities before this date (YYYY-MM-DD)",
+)
+@click.option("--min-km", type=float, help="Minimum distance in kilometers")
+@click.option("--max-km", type=float, help="Maximum distance in kilometers")
+@click.option("--limit", type=int, default=20, help="Maximum number of results")
+def search(
+    terms: tuple[str, ...],
+    output: Path,
+    sport: Optional[str],
+    after: Optional[datetime],
+    before: Optional[datetime],
+    min_km: Optional[float],
+    max_km: Optional[float],
+    limit: int,
+) -> None:
+    """Search activity names, descriptions and sport types."""
+    if not output.is_dir():
+        click.echo(f"❌ No activities in {output}. Run 'strava-to-obsidian export' first.")
+        raise SystemExit(1)
+    exporter = ActivityExporter(output)
+    exporter.ensure_index()
+    search_index = open_search_index(exporter)
+
+    start = time.perf_counter()
+    results = search_index.search(
+        " ".join(terms),
+        sport=sport,
+        after=after,
+        before=before,
+        min_distance=min_km * 1000 if min_km is not None else None,
+        max_distance=max_km * 1000 if max_km is not None else None,
+        limit=limit,
+    )
+    elapsed = time.perf_counter() - start
+    search_index.close()
+
+    for result in results:
+        click.echo(
+            f"{result.start_date[:10]}  {get_sport_icon(result.sport_type)} "
+            f"{result.distance / 1000:>6.1f} km  {result.name}"
+        )
+        click.echo(f"             {result.file_path}")
+        if result.snippet:
+            click.echo(f"             {result.snippet}")
+    click.echo(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+
+
+@main.command()
+@click.argument("location")
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option(
+    "--radius", "-r",
+    type=float,
+    default=500.0,
+    help="Search radius in meters",
+)
+@click.option("--limit", type=int, default=50, help="Maximum number of results")
+def near(location: str, output: Path, radius: float, limit: int) -> None:
+    """Find activities that start or end near LAT,LON."""
+    try:
+        lat, lng = (float(part) for part in location.split(","))
+    except ValueError:
+        click.echo("❌ Location must be LAT,LON, e.g. 51.5007,-0.1246")
+        raise SystemExit(1)
+
+    exporter = ActivityExporter(output)
+    exporter.ensure_index()
+    spatial_index = open_spatial_index(exporter)
+
+    start = time.perf_counter()
+    matches = spatial_index.near(lat, lng, radius)
+    elapsed = time.perf_counter() - start
+
+    for match in matches[:limit]:
+        entry = exporter.index.get(match.activity_id)
+        label = entry.file_path if entry else f"activity {match.activity_id}"
+        click.echo(f"{match.distance:>7.0f} m  {match.point:<5}  {label}")
+    click.echo(f"{len(matches)} activities within {radius:.0f} m ({elapsed * 1000:.2f} ms)")
+
+
+@main.command("heatmap")
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+def heatmap_command(output: Path) -> None:
+    """Redraw the lifetime heatmap image from its count grid."""
+    exporter = ActivityExporter(output)
+    exporter.ensure_index()
+    grid = open_heatmap(exporter)
+
+    start = time.perf_counter()
+    path = exporter.media_dir / HEATMAP_IMAGE
+    written = write_heatmap(grid, path)
+    elapsed = time.perf_counter() - start
+    grid.close()
+
+    if not written:
+        click.echo("No GPS tracks in the heatmap yet. Run an export with --heatmap first.")
+        return
+    click.echo(
+        f"🔥 {path} from {len(grid)} activities "
+        f"(zoom {grid.zoom}, {elapsed * 1000:.0f} ms)"
+    )
+
+
+@main.command("export-table")
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files",
+)
+@click.option(
+    "--file", "-f",
+    "table_file",
+    type=click.Path(path_type=Path),
+    default=Path("activities.csv"),
+    help="File to write the activities table to",
+)
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(TABLE_FORMATS),
+    help="Table format (default: from the file extension)",
+)
+@click.option(
+    "--laps",
+    is_flag=True,
+    help="Also write laps to <file>_laps (needs the database from 'export --db')",
+)
+def export_table(output: Path, table_file: Path, fmt: Optional[str], laps: bool) -> None:
+    """Write every activity's metrics as a table for analysis."""
+    db_path = output / DATA_DIRNAME / DB_FILENAME
+    if laps and not db_path.exists():
+        click.echo("❌ Laps are only stored in the database. Run 'export --db' first.")
+        raise SystemExit(1)
+
+    fmt = fmt or ("parquet" if table_file.suffix == ".parquet" else "csv")
+    start = time.perf_counter()
+    try:
+        if db_path.exists():
+            database = ActivityDatabase(db_path)
+            rows = rows_from_database(database.conn, "activities", ACTIVITY_COLUMNS)
+            count = write_table(table_file, ACTIVITY_TYPES, rows, fmt)
+            if laps:
+                laps_file = table_file.with_name(f"{table_file.stem}_laps{table_file.suffix}")
+                lap_rows = rows_from_database(database.conn, "laps", LAP_COLUMNS)
+                lap_count = write_table(laps_file, LAP_TYPES, lap_rows, fmt)
+                click.echo(f"📄 Wrote {lap_count} laps to {laps_file}")
+            database.close()
+        else:
+            exporter = ActivityExporter(output)
+            exporter.ensure_index()
+            rows = activity_rows_from_notes(output, exporter.index)
+            count = write_table(table_file, ACTIVITY_TYPES, rows, fmt)
+    except RuntimeError as e:
+        click.echo(f"❌ {e}")
+        raise SystemExit(1)
+
+    elapsed = time.perf_counter() - start
+    click.echo(f"📄 Wrote {count} activities to {table_file} in {elapsed:.2f}s")
+
+
+def print_archive_stats(output: Path) -> None:
+    """Print statistics for the activities exported to an output directory."""
+    exporter = ActivityExporter(output)
+    exporter.ensure_index()
+    start = time.perf_counter()
+    stats = compute_stats(exporter.metrics)
+    elapsed = time.perf_counter() - start
+
+    click.echo("")
+    click.echo(f"Archive Statistics ({output})")
+    click.echo("=" * 40)
+    if not stats.total.count:
+        click.echo("No activities exported yet")
+        return
+
+    def line(label: str, totals: Totals) -> str:
+        return (
+            f"   {label:<18} {totals.count:>6}  {totals.distance / 1000:>10,.1f} km  "
+            f"{format_duration(totals.moving_time):>10}  {totals.elevation:>9,.0f} m"
+        )
+
+    click.echo(line("Total", stats.total))
+    click.echo("")
+    click.echo("By sport:")
+    for sport, totals in sorted(stats.by_sport.items(), key=lambda item: -item[1].count):
+        click.echo(line(f"{get_sport_icon(sport)} {sport}", totals))
+    click.echo("")
+    click.echo("By year:")
+    for year, totals in sorted(stats.by_year.items(), reverse=True):
+        click.echo(line(str(year), totals))
+
+    click.echo("")
+    click.echo("Distance:")
+    peak = max(stats.distance_histogram) or 1
+    edges = list(DISTANCE_BINS_KM)
+    for i, count in enumerate(stats.distance_histogram):
+        label = f"{edges[i]:g}–{edges[i + 1]:g} km" if i + 1 < len(edges) else f"{edges[i]:g}+ km"
+        bar = "█" * round(30 * count / peak)
+        click.echo(f"   {label:<14} {bar} {count}")
+
+    click.echo("")
+    if stats.longest_streak_end:
+        click.echo(
+            f"🔥 Longest streak: {stats.longest_streak} days "
+            f"(ending {stats.longest_streak_end.isoformat()})"
+        )
+    click.echo(f"   Current streak: {stats.current_streak} days")
+    weekday = stats.most_active_weekday
+    if weekday:
+        click.echo(
+            f"📆 Most active weekday: {weekday} "
+            f"({max(stats.weekday_counts)} activities)"
+        )
+    click.echo(f"   Computed in {elapsed * 1000:.1f} ms")
+
+
+@main.command()
+@click.option(
+    "--stats",
+    "show_stats",
+    is_flag=True,
+    help="Also show statistics for the exported archive",
+)
+@click.option(
+    "--output", "-o",
+    type=click.Path(path_type=Path),
+    default=Path("./activities"),
+    help="Output directory containing exported files (for --stats)",
+)
+@click.pass_context
+def status(ctx: click.Context, show_stats: bool, output: Path) -> None:
+    """Show authentication and sync status."""
+    config: Config = ctx.obj["config"]
+
+    click.echo("Strava to Obsidian Status")
+    click.echo("=" * 40)
+
+    # Credentials
+    if config.has_valid_credentials():
+        click.echo(f"✅ API credentials configured")
+        click.echo(f"   Client ID: {config.strava.client_id[:8]}...")
+    else:
+        click.echo("❌ API credentials not configured")
+        click.echo("   Set STRAVA_CLIENT_ID and STRAVA_CLIENT_SECRET")
+
+    # Tokens
+    if config.has_tokens():
         click.echo(f"✅ OAuth tokens present")
         click.echo(f"   Token file: {config.token_file}")
 
@@ -293,6 +2089,9 @@ def status(ctx: click.Context) -> None:
         click.echo("❌ Not authenticated")
         click.echo("   Run 'strava-to-obsidian auth' to authenticate")
 
+    if show_stats:
+        print_archive_stats(output)
+
 
 if __name__ == "__main__":
     main()
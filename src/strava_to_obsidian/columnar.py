@@ -0,0 +1,277 @@
+"""Compact columnar store of per-activity metrics for archive-wide aggregates."""
+
+import os
+import re
+import struct
+import sys
+from array import array
+from collections.abc import Iterator
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+
+METRICS_FILENAME = "metrics.bin"
+
+# Columns and their array typecodes, one row per activity
+COLUMNS: dict[str, str] = {
+    "id": "q",  # Strava activity ID
+    "day": "i",  # local start date as a proleptic Gregorian ordinal
+    "sport": "H",  # index into the store's sport names
+    "distance": "f",  # meters
+    "moving_time": "I",  # seconds
+    "elapsed_time": "I",  # seconds
+    "elevation": "f",  # meters gained
+}
+
+# File layout: header, a free-form blob (e.g. names), then 8-byte aligned columns
+MAGIC = b"S2OM"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBcxII")  # magic, version, column count, byte order, rows, blob size
+ALIGN = 8
+
+
+def pack_columns(magic: bytes, columns: dict[str, array], blob: bytes = b"") -> bytes:
+    """Serialize equal-length typed columns (in insertion order) and a blob."""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    byteorder = b"<" if sys.byteorder == "little" else b">"
+    parts = [HEADER.pack(magic, FORMAT_VERSION, len(columns), byteorder, rows, len(blob)), blob]
+    offset = HEADER.size + len(blob)
+    for column in columns.values():
+        padding = -offset % ALIGN
+        data = column.tobytes()
+        parts.extend([b"\0" * padding, data])
+        offset += padding + len(data)
+    return b"".join(parts)
+
+
+def unpack_columns(
+    data: bytes, magic: bytes, spec: dict[str, str]
+) -> tuple[dict[str, array], bytes]:
+    """
+    Read columns written by pack_columns.
+
+    Raises:
+        ValueError: If the data isn't a column file with the expected columns
+    """
+    file_magic, version, count, byteorder, rows, blob_size = HEADER.unpack_from(data, 0)
+    if file_magic != magic or version != FORMAT_VERSION or count != len(spec):
+        raise ValueError("Unexpected column file")
+
+    offset = HEADER.size
+    blob = data[offset:offset + blob_size]
+    offset += blob_size
+
+    swap = byteorder != (b"<" if sys.byteorder == "little" else b">")
+    view = memoryview(data)
+    columns = {}
+    for name, code in spec.items():
+        offset += -offset % ALIGN
+        column = array(code)
+        size = column.itemsize * rows
+        column.frombytes(view[offset:offset + size])
+        if swap:
+            column.byteswap()
+        columns[name] = column
+        offset += size
+    return columns, blob
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace a file's contents via a temporary file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class MetricsStore:
+    """
+    Per-activity metrics kept as parallel typed arrays.
+
+    Aggregates over the whole archive run over a few contiguous arrays instead
+    of thousands of notes. Rows are upserted by activity ID as activities are
+    exported, and the days touched since the last call to ``take_touched`` are
+    tracked so derived notes can be refreshed incrementally.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.columns: dict[str, array] = {name: array(code) for name, code in COLUMNS.items()}
+        self.sports: list[str] = []
+        self._sport_codes: dict[str, int] = {}
+        self._rows: dict[int, int] = {}
+        self._touched: set[int] = set()
+        self._dirty = False
+
+        try:
+            self.columns, names = unpack_columns(path.read_bytes(), MAGIC, COLUMNS)
+            self.sports = names.decode("utf-8").split("\n") if names else []
+        except (OSError, ValueError, struct.error):
+            pass
+
+        self._sport_codes = {name: code for code, name in enumerate(self.sports)}
+        self._rows = dict(zip(self.columns["id"], range(len(self.columns["id"]))))
+
+    def exists(self) -> bool:
+        """Check if the store has been written."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def __contains__(self, activity_id: object) -> bool:
+        return activity_id in self._rows
+
+    def sport_code(self, sport_type: str) -> int:
+        """Code for a sport type, registering it if new."""
+        code = self._sport_codes.get(sport_type)
+        if code is None:
+            code = len(self.sports)
+            self.sports.append(sport_type)
+            self._sport_codes[sport_type] = code
+        return code
+
+    def upsert(
+        self,
+        activity_id: int,
+        day: date,
+        sport_type: str,
+        distance: float,
+        moving_time: int,
+        elapsed_time: int,
+        elevation: float,
+    ) -> None:
+        """Add an activity's metrics or replace the ones stored for it."""
+        values = {
+            "id": activity_id,
+            "day": day.toordinal(),
+            "sport": self.sport_code(sport_type),
+            "distance": distance,
+            "moving_time": max(int(moving_time), 0),
+            "elapsed_time": max(int(elapsed_time), 0),
+            "elevation": elevation,
+        }
+        row = self._rows.get(activity_id)
+        if row is None:
+            self._rows[activity_id] = len(self)
+            for name, value in values.items():
+                self.columns[name].append(value)
+        else:
+            self._touched.add(self.columns["day"][row])
+            for name, value in values.items():
+                self.columns[name][row] = value
+        self._touched.add(values["day"])
+        self._dirty = True
+
+    def remove(self, activity_id: int) -> bool:
+        """Remove an activity's metrics, returning whether it was stored."""
+        row = self._rows.pop(activity_id, None)
+        if row is None:
+            return False
+        self._touched.add(self.columns["day"][row])
+        # Move the last row into the gap rather than shifting every column
+        last = len(self) - 1
+        for column in self.columns.values():
+            column[row] = column[last]
+            del column[last]
+        if row != last:
+            self._rows[self.columns["id"][row]] = row
+        self._dirty = True
+        return True
+
+    def add_activity(self, activity: Activity) -> None:
+        """Upsert the metrics of an exported activity."""
+        self.upsert(
+            activity.id,
+            activity.start_date_local.date(),
+            activity.sport_type,
+            activity.distance,
+            activity.moving_time,
+            activity.elapsed_time,
+            activity.total_elevation_gain,
+        )
+
+    def take_touched(self) -> set[int]:
+        """Day ordinals changed since the last call, clearing the set."""
+        touched, self._touched = self._touched, set()
+        return touched
+
+    def save(self) -> None:
+        """Write the store if it changed."""
+        if not self._dirty:
+            return
+        names = "\n".join(self.sports).encode("utf-8")
+        write_atomic(self.path, pack_columns(MAGIC, self.columns, names))
+        self._dirty = False
+
+
+FIELD_RE = re.compile(r"^(\w+):\s*\"?(.*?)\"?\s*$")
+ITEM_RE = re.compile(r"^\s+-\s*(.*?)\s*$")
+
+
+def read_note_metrics(path: Path) -> Optional[dict[str, str]]:
+    """
+    Read the frontmatter fields of an activity note as strings.
+
+    Block lists (``coordinates``, ``tags``...) are joined with commas.
+    """
+    fields: dict[str, str] = {}
+    key = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.readline().strip() != "---":
+                return None
+            for line in f:
+                if line.startswith("---"):
+                    break
+                match = FIELD_RE.match(line)
+                if match:
+                    key = match.group(1)
+                    fields[key] = match.group(2)
+                    continue
+                item = ITEM_RE.match(line)
+                if item and key is not None:
+                    fields[key] = f"{fields[key]},{item.group(1)}" if fields[key] else item.group(1)
+    except (OSError, UnicodeDecodeError):
+        return None
+    return fields if "strava_id" in fields else None
+
+
+def _notes(output_dir: Path, index: ActivityIndex) -> Iterator[tuple[int, dict[str, str]]]:
+    for entry in index:
+        fields = read_note_metrics(output_dir / entry.file_path)
+        if fields is not None:
+            yield entry.strava_id, fields
+
+
+def backfill_metrics(store: MetricsStore, output_dir: Path, index: ActivityIndex) -> int:
+    """
+    Fill the store from the frontmatter of notes exported before it existed.
+
+    Only needed once per vault; afterwards the store is kept current by exports.
+
+    Returns:
+        Number of activities added
+    """
+    added = 0
+    for activity_id, fields in _notes(output_dir, index):
+        if activity_id in store:
+            continue
+        try:
+            store.upsert(
+                activity_id,
+                date.fromisoformat(fields["date"][:10]),
+                fields.get("sport_type", "Workout"),
+                float(fields.get("distance_m", 0)),
+                int(fields.get("moving_time", 0)),
+                int(fields.get("elapsed_time", 0)),
+                float(fields.get("elevation_gain_m", 0)),
+            )
+        except (KeyError, ValueError):
+            continue
+        added += 1
+    store.take_touched()
+    return added
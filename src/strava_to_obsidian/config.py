@@ -8,6 +8,16 @@ from typing import Optional
 
 from dotenv import load_dotenv
 
+from strava_to_obsidian.duplicates import DUPLICATE_POLICIES
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer environment variable, falling back to a default."""
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
 
 @dataclass
 class StravaConfig:
@@ -30,6 +40,26 @@ class Config:
     # Token file location
     token_file: Path = field(default_factory=lambda: Path(".strava_tokens.json"))
 
+    # Heart-rate profile for zones and training load
+    max_heartrate: int = 190
+    resting_heartrate: int = 60
+
+    # CSV of named places (name,lat,lon[,radius]) used to tag notes
+    places_file: Optional[Path] = None
+
+    # Photo post-processing (with --thumbnails): cap on the longest edge of
+    # full-size photos (0 keeps them as downloaded), and whether to keep the
+    # unshrunk files in .strava/originals/
+    max_photo_size: int = 0
+    keep_original_photos: bool = False
+
+    # What to do with an activity that overlaps one of the same sport already
+    # exported (recorded on two devices): link, merge or skip; empty to not check
+    duplicate_policy: str = ""
+
+    # Shared secret Strava echoes back when validating the webhook callback URL
+    webhook_verify_token: str = ""
+
     @classmethod
     def load(cls, config_path: Optional[Path] = None) -> "Config":
         """Load configuration from file and environment variables."""
@@ -41,6 +71,18 @@ class Config:
         # Load from environment variables (including those from .env)
         config.strava.client_id = os.environ.get("STRAVA_CLIENT_ID", "")
         config.strava.client_secret = os.environ.get("STRAVA_CLIENT_SECRET", "")
+        config.max_heartrate = _env_int("STRAVA_MAX_HEARTRATE", config.max_heartrate)
+        config.resting_heartrate = _env_int("STRAVA_RESTING_HEARTRATE", config.resting_heartrate)
+        if os.environ.get("STRAVA_PLACES_FILE"):
+            config.places_file = Path(os.environ["STRAVA_PLACES_FILE"]).expanduser()
+        config.max_photo_size = _env_int("STRAVA_MAX_PHOTO_SIZE", config.max_photo_size)
+        config.keep_original_photos = os.environ.get(
+            "STRAVA_KEEP_ORIGINAL_PHOTOS", ""
+        ).lower() in ("1", "true", "yes")
+        policy = os.environ.get("STRAVA_DUPLICATE_POLICY", "").lower()
+        if policy in DUPLICATE_POLICIES:
+            config.duplicate_policy = policy
+        config.webhook_verify_token = os.environ.get("STRAVA_WEBHOOK_VERIFY_TOKEN", "")
 
         # Load tokens from token file if it exists
         token_file = config_path.parent / ".strava_tokens.json" if config_path else config.token_file
@@ -0,0 +1,198 @@
+"""Resident sync: poll Strava on a schedule fitted to the athlete and the API quota."""
+
+import json
+import signal
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from strava_to_obsidian.api import RateLimitInfo
+from strava_to_obsidian.columnar import write_atomic
+
+CLOCK_FILENAME = "clock.json"
+HOURS_PER_WEEK = 7 * 24
+
+# Strava's 15-minute windows start on the quarter hour; the daily one at midnight UTC
+WINDOW_SECONDS = 15 * 60
+
+
+def hour_of_week(when: datetime) -> int:
+    """Hour of the week, 0 for Monday 00:00-01:00."""
+    return when.weekday() * 24 + when.hour
+
+
+class ActivityClock:
+    """
+    When the athlete's activities usually finish, by local hour of the week.
+
+    Activities are uploaded as they finish, so these are the hours worth
+    polling often. Every hour keeps a small share of the weight, so an
+    activity at an unusual time is still picked up, only later.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.counts = [0] * HOURS_PER_WEEK
+        self._dirty = False
+        try:
+            counts = json.loads(path.read_text(encoding="utf-8"))["counts"]
+            if len(counts) == HOURS_PER_WEEK:
+                self.counts = [int(count) for count in counts]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+    def add(self, start: datetime, elapsed_time: int) -> None:
+        """Count an activity by the hour it finished in."""
+        self.counts[hour_of_week(start + timedelta(seconds=max(elapsed_time, 0)))] += 1
+        self._dirty = True
+
+    def add_summary(self, summary: dict[str, Any]) -> bool:
+        """Count an activity from its API summary, returning whether it had a start time."""
+        try:
+            start = datetime.fromisoformat(summary["start_date_local"].replace("Z", ""))
+        except (KeyError, AttributeError, ValueError):
+            return False
+        self.add(start, int(summary.get("elapsed_time") or 0))
+        return True
+
+    def weight(self, hour: int) -> float:
+        """
+        Relative chance of a new activity turning up in an hour of the week.
+
+        Counts the activities that finished in the hour, half of those in the
+        hour before (they may still be syncing from a watch), plus a floor.
+        """
+        floor = max(len(self) / HOURS_PER_WEEK, 1.0) / 4
+        return floor + self.counts[hour] + self.counts[hour - 1] / 2
+
+    def save(self) -> None:
+        """Write the counts if they changed."""
+        if not self._dirty:
+            return
+        write_atomic(self.path, json.dumps({"counts": self.counts}).encode("utf-8"))
+        self._dirty = False
+
+
+class PollScheduler:
+    """
+    Spreads a day's polls over the hours the athlete's activities usually
+    finish in, within the API quota left.
+
+    The polls left for the day are the target rate for the rest of it, or
+    fewer if that's all the daily quota (less a reserve) allows. Each hour
+    until the daily reset gets a share of them in proportion to its weight on
+    the activity clock, and the delay until the next poll is the current
+    hour's share turned into an interval.
+    """
+
+    def __init__(
+        self,
+        clock: ActivityClock,
+        daily_polls: int = 48,
+        min_interval: float = 300,
+        max_interval: float = 3600,
+        reserve: int = 100,
+        requests_per_poll: float = 2.0,
+    ):
+        self.clock = clock
+        self.daily_polls = daily_polls
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.reserve = reserve  # daily requests left alone for other commands
+        self.requests_per_poll = requests_per_poll  # a listing plus the odd detail fetch
+
+    def next_poll(
+        self, rate_limit: RateLimitInfo, now: datetime, utc_now: datetime
+    ) -> float:
+        """
+        Seconds to wait before the next poll.
+
+        Args:
+            rate_limit: Quota as of the last request
+            now: Current local time, on the activities' clock
+            utc_now: Current time in UTC, on the quota's clock
+        """
+        midnight = datetime.combine(utc_now.date(), datetime.min.time(), utc_now.tzinfo)
+        until_reset = (midnight + timedelta(days=1) - utc_now).total_seconds()
+        if rate_limit.remaining_15min < self.requests_per_poll:
+            into_window = (utc_now.minute * 60 + utc_now.second) % WINDOW_SECONDS
+            return min(WINDOW_SECONDS - into_window + 5, until_reset + 5)
+        budget = min(
+            (rate_limit.remaining_daily - self.reserve) / self.requests_per_poll,
+            self.daily_polls * until_reset / 86400,
+        )
+        if budget < 1:
+            return until_reset + 60
+
+        # Weights of the hours from now until the reset, the current one pro rata
+        into_hour = (now.minute * 60 + now.second) / 3600
+        weights = [self.clock.weight(hour_of_week(now)) * (1 - into_hour)]
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        for step in range(1, int((until_reset / 3600) + into_hour) + 1):
+            weights.append(self.clock.weight(hour_of_week(hour + timedelta(hours=step))))
+        share = budget * weights[0] / (1 - into_hour) / sum(weights)
+
+        interval = max(3600 / share, self.min_interval)
+        if budget * self.max_interval >= until_reset:
+            interval = min(interval, self.max_interval)
+        return interval
+
+
+@contextmanager
+def stop_on_signals(
+    stop: threading.Event, on_stop: Optional[Callable[[], None]] = None
+) -> Iterator[None]:
+    """
+    Set ``stop`` on SIGINT or SIGTERM instead of interrupting whatever is
+    running, until the block ends.
+    """
+
+    def handle(signum: int, frame: Any) -> None:
+        if not stop.is_set() and on_stop:
+            on_stop()
+        stop.set()
+
+    previous = {signum: signal.signal(signum, handle) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        yield
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def poll_until_stopped(
+    poll: Callable[[], None],
+    scheduler: PollScheduler,
+    rate_limit: RateLimitInfo,
+    stop: threading.Event,
+    now: Callable[[], datetime] = datetime.now,
+    on_wait: Optional[Callable[[float], None]] = None,
+    max_polls: Optional[int] = None,
+) -> int:
+    """
+    Poll until ``stop`` is set, sleeping as long as the scheduler says in between.
+
+    A poll always runs to completion; ``stop`` is only acted on between polls
+    (the poll itself may check it to end early at a safe point).
+
+    Returns:
+        Number of polls made
+    """
+    polls = 0
+    while not stop.is_set() and (max_polls is None or polls < max_polls):
+        poll()
+        polls += 1
+        if stop.is_set() or polls == max_polls:
+            break
+        local = now()
+        delay = scheduler.next_poll(rate_limit, local, local.astimezone(timezone.utc))
+        if on_wait:
+            on_wait(delay)
+        stop.wait(delay)
+    return polls
@@ -0,0 +1,304 @@
+"""Optional SQLite database of exported activities and laps."""
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from strava_to_obsidian.columnar import read_note_metrics
+from strava_to_obsidian.hooks import ExportHook
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+
+DB_FILENAME = "activities.db"
+
+# Rows written per transaction; matches the API's activity list page size
+BATCH_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    sport_type TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    distance REAL NOT NULL DEFAULT 0,
+    moving_time INTEGER NOT NULL DEFAULT 0,
+    elapsed_time INTEGER NOT NULL DEFAULT 0,
+    average_speed REAL NOT NULL DEFAULT 0,
+    max_speed REAL,
+    elevation_gain REAL NOT NULL DEFAULT 0,
+    average_heartrate REAL,
+    max_heartrate INTEGER,
+    calories REAL,
+    start_lat REAL,
+    start_lng REAL,
+    file_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_activities_start_date ON activities (start_date);
+CREATE INDEX IF NOT EXISTS idx_activities_sport_type
+    ON activities (sport_type COLLATE NOCASE, start_date);
+CREATE INDEX IF NOT EXISTS idx_activities_distance ON activities (distance);
+
+CREATE TABLE IF NOT EXISTS laps (
+    activity_id INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+    lap_index INTEGER NOT NULL,
+    distance REAL NOT NULL DEFAULT 0,
+    elapsed_time INTEGER NOT NULL DEFAULT 0,
+    average_speed REAL NOT NULL DEFAULT 0,
+    average_heartrate REAL,
+    elevation_gain REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (activity_id, lap_index)
+);
+"""
+
+ACTIVITY_COLUMNS = (
+    "id", "name", "sport_type", "start_date", "distance", "moving_time", "elapsed_time",
+    "average_speed", "max_speed", "elevation_gain", "average_heartrate", "max_heartrate",
+    "calories", "start_lat", "start_lng", "file_path",
+)
+LAP_COLUMNS = (
+    "activity_id", "lap_index", "distance", "elapsed_time", "average_speed",
+    "average_heartrate", "elevation_gain",
+)
+
+INSERT_ACTIVITY = (
+    f"INSERT OR REPLACE INTO activities ({', '.join(ACTIVITY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(ACTIVITY_COLUMNS))})"
+)
+INSERT_LAP = (
+    f"INSERT OR REPLACE INTO laps ({', '.join(LAP_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(LAP_COLUMNS))})"
+)
+
+STATS_GROUPS = {
+    "sport": "sport_type",
+    "year": "substr(start_date, 1, 4)",
+    "month": "substr(start_date, 1, 7)",
+}
+
+
+def activity_row(activity: Activity, file_path: Optional[str] = None) -> tuple:
+    """Database row for an activity."""
+    lat = lng = None
+    if activity.start_latlng and len(activity.start_latlng) == 2:
+        lat, lng = activity.start_latlng
+    return (
+        activity.id,
+        activity.name,
+        activity.sport_type,
+        activity.start_date_local.strftime("%Y-%m-%dT%H:%M:%S"),
+        activity.distance,
+        activity.moving_time,
+        activity.elapsed_time,
+        activity.average_speed,
+        activity.max_speed,
+        activity.total_elevation_gain,
+        activity.average_heartrate,
+        activity.max_heartrate,
+        activity.calories,
+        lat,
+        lng,
+        file_path,
+    )
+
+
+def note_row(strava_id: int, file_path: str, fields: dict[str, str]) -> tuple:
+    """Database row for an activity from its note's frontmatter fields."""
+
+    def number(key: str, kind: type = float) -> Any:
+        try:
+            return kind(fields[key])
+        except (KeyError, ValueError):
+            return None
+
+    return (
+        strava_id,
+        fields.get("name", ""),
+        fields.get("sport_type", "Workout"),
+        fields["date"],
+        number("distance_m") or 0.0,
+        number("moving_time", int) or 0,
+        number("elapsed_time", int) or 0,
+        number("average_speed_ms") or 0.0,
+        number("max_speed_ms"),
+        number("elevation_gain_m") or 0.0,
+        number("average_heartrate"),
+        number("max_heartrate", int),
+        number("calories"),
+        None,
+        None,
+        file_path,
+    )
+
+
+class ActivityDatabase:
+    """
+    SQLite store of activity metrics.
+
+    Rows are buffered and written with ``executemany`` in one transaction per
+    batch, so adding an activity during export costs a tuple append rather than
+    a commit.
+    """
+
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.created = not path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # Replacing or deleting an activity drops its laps (ON DELETE CASCADE)
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._activities: list[tuple] = []
+        self._laps: dict[int, list[tuple]] = {}
+
+    def add(self, activity: Activity, file_path: Optional[str] = None) -> None:
+        """Queue an activity (and its laps) for the next batch."""
+        self._activities.append(activity_row(activity, file_path))
+        self._laps[activity.id] = [
+            (
+                activity.id,
+                lap.lap_index,
+                lap.distance,
+                lap.elapsed_time,
+                lap.average_speed,
+                lap.average_heartrate,
+                lap.total_elevation_gain,
+            )
+            for lap in activity.laps
+        ]
+        if len(self._activities) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write queued rows in a single transaction."""
+        if not self._activities:
+            return
+        with self.conn:
+            self.conn.executemany(INSERT_ACTIVITY, self._activities)
+            self.conn.executemany(INSERT_LAP, [lap for laps in self._laps.values() for lap in laps])
+        self._activities = []
+        self._laps = {}
+
+    def remove(self, activity_id: int) -> None:
+        """Delete an activity and its laps, including any still queued."""
+        self._activities = [row for row in self._activities if row[0] != activity_id]
+        self._laps.pop(activity_id, None)
+        with self.conn:
+            self.conn.execute("DELETE FROM activities WHERE id = ?", (activity_id,))
+
+    def close(self) -> None:
+        """Flush and close the connection."""
+        self.flush()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+
+    def find(
+        self,
+        sport: Optional[str] = None,
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None,
+        min_distance: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        order_by: str = "date",
+        limit: Optional[int] = None,
+    ) -> list[sqlite3.Row]:
+        """
+        Find activities matching the given filters.
+
+        Args:
+            sport: Sport type (case-insensitive)
+            after: Only activities starting on or after this time
+            before: Only activities starting before this time
+            min_distance: Minimum distance in meters
+            max_distance: Maximum distance in meters
+            order_by: "date" (newest first), "distance" or "time" (largest first)
+            limit: Maximum number of rows
+        """
+        clauses: list[str] = []
+        params: list[Any] = []
+        if sport:
+            clauses.append("sport_type = ? COLLATE NOCASE")
+            params.append(sport)
+        if after:
+            clauses.append("start_date >= ?")
+            params.append(after.strftime("%Y-%m-%dT%H:%M:%S"))
+        if before:
+            clauses.append("start_date < ?")
+            params.append(before.strftime("%Y-%m-%dT%H:%M:%S"))
+        if min_distance is not None:
+            clauses.append("distance >= ?")
+            params.append(min_distance)
+        if max_distance is not None:
+            clauses.append("distance <= ?")
+            params.append(max_distance)
+
+        order = {
+            "date": "start_date DESC",
+            "distance": "distance DESC",
+            "time": "moving_time DESC",
+        }.get(order_by, "start_date DESC")
+
+        sql = "SELECT * FROM activities"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def stats(self, group_by: str = "sport") -> list[sqlite3.Row]:
+        """Count, distance, moving time and elevation totals per sport, year or month."""
+        if group_by not in STATS_GROUPS:
+            raise ValueError(f"Cannot group by {group_by!r}; use one of {', '.join(STATS_GROUPS)}")
+        key = STATS_GROUPS[group_by]
+        return self.conn.execute(
+            f"SELECT {key} AS grp, COUNT(*) AS count, SUM(distance) AS distance, "
+            f"SUM(moving_time) AS moving_time, SUM(elevation_gain) AS elevation_gain "
+            f"FROM activities GROUP BY grp ORDER BY distance DESC"
+        ).fetchall()
+
+    def backfill(self, output_dir: Path, index: ActivityIndex) -> int:
+        """
+        Add activities exported before the database existed, from note frontmatter.
+
+        Laps aren't stored in frontmatter, so backfilled activities have none
+        until they are exported again.
+
+        Returns:
+            Number of activities added
+        """
+        added = 0
+        for entry in index:
+            fields = read_note_metrics(output_dir / entry.file_path)
+            if fields is None or "date" not in fields:
+                continue
+            self._activities.append(note_row(entry.strava_id, entry.file_path, fields))
+            added += 1
+            if len(self._activities) >= self.batch_size:
+                self.flush()
+        self.flush()
+        return added
+
+
+class DatabaseHook(ExportHook):
+    """Adds exported activities to the SQLite database."""
+
+    def __init__(self, database: ActivityDatabase, output_dir: Path):
+        self.database = database
+        self.output_dir = output_dir
+
+    def record(self, activity: Activity, path: Path) -> None:
+        self.database.add(activity, path.relative_to(self.output_dir).as_posix())
+
+    def forget(self, activity_id: int) -> None:
+        self.database.remove(activity_id)
+
+    def flush(self) -> None:
+        self.database.flush()
@@ -0,0 +1,375 @@
+"""Detection of activities recorded twice (a watch and a phone, say)."""
+
+import calendar
+import operator
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import (
+    pack_columns,
+    read_note_metrics,
+    unpack_columns,
+    write_atomic,
+)
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.routes import sport_group
+
+INTERVALS_FILENAME = "intervals.bin"
+DUPLICATE_POLICIES = ("link", "merge", "skip")
+
+# Two activities are recordings of the same one if they share a sport and
+# overlap for at least this fraction of the shorter one
+MIN_OVERLAP = 0.5
+
+# Note fields a merge copies from the duplicate when the kept note lacks them
+MERGE_FIELDS = (
+    "description",
+    "average_heartrate",
+    "max_heartrate",
+    "calories",
+    "coordinates",
+    "end_coordinates",
+)
+
+# One row per activity, sorted by start time
+COLUMNS: dict[str, str] = {
+    "start": "q",  # local start, seconds since 1970-01-01 (as if UTC)
+    "end": "q",  # start + elapsed time
+    "id": "q",  # Strava activity ID
+    "sport": "H",  # index into the store's sport groups
+    "kept": "q",  # ID of the activity this was folded into, minus the one it links to, or 0
+}
+MAGIC = b"S2OI"
+
+# Rows per block of the interval index; a block is split when it doubles
+BLOCK = 512
+
+
+def local_seconds(activity: Activity) -> tuple[int, int]:
+    """An activity's (start, end) in seconds, from its local start and elapsed time."""
+    start = calendar.timegm(activity.start_date_local.timetuple())
+    return start, start + max(activity.elapsed_time, 1)
+
+
+class IntervalIndex:
+    """
+    Activity time spans kept as parallel arrays sorted by start time.
+
+    Rows are split into blocks of at most 2 * BLOCK rows, each a set of
+    parallel arrays of machine ints, with the first start of every block in a
+    separate list. An insert is a bisect over the block starts, another within
+    the block and a memmove of at most one block, so it stays cheap however
+    long the history is; a full block is split in two. Overlap queries are
+    binary searches too: a span can only overlap spans that start before it
+    ends and no earlier than its start minus the longest span stored.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.blocks: list[dict[str, array]] = []
+        self._firsts: list[int] = []  # first start in each block
+        self.sports: list[str] = []
+        self._dirty = False
+        columns = {name: array(code) for name, code in COLUMNS.items()}
+        try:
+            columns, names = unpack_columns(path.read_bytes(), MAGIC, COLUMNS)
+            self.sports = names.decode("utf-8").split("\n") if names else []
+        except (OSError, ValueError, struct.error):
+            pass
+        for first in range(0, len(columns["id"]), BLOCK):
+            self.blocks.append(
+                {name: column[first:first + BLOCK] for name, column in columns.items()}
+            )
+            self._firsts.append(columns["start"][first])
+        self._sport_codes = {name: code for code, name in enumerate(self.sports)}
+        self._starts = dict(zip(columns["id"], columns["start"]))
+        self.longest = self._longest()
+
+    @property
+    def columns(self) -> dict[str, array]:
+        """All rows as one array per column, in start order."""
+        columns = {name: array(code) for name, code in COLUMNS.items()}
+        for block in self.blocks:
+            for name, column in block.items():
+                columns[name].extend(column)
+        return columns
+
+    def exists(self) -> bool:
+        """Check if the index has been written."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __contains__(self, activity_id: object) -> bool:
+        return activity_id in self._starts
+
+    def _sport_code(self, sport: str) -> int:
+        code = self._sport_codes.get(sport)
+        if code is None:
+            code = len(self.sports)
+            self.sports.append(sport)
+            self._sport_codes[sport] = code
+        return code
+
+    def _longest(self) -> int:
+        return max(
+            (
+                max(map(operator.sub, block["end"], block["start"]), default=0)
+                for block in self.blocks
+            ),
+            default=0,
+        )
+
+    def _locate(self, activity_id: int) -> Optional[tuple[int, int]]:
+        """(block, row) holding an activity, or None."""
+        start = self._starts.get(activity_id)
+        if start is None:
+            return None
+        # Rows with equal starts may straddle blocks
+        first = max(bisect_left(self._firsts, start) - 1, 0)
+        for b in range(first, bisect_right(self._firsts, start)):
+            starts = self.blocks[b]["start"]
+            ids = self.blocks[b]["id"]
+            for row in range(bisect_left(starts, start), bisect_right(starts, start)):
+                if ids[row] == activity_id:
+                    return b, row
+        return None
+
+    def add(
+        self, activity_id: int, start: int, end: int, sport_type: str, kept: int = 0
+    ) -> None:
+        """Add an activity's span, replacing the one stored for it."""
+        self.remove(activity_id)
+        values = {
+            "start": start,
+            "end": end,
+            "id": activity_id,
+            "sport": self._sport_code(sport_group(sport_type)),
+            "kept": kept,
+        }
+        if not self.blocks:
+            self.blocks.append({name: array(code) for name, code in COLUMNS.items()})
+            self._firsts.append(start)
+        b = max(bisect_right(self._firsts, start) - 1, 0)
+        block = self.blocks[b]
+        row = bisect_right(block["start"], start)
+        for name, value in values.items():
+            block[name].insert(row, value)
+        self._firsts[b] = block["start"][0]
+        if len(block["id"]) > 2 * BLOCK:
+            upper = {name: column[BLOCK:] for name, column in block.items()}
+            for column in block.values():
+                del column[BLOCK:]
+            self.blocks.insert(b + 1, upper)
+            self._firsts.insert(b + 1, upper["start"][0])
+        self._starts[activity_id] = start
+        self.longest = max(self.longest, end - start)
+        self._dirty = True
+
+    def remove(self, activity_id: int) -> bool:
+        """Remove an activity's span, returning whether there was one."""
+        found = self._locate(activity_id)
+        if found is None:
+            return False
+        b, row = found
+        block = self.blocks[b]
+        span = block["end"][row] - block["start"][row]
+        for column in block.values():
+            del column[row]
+        if block["id"]:
+            self._firsts[b] = block["start"][0]
+        else:
+            del self.blocks[b]
+            del self._firsts[b]
+        del self._starts[activity_id]
+        if span == self.longest:
+            self.longest = self._longest()
+        self._dirty = True
+        return True
+
+    def kept(self, activity_id: int) -> int:
+        """The ``kept`` column for an activity (0 if it's an original or not stored)."""
+        found = self._locate(activity_id)
+        if found is None:
+            return 0
+        b, row = found
+        return self.blocks[b]["kept"][row]
+
+    def overlapping(
+        self, start: int, end: int, sport_type: str
+    ) -> list[tuple[int, int, int]]:
+        """
+        Activities of the same sport that overlap a span, most overlap first.
+
+        Returns:
+            (activity ID, seconds of overlap, length of its span) triples
+        """
+        code = self._sport_codes.get(sport_group(sport_type))
+        if code is None:
+            return []
+        matches = []
+        lowest = start - self.longest
+        first = max(bisect_right(self._firsts, lowest) - 1, 0)
+        for b in range(first, bisect_left(self._firsts, end)):
+            block = self.blocks[b]
+            starts, ends = block["start"], block["end"]
+            for row in range(bisect_right(starts, lowest), bisect_left(starts, end)):
+                overlap = min(end, ends[row]) - max(start, starts[row])
+                if overlap > 0 and block["sport"][row] == code:
+                    matches.append((block["id"][row], overlap, ends[row] - starts[row]))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def save(self) -> None:
+        """Write the index if it changed."""
+        if not self._dirty:
+            return
+        names = "\n".join(self.sports).encode("utf-8")
+        write_atomic(self.path, pack_columns(MAGIC, self.columns, names))
+        self._dirty = False
+
+    def backfill(self, output_dir: Path, index: ActivityIndex) -> int:
+        """
+        Add activities exported before the index existed, from their notes.
+
+        Returns:
+            Number of activities added
+        """
+        added = 0
+        for entry in index:
+            if entry.strava_id in self:
+                continue
+            fields = read_note_metrics(output_dir / entry.file_path)
+            if fields is None:
+                continue
+            try:
+                activity = Activity(
+                    id=entry.strava_id,
+                    name="",
+                    sport_type=fields.get("sport_type", "Workout"),
+                    start_date_local=datetime.fromisoformat(fields["date"]),
+                    elapsed_time=int(fields.get("elapsed_time", 0)),
+                )
+            except (KeyError, ValueError):
+                continue
+            self.add(activity.id, *local_seconds(activity), activity.sport_type)
+            added += 1
+        return added
+
+
+def _frontmatter_blocks(content: str) -> tuple[int, dict[str, list[str]]]:
+    """
+    Split a note's frontmatter into fields.
+
+    Returns:
+        Offset of the closing ``---`` (or -1), and each field's lines keyed by name
+    """
+    end = content.find("\n---", 3)
+    if not content.startswith("---\n") or end < 0:
+        return -1, {}
+    blocks: dict[str, list[str]] = {}
+    key = None
+    for line in content[4:end].split("\n"):
+        if line.startswith((" ", "\t")) and key is not None:
+            blocks[key].append(line)
+        elif ":" in line:
+            key = line.split(":", 1)[0]
+            blocks[key] = [line]
+    return end, blocks
+
+
+def merge_into_note(path: Path, duplicate: Activity, duplicate_frontmatter: str) -> bool:
+    """
+    Fold a duplicate recording into the note kept for the activity.
+
+    Fields in MERGE_FIELDS that the kept note lacks are copied from the
+    duplicate's frontmatter (a phone recording gains the watch's heart rate,
+    say), and the duplicate's ID is added to a ``merged`` list.
+
+    Returns:
+        True if the note was changed
+    """
+    try:
+        content = path.read_text(encoding="utf-8")
+    except OSError:
+        return False
+    end, kept = _frontmatter_blocks(content)
+    if end < 0:
+        return False
+    _, incoming = _frontmatter_blocks(duplicate_frontmatter)
+
+    added = [
+        line for key in MERGE_FIELDS if key in incoming and key not in kept
+        for line in incoming[key]
+    ]
+    merged = kept.get("merged", ["merged:"])
+    item = f"  - {duplicate.id}"
+    if item not in merged:
+        merged = merged + [item]
+    elif not added:
+        return False
+
+    frontmatter = content[4:end].split("\n")
+    if "merged" in kept:
+        position = frontmatter.index(kept["merged"][0])
+        frontmatter[position:position + len(kept["merged"])] = merged
+        merged = []
+    tags = next((i for i, line in enumerate(frontmatter) if line.startswith("tags:")), None)
+    position = len(frontmatter) if tags is None else tags
+    frontmatter[position:position] = added + merged
+    path.write_text("---\n" + "\n".join(frontmatter) + content[end:], encoding="utf-8")
+    return True
+
+
+class DuplicateDetector:
+    """
+    Flags activities that overlap one already exported, and applies a policy.
+
+    ``link`` writes both notes and points the later one at the first with a
+    ``duplicate_of`` field. ``merge`` writes no note for the later one and
+    copies the fields the first note lacks into it. ``skip`` just drops the
+    later one. Folded activities are remembered, so they aren't exported again
+    on the next sync.
+    """
+
+    def __init__(self, path: Path, policy: str = "link"):
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(
+                f"Unknown duplicate policy '{policy}'. "
+                f"Choose from: {', '.join(DUPLICATE_POLICIES)}"
+            )
+        self.intervals = IntervalIndex(path)
+        self.policy = policy
+        self.flagged = 0
+
+    def find(self, activity: Activity, index: ActivityIndex) -> Optional[int]:
+        """ID of an exported activity this one duplicates, if any."""
+        start, end = local_seconds(activity)
+        for other, overlap, span in self.intervals.overlapping(start, end, activity.sport_type):
+            # Only originals count; duplicates of them were flagged already
+            if other == activity.id or other not in index or self.intervals.kept(other):
+                continue
+            if overlap >= MIN_OVERLAP * min(end - start, span):
+                return other
+        return None
+
+    def is_folded(self, activity_id: int) -> bool:
+        """Whether an activity was merged into or skipped for another one."""
+        return self.intervals.kept(activity_id) > 0
+
+    def record(self, activity: Activity, duplicate_of: Optional[int] = None) -> None:
+        """Store an exported activity's span, and what it duplicates if anything."""
+        kept = 0
+        if duplicate_of is not None:
+            kept = -duplicate_of if self.policy == "link" else duplicate_of
+            self.flagged += 1
+        self.intervals.add(activity.id, *local_seconds(activity), activity.sport_type, kept)
+
+    def save(self) -> None:
+        """Write the interval index if it changed."""
+        self.intervals.save()
@@ -1,20 +1,38 @@
 """Export activities to Obsidian Markdown files."""
 
 from datetime import datetime
-from pathlib import Path
-from typing import Optional
-
-from strava_to_obsidian.models import Activity, Lap, format_pace
-
-
-def generate_laps_table(laps: list[Lap]) -> list[str]:
-    """Generate a Markdown table for lap data."""
+from pathlib import Path, PurePosixPath
+from typing import Any, Optional
+
+from strava_to_obsidian.columnar import METRICS_FILENAME, MetricsStore, backfill_metrics
+from strava_to_obsidian.duplicates import INTERVALS_FILENAME, DuplicateDetector, merge_into_note
+from strava_to_obsidian.hooks import ExportHook, NoteExtras
+from strava_to_obsidian.index import ActivityIndex, IndexEntry, utc_now_iso
+from strava_to_obsidian.layout import DATA_DIRNAME, FLAT, VaultLayout, get_layout
+from strava_to_obsidian.maps import MapRenderer, route_preview_svg
+from strava_to_obsidian.media import (
+    MEDIA_FILENAME,
+    MediaOptions,
+    MediaProcessor,
+    thumbnail_path,
+)
+from strava_to_obsidian.models import Activity, ActivityPhoto, Lap, format_pace
+from strava_to_obsidian.photos import OBJECTS_DIR, PHOTOS_FILENAME, PhotoStore
+from strava_to_obsidian.scanner import ScanResult, rebuild_index
+from strava_to_obsidian.splits import KM, MILE, compute_splits
+from strava_to_obsidian.streams import StreamStore
+from strava_to_obsidian.timing import timings
+from strava_to_obsidian.tracks import TRACKS_FILENAME, TrackWriter, has_track, track_path
+
+
+def generate_laps_table(laps: list[Lap], title: str = "Laps", metric: bool = False) -> list[str]:
+    """Generate a Markdown table for lap data (imperial units unless metric)."""
     if not laps:
         return []
 
     lines = [
         "",
-        "## Laps",
+        f"## {title}",
         "",
         "| Lap | Distance | Time | Pace | Avg HR | Elev |",
         "|-----|----------|------|------|--------|------|",
@@ -22,19 +40,21 @@ def generate_laps_table(laps: list[Lap]) -> list[str]:
 
     for lap in laps:
         # Format distance
-        distance = f"{lap.distance_mi:.2f} mi"
+        distance = f"{lap.distance_km:.2f} km" if metric else f"{lap.distance_mi:.2f} mi"
 
         # Format time
         time = lap.elapsed_time_fmt
 
         # Format pace
-        pace = f"{lap.pace_per_mi}/mi"
+        pace = f"{lap.pace_per_km}/km" if metric else f"{lap.pace_per_mi}/mi"
 
         # Format heart rate (or dash if not available)
         hr = f"{lap.average_heartrate:.0f}" if lap.average_heartrate else "—"
 
         # Format elevation gain
-        if lap.total_elevation_gain > 0:
+        if lap.total_elevation_gain > 0 and metric:
+            elev = f"+{lap.total_elevation_gain:.0f} m"
+        elif lap.total_elevation_gain > 0:
             elev = f"+{lap.elevation_gain_ft:.0f} ft"
         else:
             elev = "—"
@@ -44,7 +64,27 @@ def generate_laps_table(laps: list[Lap]) -> list[str]:
     return lines
 
 
-def generate_frontmatter(activity: Activity) -> str:
+def _yaml_value(value: Any) -> str:
+    """Render a scalar for frontmatter, double-quoting strings."""
+    if isinstance(value, str):
+        escaped = value.replace('"', '\\"')
+        return f'"{escaped}"'
+    return str(value)
+
+
+def _frontmatter_field(key: str, value: Any) -> list[str]:
+    """Render a derived frontmatter field; lists become YAML block sequences."""
+    if isinstance(value, (list, tuple)):
+        return [f"{key}:"] + [f"  - {_yaml_value(item)}" for item in value]
+    return [f"{key}: {_yaml_value(value)}"]
+
+
+def generate_frontmatter(
+    activity: Activity,
+    layout: VaultLayout = FLAT,
+    map_path: Optional[str] = None,
+    extras: Optional[NoteExtras] = None,
+) -> str:
     """Generate YAML frontmatter for an activity."""
     lines = [
         "---",
@@ -118,10 +158,29 @@ def generate_frontmatter(activity: Activity) -> str:
             f"  - {activity.start_latlng[0]:.6f}",
             f"  - {activity.start_latlng[1]:.6f}",
         ])
+    if activity.end_latlng and len(activity.end_latlng) == 2:
+        lines.extend([
+            "end_coordinates:",
+            f"  - {activity.end_latlng[0]:.6f}",
+            f"  - {activity.end_latlng[1]:.6f}",
+        ])
 
     # Photo (if available)
-    if activity.photo_url:
-        lines.append(f'photo: "[[media/{activity.id}_photo.jpg]]"')
+    stored = [photo.path for photo in activity.photos if photo.path]
+    if stored:
+        lines.append(f'photo: "[[{stored[0]}]]"')
+        lines.append(f"photos: {len(stored)}")
+    elif activity.photo_url:
+        lines.append(f'photo: "[[{layout.photo_path(activity.id)}]]"')
+
+    # Map (if rendered)
+    if map_path:
+        lines.append(f'map: "[[{map_path}]]"')
+
+    # Derived fields from export hooks
+    if extras:
+        for key, value in extras.frontmatter.items():
+            lines.extend(_frontmatter_field(key, value))
 
     # Tags
     sport_tag = activity.sport_type.lower().replace(" ", "-")
@@ -130,12 +189,19 @@ def generate_frontmatter(activity: Activity) -> str:
         "  - activity",
         f"  - {sport_tag}",
     ])
+    if extras:
+        lines.extend(f"  - {tag}" for tag in extras.tags)
 
     lines.append("---")
     return "\n".join(lines)
 
 
-def generate_body(activity: Activity) -> str:
+def generate_body(
+    activity: Activity,
+    layout: VaultLayout = FLAT,
+    map_path: Optional[str] = None,
+    extras: Optional[NoteExtras] = None,
+) -> str:
     """Generate Markdown body for an activity."""
     lines = [
         f"# {activity.icon} {activity.name}",
@@ -187,17 +253,63 @@ def generate_body(activity: Activity) -> str:
             activity.description,
         ])
 
-    # Photo
-    if activity.photo_url:
+    # Map, or an inline route sketch when no map image was rendered
+    if map_path:
+        lines.extend([
+            "",
+            "## Map",
+            "",
+            f"![[{map_path}]]",
+        ])
+    elif activity.polyline or activity.summary_polyline:
+        svg = route_preview_svg(activity.polyline or activity.summary_polyline)
+        if svg:
+            lines.extend([
+                "",
+                "## Route",
+                "",
+                svg,
+            ])
+
+    # Photos: the full set when it was fetched, otherwise the primary one
+    stored = [photo for photo in activity.photos if photo.path]
+    if stored:
+        lines.extend(["", "## Photos", ""])
+        for photo in stored:
+            if photo.thumbnail:
+                # Thumbnail inline, full size a click away
+                lines.append(f"![[{photo.thumbnail}]]")
+                full = f"[[{photo.path}|Full size]]"
+                lines.append(f"*{photo.caption}* · {full}" if photo.caption else full)
+            else:
+                lines.append(f"![[{photo.path}]]")
+                if photo.caption:
+                    lines.append(f"*{photo.caption}*")
+    elif activity.photo_url:
         lines.extend([
             "",
             "## Photo",
             "",
-            f"![[media/{activity.id}_photo.jpg]]",
+            f"![[{layout.photo_path(activity.id)}]]",
         ])
 
-    # Laps
-    lines.extend(generate_laps_table(activity.laps))
+    # Laps, or splits from the streams when the laps don't say much (and the
+    # streams have the distance and time to compute them from)
+    miles, kilometers = [], []
+    if len(activity.laps) <= 1 and activity.streams is not None:
+        miles = compute_splits(activity.streams, MILE)
+        kilometers = compute_splits(activity.streams, KM)
+    if miles or kilometers:
+        lines.extend(generate_laps_table(miles, "Splits (mi)"))
+        lines.extend(generate_laps_table(kilometers, "Splits (km)", metric=True))
+    else:
+        lines.extend(generate_laps_table(activity.laps))
+
+    # Sections from export hooks
+    if extras:
+        for section in extras.sections:
+            lines.append("")
+            lines.extend(section)
 
     # Footer
     lines.extend([
@@ -209,20 +321,90 @@ def generate_body(activity: Activity) -> str:
     return "\n".join(lines)
 
 
-def generate_markdown(activity: Activity) -> str:
+@timings.timed("render.markdown")
+def generate_markdown(
+    activity: Activity,
+    layout: VaultLayout = FLAT,
+    map_path: Optional[str] = None,
+    extras: Optional[NoteExtras] = None,
+) -> str:
     """Generate complete Markdown file content for an activity."""
-    frontmatter = generate_frontmatter(activity)
-    body = generate_body(activity)
+    frontmatter = generate_frontmatter(activity, layout, map_path, extras)
+    body = generate_body(activity, layout, map_path, extras)
     return f"{frontmatter}\n\n{body}\n"
 
 
+def _read_text(path: Path) -> Optional[str]:
+    """A file's text, or None if it can't be read."""
+    try:
+        return path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
 class ActivityExporter:
     """Exports activities to Markdown files."""
 
-    def __init__(self, output_dir: Path):
+    def __init__(
+        self,
+        output_dir: Path,
+        layout: Optional[VaultLayout] = None,
+        map_format: Optional[str] = None,
+        hooks: Optional[list[ExportHook]] = None,
+        media: Optional[MediaOptions] = None,
+        track_format: Optional[str] = None,
+        duplicates: Optional[str] = None,
+    ):
         self.output_dir = output_dir
         self.activities_dir = output_dir
         self.media_dir = output_dir / "media"
+        self.data_dir = output_dir / DATA_DIRNAME
+        self.streams = StreamStore(self.data_dir / "streams")
+        self.photos = PhotoStore(output_dir, self.data_dir / PHOTOS_FILENAME)
+        self.metrics = MetricsStore(self.data_dir / METRICS_FILENAME)
+        self.index = ActivityIndex.load(output_dir)
+        if layout is not None and not len(self.index):
+            # A fresh vault adopts the requested layout; existing ones need `migrate`
+            self.index.layout = layout.name
+        self.layout = get_layout(self.index.layout)
+        self.maps = MapRenderer(self.data_dir / "maps.json", map_format) if map_format else None
+        self.media = (
+            MediaProcessor(output_dir, self.data_dir / MEDIA_FILENAME, media, photos=self.photos)
+            if media
+            else None
+        )
+        self.tracks = (
+            TrackWriter(self.data_dir / TRACKS_FILENAME, track_format) if track_format else None
+        )
+        self.duplicates = None
+        if duplicates:
+            self.duplicates = DuplicateDetector(self.data_dir / INTERVALS_FILENAME, duplicates)
+        self.hooks: list[ExportHook] = list(hooks or [])
+        self.unchanged = 0  # notes re-rendered identically, so left as they were
+        self._primary_photo_bytes = 0
+        # Notes to rewrite with thumbnails once flush() has made them:
+        # (path, content with the thumbnails, photos they're waiting for)
+        self._awaiting_thumbnails: list[tuple[Path, str, list[str]]] = []
+
+    @property
+    def downloaded_bytes(self) -> int:
+        """Bytes of photos downloaded since the exporter was opened."""
+        return self._primary_photo_bytes + self.photos.downloaded_bytes
+
+    def ensure_index(self) -> Optional[ScanResult]:
+        """
+        Build the index, and then the metrics store, from existing notes if
+        this vault has never had them.
+        """
+        result = None
+        if not self.index.exists() and self.output_dir.is_dir():
+            result = rebuild_index(self.output_dir, self.index)
+            self.layout = get_layout(self.index.layout)
+        if not self.metrics.exists() and len(self.index):
+            backfill_metrics(self.metrics, self.output_dir, self.index)
+        if self.duplicates and not self.duplicates.intervals.exists() and len(self.index):
+            self.duplicates.intervals.backfill(self.output_dir, self.index)
+        return result
 
     def setup_directories(self) -> None:
         """Create output directories if they don't exist."""
@@ -231,11 +413,23 @@ class ActivityExporter:
 
     def get_activity_path(self, activity: Activity) -> Path:
         """Get the file path for an activity."""
-        filename = activity.generate_filename()
-        return self.activities_dir / filename
+        entry = self.index.get(activity.id)
+        if entry is not None:
+            # Keep writing to the existing note, even if the activity was renamed
+            return self.activities_dir / entry.file_path
+        relpath = self.layout.note_path(activity.generate_filename(), activity.start_date_local)
+        return self.activities_dir / relpath
+
+    def is_known(self, activity_id: int) -> bool:
+        """Check if an activity was exported or folded into another, by ID alone."""
+        if self.duplicates and self.duplicates.is_folded(activity_id):
+            return True
+        return activity_id in self.index
 
     def activity_exists(self, activity: Activity) -> bool:
-        """Check if an activity file already exists."""
+        """Check if an activity file already exists (or it was folded into another)."""
+        if self.duplicates and self.duplicates.is_folded(activity.id):
+            return True
         return self.get_activity_path(activity).exists()
 
     def export_activity(
@@ -250,7 +444,8 @@ class ActivityExporter:
         Args:
             activity: The activity to export
             force: Overwrite existing file if True
-            download_photo: Download the primary photo if available
+            download_photo: Download the photo set (``activity.photos``) if it was
+                fetched, otherwise the primary photo if available
 
         Returns:
             Path to the created file, or None if skipped
@@ -261,19 +456,189 @@ class ActivityExporter:
         if filepath.exists() and not force:
             return None
 
+        # Another recording of an activity that's already exported
+        duplicate_of = self.duplicates.find(activity, self.index) if self.duplicates else None
+        if duplicate_of is not None and self.duplicates.policy != "link":
+            if self.duplicates.policy == "merge":
+                kept = self.output_dir / self.index.get(duplicate_of).file_path
+                merge_into_note(kept, activity, generate_frontmatter(activity, self.layout))
+            self.duplicates.record(activity, duplicate_of)
+            return None
+
         # Ensure directories exist
         self.setup_directories()
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        # Download photos if available
+        media_files = []
+        if download_photo and activity.photos:
+            media_files.extend(self._store_photos(activity))
+        elif download_photo and activity.photo_url:
+            photo_path = self._download_photo(activity)
+            if photo_path:
+                media_files.append(self.layout.photo_path(activity.id))
+                if self.media:
+                    # Treat the primary photo as a set of one so it gets a thumbnail
+                    activity.photos = [ActivityPhoto(
+                        "primary", activity.photo_url, path=self.layout.photo_path(activity.id)
+                    )]
+
+        # Queue thumbnails; photos are processed in one batch by flush(), and
+        # the note embeds full-size photos until their thumbnails are made
+        queued = []
+        if self.media:
+            for photo in activity.photos:
+                if photo.path:
+                    photo.thumbnail = self.media.queue(photo.path)
+                    media_files.append(thumbnail_path(photo.path))
+                    if photo.thumbnail is None:
+                        queued.append(photo)
+
+        # Queue the route map; maps are drawn in one batch by flush()
+        map_path = None
+        if self.maps and activity.summary_polyline:
+            map_path = self.layout.map_path(activity.id, self.maps.fmt)
+            self.maps.queue(activity.id, activity.summary_polyline, self.output_dir / map_path)
+            media_files.append(map_path)
+
+        # Store streams fetched for this activity, or reuse ones stored earlier
+        if activity.streams is not None:
+            self.streams.save(activity.id, activity.streams)
+        else:
+            activity.streams = self.streams.load(activity.id)
+
+        # Queue the track file; tracks are written in one batch by flush()
+        extras = NoteExtras()
+        streams = activity.streams
+        if self.tracks and streams is not None and has_track(streams, self.tracks.fmt):
+            track = track_path(activity.id, self.tracks.fmt)
+            self.tracks.queue(activity, self.streams.path(activity.id), self.output_dir / track)
+            media_files.append(track)
+            extras.frontmatter["track"] = f"[[{track}]]"
+        if duplicate_of is not None:
+            original = self.index.get(duplicate_of).file_path.removesuffix(".md")
+            extras.frontmatter["duplicate_of"] = f"[[{original}]]"
+
+        # Let hooks add derived data, then generate and write markdown
+        for hook in self.hooks:
+            hook.annotate(activity, extras)
+        content = generate_markdown(activity, self.layout, map_path, extras)
+        if queued:
+            for photo in queued:
+                photo.thumbnail = thumbnail_path(photo.path)
+            with_thumbnails = generate_markdown(activity, self.layout, map_path, extras)
+            self._awaiting_thumbnails.append(
+                (filepath, with_thumbnails, [photo.path for photo in queued])
+            )
+        if force and _read_text(filepath) == content:
+            # Leave the file alone so its mtime (and any vault sync) isn't disturbed
+            self.unchanged += 1
+        else:
+            with timings.phase("write.note"):
+                filepath.write_text(content, encoding="utf-8")
+
+        self._record(activity, filepath, media_files, duplicate_of)
+        for hook in self.hooks:
+            hook.record(activity, filepath)
+        return filepath
+
+    def _record(
+        self,
+        activity: Activity,
+        filepath: Path,
+        media_files: list[str],
+        duplicate_of: Optional[int] = None,
+    ) -> None:
+        """Add or refresh the index entry for an exported activity."""
+        previous = self.index.get(activity.id)
+        if previous is not None:
+            # Keep media from earlier runs (e.g. when this run used --no-media)
+            media_files = list(dict.fromkeys(previous.media_files + media_files))
+
+        self.index.add(
+            IndexEntry(
+                strava_id=activity.id,
+                file_path=filepath.relative_to(self.activities_dir).as_posix(),
+                date=activity.start_date_local.strftime("%Y-%m-%d"),
+                media_files=media_files,
+                exported_at=utc_now_iso(),
+            )
+        )
+        self.metrics.add_activity(activity)
+        if self.duplicates:
+            self.duplicates.record(activity, duplicate_of)
 
-        # Download photo if available
-        if download_photo and activity.photo_url:
-            self._download_photo(activity)
+    def delete_activity(self, activity_id: int) -> Optional[Path]:
+        """
+        Remove an activity that was deleted from Strava: its note, the media
+        made for it, its streams and its rows in the index and stores.
 
-        # Generate and write markdown
-        content = generate_markdown(activity)
-        filepath.write_text(content, encoding="utf-8")
+        Photo objects are kept, as other activities may share them, and hooks
+        are told to forget the activity.
 
+        Returns:
+            Path of the removed note, or None if the activity wasn't exported
+        """
+        entry = self.index.remove(activity_id)
+        if self.duplicates:
+            self.duplicates.intervals.remove(activity_id)
+        if entry is None:
+            return None
+        filepath = self.activities_dir / entry.file_path
+        filepath.unlink(missing_ok=True)
+        for relpath in entry.media_files:
+            if not relpath.startswith(OBJECTS_DIR):
+                (self.output_dir / relpath).unlink(missing_ok=True)
+        self.streams.delete(activity_id)
+        self.metrics.remove(activity_id)
+        for hook in self.hooks:
+            hook.forget(activity_id)
         return filepath
 
+    def flush(self) -> None:
+        """Render queued maps and persist the index and other state from the run."""
+        if self.maps:
+            with timings.phase("flush.maps"):
+                self.maps.flush()
+        if self.media:
+            with timings.phase("flush.thumbnails"):
+                self.media.flush()
+                for filepath, content, relpaths in self._awaiting_thumbnails:
+                    if filepath.exists() and all(map(self.media.thumbnail, relpaths)):
+                        filepath.write_text(content, encoding="utf-8")
+                self._awaiting_thumbnails.clear()
+        if self.tracks:
+            with timings.phase("flush.tracks"):
+                self.tracks.flush()
+        with timings.phase("flush.hooks"):
+            for hook in self.hooks:
+                hook.flush()
+        with timings.phase("flush.state"):
+            self.photos.save()
+            self.metrics.save()
+            if self.duplicates:
+                self.duplicates.save()
+            self.index.save()
+
+    def _store_photos(self, activity: Activity) -> list[str]:
+        """
+        Store every fetched photo in the content-addressed store and link it
+        into the activity's media paths.
+
+        Returns:
+            Paths embedded in the note, relative to the output directory
+        """
+        paths = []
+        for number, photo in enumerate(activity.photos, start=1):
+            object_path = self.photos.fetch(photo.unique_id, photo.url)
+            if object_path is None:
+                continue
+            ext = PurePosixPath(object_path).suffix[1:] or "jpg"
+            relpath = self.layout.photo_path(activity.id, number, ext)
+            photo.path = self.photos.link(object_path, relpath)
+            paths.append(photo.path)
+        return paths
+
     def _download_photo(self, activity: Activity) -> Optional[Path]:
         """Download the primary photo for an activity."""
         if not activity.photo_url:
@@ -281,16 +646,20 @@ class ActivityExporter:
 
         import requests
 
-        photo_path = self.media_dir / f"{activity.id}_photo.jpg"
+        photo_path = self.output_dir / self.layout.photo_path(activity.id)
 
         # Skip if already downloaded
         if photo_path.exists():
             return photo_path
 
         try:
-            response = requests.get(activity.photo_url, timeout=30)
-            response.raise_for_status()
-            photo_path.write_bytes(response.content)
+            with timings.phase("media.photo_download"):
+                response = requests.get(activity.photo_url, timeout=30)
+                response.raise_for_status()
+            self._primary_photo_bytes += len(response.content)
+            photo_path.parent.mkdir(parents=True, exist_ok=True)
+            with timings.phase("write.photo"):
+                photo_path.write_bytes(response.content)
             return photo_path
         except requests.RequestException:
             return None
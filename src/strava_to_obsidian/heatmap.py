@@ -0,0 +1,359 @@
+"""Lifetime heatmap accumulated incrementally in a memory-mapped count grid."""
+
+import math
+import mmap
+import re
+import struct
+from array import array
+from pathlib import Path
+from statistics import median
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.hooks import ExportHook
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.maps import encode_png
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.polyline import decode_polyline
+from strava_to_obsidian.streams import LATLNG_SCALE, ActivityStreams, StreamStore
+
+HEATMAP_FILENAME = "heatmap.bin"
+HEATMAP_IMAGE = "heatmap.png"
+
+# File layout: header, then one saturating byte count per pixel, row by row.
+# Pixels are Web Mercator world pixels at the grid's zoom level.
+MAGIC = b"S2OH"
+HEADER = struct.Struct("<4sBBxxiiII")  # magic, zoom, peak count, x0, y0, width, height
+
+TILE_SIZE = 256
+MAX_ZOOM = 14  # about 6 m per pixel at 50° latitude
+MIN_ZOOM = 10
+MAX_SIDE = 4096  # pixels; the grid never exceeds MAX_SIDE² bytes
+MARGIN = 64  # pixels of room left around the tracks when the grid grows
+MAX_LATITUDE = 85.05112878  # Web Mercator limit
+
+# PNG palette: transparent, then a ramp from dark red through orange to white
+_STOPS = [(110, 0, 0), (220, 30, 0), (252, 120, 2), (255, 210, 40), (255, 255, 230)]
+LEVELS = 15
+
+
+def _heat_palette() -> bytes:
+    colors = [0, 0, 0]
+    for level in range(LEVELS):
+        position = level / (LEVELS - 1) * (len(_STOPS) - 1)
+        i = min(int(position), len(_STOPS) - 2)
+        t = position - i
+        colors.extend(round(a + (b - a) * t) for a, b in zip(_STOPS[i], _STOPS[i + 1]))
+    return bytes(colors)
+
+
+HEAT_PALETTE = _heat_palette()
+
+
+def world_pixels(lats, lngs, zoom: int) -> tuple[list[float], list[float]]:
+    """Web Mercator world pixel coordinates of points at a zoom level."""
+    size = TILE_SIZE << zoom
+    xs = [(lng + 180.0) / 360.0 * size for lng in lngs]
+    ys = []
+    for lat in lats:
+        phi = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+        ys.append((1 - math.log(math.tan(math.pi / 4 + phi / 2)) / math.pi) / 2 * size)
+    return xs, ys
+
+
+def track_pixels(xs: list[float], ys: list[float]) -> set[tuple[int, int]]:
+    """Pixels crossed by a track, each counted once however often it is crossed."""
+    pixels = {(int(xs[0]), int(ys[0]))}
+    for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+        steps = max(int(max(abs(x1 - x0), abs(y1 - y0))), 1)
+        dx = (x1 - x0) / steps
+        dy = (y1 - y0) / steps
+        pixels.update((int(x0 + dx * i), int(y0 + dy * i)) for i in range(1, steps + 1))
+    return pixels
+
+
+def activity_track(activity: Activity) -> Optional[tuple[list[float], list[float]]]:
+    """An activity's GPS track: full-resolution streams if stored, else its polyline."""
+    if activity.streams is not None and activity.streams.has_latlng:
+        return streams_track(activity.streams)
+    encoded = activity.polyline or activity.summary_polyline
+    if not encoded:
+        return None
+    lats, lngs = decode_polyline(encoded)
+    return (list(lats), list(lngs)) if len(lats) else None
+
+
+def streams_track(streams: ActivityStreams) -> Optional[tuple[list[float], list[float]]]:
+    """Track from lat/lng streams, without the zero points that mark GPS gaps."""
+    points = [(lat, lng) for lat, lng in zip(streams["lat"], streams["lng"]) if lat or lng]
+    if not points:
+        return None
+    return [p[0] / LATLNG_SCALE for p in points], [p[1] / LATLNG_SCALE for p in points]
+
+
+class HeatmapGrid:
+    """
+    Per-pixel activity counts over the area where activities happen.
+
+    The grid file is memory-mapped and updated in place, so adding a run's
+    tracks touches only the pixels they cross. The grid starts at MAX_ZOOM and
+    grows to fit new tracks; when they no longer fit in MAX_SIDE pixels it
+    drops a zoom level (merging pixels), down to MIN_ZOOM. Tracks too far away
+    to fit even then are clipped to the area the grid already covers.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.ids_path = path.with_suffix(".ids")
+        self.zoom = MAX_ZOOM
+        self.peak = 0
+        self.x0 = self.y0 = 0
+        self.width = self.height = 0
+        self.ids: set[int] = set()
+        self._map: Optional[mmap.mmap] = None
+        self._dirty = False
+
+        try:
+            self._open()
+            ids = array("q")
+            ids.frombytes(self.ids_path.read_bytes())
+            self.ids = set(ids)
+        except (OSError, ValueError, struct.error):
+            self.close()
+            self.width = self.height = 0
+            self.ids = set()
+
+    def _open(self) -> None:
+        with open(self.path, "r+b") as f:
+            self._map = mmap.mmap(f.fileno(), 0)
+        magic, self.zoom, self.peak, self.x0, self.y0, self.width, self.height = (
+            HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC or len(self._map) != HEADER.size + self.width * self.height:
+            raise ValueError("Not a heatmap grid")
+
+    def close(self) -> None:
+        """Unmap the grid file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def exists(self) -> bool:
+        """Check if the grid has been written."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, activity_id: object) -> bool:
+        return activity_id in self.ids
+
+    def _window(self, tracks: list[tuple[list[float], list[float]]]) -> tuple[int, ...]:
+        """Zoom and extent (x0, y0, width, height) covering the grid and new tracks."""
+        boxes = [(min(xs), min(ys), max(xs), max(ys)) for xs, ys in tracks]  # at MAX_ZOOM
+        left = min(b[0] for b in boxes)
+        top = min(b[1] for b in boxes)
+        right = max(b[2] for b in boxes)
+        bottom = max(b[3] for b in boxes)
+
+        for zoom in range(self.zoom, MIN_ZOOM - 1, -1):
+            scale = 1 << (MAX_ZOOM - zoom)
+            x0, y0 = int(left / scale), int(top / scale)
+            x1, y1 = int(right / scale) + 1, int(bottom / scale) + 1
+            if self.width:
+                factor = 1 << (self.zoom - zoom)
+                gx0, gy0 = self.x0 // factor, self.y0 // factor
+                gx1 = -(-(self.x0 + self.width) // factor)
+                gy1 = -(-(self.y0 + self.height) // factor)
+                if zoom == self.zoom and gx0 <= x0 and gy0 <= y0 and x1 <= gx1 and y1 <= gy1:
+                    return self.zoom, self.x0, self.y0, self.width, self.height
+                x0, y0 = min(x0 - MARGIN, gx0), min(y0 - MARGIN, gy0)
+                x1, y1 = max(x1 + MARGIN, gx1), max(y1 + MARGIN, gy1)
+            else:
+                x0, y0, x1, y1 = x0 - MARGIN, y0 - MARGIN, x1 + MARGIN, y1 + MARGIN
+            if x1 - x0 <= MAX_SIDE and y1 - y0 <= MAX_SIDE:
+                return zoom, x0, y0, x1 - x0, y1 - y0
+
+        # Too spread out even at MIN_ZOOM: an existing grid stays as it is and
+        # the outlying tracks are clipped; a new one centres on the median track
+        if self.width:
+            return self.zoom, self.x0, self.y0, self.width, self.height
+        scale = 1 << (MAX_ZOOM - MIN_ZOOM)
+        cx = median((b[0] + b[2]) / 2 for b in boxes) / scale
+        cy = median((b[1] + b[3]) / 2 for b in boxes) / scale
+        return MIN_ZOOM, int(cx - MAX_SIDE / 2), int(cy - MAX_SIDE / 2), MAX_SIDE, MAX_SIDE
+
+    def _resize(self, zoom: int, x0: int, y0: int, width: int, height: int) -> None:
+        """Rewrite the grid with a new extent, merging pixels if the zoom drops."""
+        counts = bytearray(width * height)
+        peak = 0
+        if self._map is not None:
+            shift = self.zoom - zoom
+            row_size = self.width
+            for row in range(self.height):
+                start = HEADER.size + row * row_size
+                line = self._map[start:start + row_size]
+                gy = ((self.y0 + row) >> shift) - y0
+                if not 0 <= gy < height:
+                    continue
+                for match in re.finditer(rb"[^\x00]", line):
+                    gx = ((self.x0 + match.start()) >> shift) - x0
+                    if 0 <= gx < width:
+                        i = gy * width + gx
+                        # Keep the busiest merged pixel: a track crossing a
+                        # block lights several of its pixels, so sums overcount
+                        counts[i] = value = max(counts[i], line[match.start()])
+                        peak = max(peak, value)
+            self.close()
+
+        self.zoom, self.peak = zoom, peak
+        self.x0, self.y0, self.width, self.height = x0, y0, width, height
+        write_atomic(self.path, self._header() + counts)
+        self._open()
+
+    def _header(self) -> bytes:
+        return HEADER.pack(
+            MAGIC, self.zoom, self.peak, self.x0, self.y0, self.width, self.height
+        )
+
+    def add_tracks(self, tracks: dict[int, tuple[list[float], list[float]]]) -> int:
+        """
+        Add the tracks of activities not counted yet.
+
+        Each pixel a track crosses is incremented once, so the count is the
+        number of activities that went through it (saturating at 255).
+
+        Returns:
+            Number of activities added
+        """
+        new = {
+            activity_id: world_pixels(lats, lngs, MAX_ZOOM)
+            for activity_id, (lats, lngs) in tracks.items()
+            if activity_id not in self.ids and len(lats)
+        }
+        if not new:
+            return 0
+
+        window = self._window(list(new.values()))
+        if window != (self.zoom, self.x0, self.y0, self.width, self.height):
+            self._resize(*window)
+
+        scale = 1 << (MAX_ZOOM - self.zoom)
+        counts = self._map
+        peak = self.peak
+        for xs, ys in new.values():
+            if scale > 1:
+                xs = [x / scale for x in xs]
+                ys = [y / scale for y in ys]
+            for x, y in track_pixels(xs, ys):
+                gx = x - self.x0
+                gy = y - self.y0
+                if 0 <= gx < self.width and 0 <= gy < self.height:
+                    i = HEADER.size + gy * self.width + gx
+                    value = counts[i]
+                    if value < 255:
+                        counts[i] = value + 1
+                        peak = max(peak, value + 1)
+        self.peak = peak
+        self.ids.update(new)
+        self._dirty = True
+        return len(new)
+
+    def save(self) -> None:
+        """Flush counts to disk and record which activities they include."""
+        if not self._dirty:
+            return
+        self._map[:HEADER.size] = self._header()
+        self._map.flush()
+        write_atomic(self.ids_path, array("q", sorted(self.ids)).tobytes())
+        self._dirty = False
+
+    def render(self) -> Optional[bytes]:
+        """
+        Render the grid as a PNG cropped to the pixels with activity.
+
+        Counts map to palette levels on a log scale through a 256-byte lookup
+        table applied with ``bytes.translate``, so the whole grid is converted
+        in one pass at C speed.
+
+        Returns:
+            PNG bytes, or None if the grid is empty
+        """
+        if self._map is None or not self.peak:
+            return None
+        width = self.width
+        data = self._map[HEADER.size:]
+
+        top, bottom, left, right = None, 0, width, 0
+        for row in range(self.height):
+            line = data[row * width:(row + 1) * width]
+            stripped = line.lstrip(b"\0")
+            if not stripped:
+                continue
+            if top is None:
+                top = row
+            bottom = row
+            left = min(left, width - len(stripped))
+            right = max(right, len(line.rstrip(b"\0")))
+        if top is None:
+            return None
+
+        scale = math.log1p(self.peak)
+        lut = bytes(
+            [0] + [min(LEVELS, max(1, math.ceil(LEVELS * math.log1p(c) / scale)))
+                   for c in range(1, 256)]
+        )
+        pixels = b"".join(
+            data[row * width + left:row * width + right] for row in range(top, bottom + 1)
+        ).translate(lut)
+        return encode_png(pixels, right - left, bottom - top + 1, HEAT_PALETTE, level=6)
+
+    def backfill(self, streams: StreamStore, index: ActivityIndex) -> int:
+        """
+        Add activities exported before the heatmap existed, from stored streams.
+
+        Returns:
+            Number of activities added
+        """
+        tracks = {}
+        for entry in index:
+            if entry.strava_id in self:
+                continue
+            stored = streams.load(entry.strava_id)
+            track = streams_track(stored) if stored is not None and stored.has_latlng else None
+            if track is not None:
+                tracks[entry.strava_id] = track
+        return self.add_tracks(tracks)
+
+
+def write_heatmap(grid: HeatmapGrid, path: Path) -> bool:
+    """Render the grid to an image file; False if there is nothing to draw."""
+    image = grid.render()
+    if image is None:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, image)
+    return True
+
+
+class HeatmapHook(ExportHook):
+    """Adds each exported activity's track to the grid and redraws the image."""
+
+    def __init__(self, grid: HeatmapGrid, image_path: Path):
+        self.grid = grid
+        self.image_path = image_path
+        self._pending: dict[int, tuple[list[float], list[float]]] = {}
+
+    def record(self, activity: Activity, path: Path) -> None:
+        if activity.id in self.grid:
+            return
+        track = activity_track(activity)
+        if track is not None:
+            self._pending[activity.id] = track
+
+    def flush(self) -> None:
+        added = self.grid.add_tracks(self._pending)
+        self._pending.clear()
+        self.grid.save()
+        if added or not self.image_path.exists():
+            write_heatmap(self.grid, self.image_path)
@@ -0,0 +1,39 @@
+"""Extension points for per-activity work done alongside an export."""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from strava_to_obsidian.models import Activity
+
+
+@dataclass
+class NoteExtras:
+    """Derived data rendered into a note next to the activity's own fields."""
+
+    frontmatter: dict[str, Any] = field(default_factory=dict)
+    tags: list[str] = field(default_factory=list)
+    sections: list[list[str]] = field(default_factory=list)  # Markdown lines per section
+
+
+class ExportHook:
+    """
+    Base class for state kept up to date as activities are exported.
+
+    ActivityExporter calls ``annotate`` before a note is rendered, ``record``
+    after it has been written, and ``flush`` once at the end of a run. Each
+    call should be cheap: hooks are expected to update their state
+    incrementally rather than revisit the archive.
+    """
+
+    def annotate(self, activity: Activity, extras: NoteExtras) -> None:
+        """Add derived fields or sections to the note about to be written."""
+
+    def record(self, activity: Activity, path: Path) -> None:
+        """Update state after the activity's note has been written."""
+
+    def forget(self, activity_id: int) -> None:
+        """Drop state kept for an activity that was deleted from Strava."""
+
+    def flush(self) -> None:
+        """Persist state at the end of a run."""
@@ -0,0 +1,144 @@
+"""Activity index mapping Strava IDs to exported files (see REQUIREMENTS.md §5.3.1)."""
+
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+INDEX_FILENAME = "activity_index.json"
+INDEX_VERSION = "1.0"
+
+
+def utc_now_iso() -> str:
+    """Current UTC time as an ISO 8601 string with a Z suffix."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class IndexEntry:
+    """A single exported activity."""
+
+    strava_id: int
+    file_path: str  # relative to the output directory, forward slashes
+    date: str = ""  # local start date, YYYY-MM-DD
+    media_files: list[str] = field(default_factory=list)
+    exported_at: str = ""
+    strava_updated_at: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "IndexEntry":
+        """Create an entry from its JSON representation."""
+        return cls(
+            strava_id=int(data["strava_id"]),
+            file_path=data["file_path"],
+            date=data.get("date", ""),
+            media_files=list(data.get("media_files", [])),
+            exported_at=data.get("exported_at", ""),
+            strava_updated_at=data.get("strava_updated_at"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON representation of this entry."""
+        data: dict[str, Any] = {
+            "strava_id": self.strava_id,
+            "file_path": self.file_path,
+            "date": self.date,
+            "media_files": self.media_files,
+            "exported_at": self.exported_at,
+        }
+        if self.strava_updated_at:
+            data["strava_updated_at"] = self.strava_updated_at
+        return data
+
+
+class ActivityIndex:
+    """In-memory ID → file index persisted as ``activity_index.json``.
+
+    Lookups are dictionary hits, so callers never need to list or stat the vault
+    to find an activity. Changes are only written back by :meth:`save`.
+    """
+
+    def __init__(self, path: Path, layout: str = "flat"):
+        self.path = path
+        self.layout = layout
+        self.entries: dict[int, IndexEntry] = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, output_dir: Path) -> "ActivityIndex":
+        """Load the index for an output directory (empty if none exists yet)."""
+        index = cls(output_dir / INDEX_FILENAME)
+        if not index.path.exists():
+            return index
+
+        try:
+            with open(index.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return index
+
+        index.layout = data.get("layout", "flat")
+        for item in data.get("activities", []):
+            try:
+                entry = IndexEntry.from_dict(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+            index.entries[entry.strava_id] = entry
+        return index
+
+    def exists(self) -> bool:
+        """Check if the index file has been written."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, activity_id: object) -> bool:
+        return activity_id in self.entries
+
+    def __iter__(self) -> Iterator[IndexEntry]:
+        return iter(list(self.entries.values()))
+
+    def get(self, activity_id: int) -> Optional[IndexEntry]:
+        """Get the entry for an activity, if indexed."""
+        return self.entries.get(activity_id)
+
+    def add(self, entry: IndexEntry) -> None:
+        """Add or replace an entry."""
+        self.entries[entry.strava_id] = entry
+        self._dirty = True
+
+    def remove(self, activity_id: int) -> Optional[IndexEntry]:
+        """Remove an entry, returning it if it was present."""
+        entry = self.entries.pop(activity_id, None)
+        if entry is not None:
+            self._dirty = True
+        return entry
+
+    def mark_dirty(self) -> None:
+        """Flag the index for writing after entries were modified in place."""
+        self._dirty = True
+
+    def save(self, force: bool = False) -> None:
+        """Write the index to disk if it changed."""
+        if not (self._dirty or force):
+            return
+
+        data = {
+            "version": INDEX_VERSION,
+            "last_updated": utc_now_iso(),
+            "layout": self.layout,
+            "activities": [entry.to_dict() for entry in self.entries.values()],
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        # No indent: json only uses its C encoder for compact output, which matters
+        # once the index holds tens of thousands of entries.
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,88 @@
+"""Vault layouts: where notes and media live inside the output directory."""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+# Machine-readable state (streams, caches) lives in a hidden folder Obsidian ignores
+DATA_DIRNAME = ".strava"
+
+
+@dataclass(frozen=True)
+class VaultLayout:
+    """Describes how notes and media are arranged inside the output directory.
+
+    All paths returned here are relative to the output directory and use forward
+    slashes, so they can be dropped straight into Obsidian wikilinks.
+    """
+
+    name: str
+    note_dir_format: str = ""  # strftime format for the note subdirectory
+    split_media: bool = False  # media/photos/<id>/ and media/maps/ instead of media/
+
+    def note_dir(self, start_date: datetime) -> str:
+        """Subdirectory for a note started at the given date ("" for the root)."""
+        if not self.note_dir_format:
+            return ""
+        return start_date.strftime(self.note_dir_format)
+
+    def note_path(self, filename: str, start_date: datetime) -> str:
+        """Relative path for a note file."""
+        note_dir = self.note_dir(start_date)
+        return f"{note_dir}/{filename}" if note_dir else filename
+
+    def photo_path(self, activity_id: int, number: int = 1, ext: str = "jpg") -> str:
+        """Relative path for an activity's photo (1 is the primary photo)."""
+        if self.split_media:
+            return f"media/photos/{activity_id}/{number:03d}_photo.{ext}"
+        if number == 1:
+            return f"media/{activity_id}_photo.{ext}"
+        return f"media/{activity_id}_photo_{number}.{ext}"
+
+    def photo_number(self, activity_id: int, path: str) -> Optional[int]:
+        """Number of the photo at a path written by photo_path, or None."""
+        if self.split_media:
+            pattern = rf"media/photos/{activity_id}/(\d{{3}})_photo\.\w+"
+        else:
+            pattern = rf"media/{activity_id}_photo(?:_(\d+))?\.\w+"
+        match = re.fullmatch(pattern, path)
+        if match is None:
+            return None
+        return int(match.group(1) or 1)
+
+    def map_path(self, activity_id: int, ext: str = "png") -> str:
+        """Relative path for an activity's rendered map image."""
+        if self.split_media:
+            return f"media/maps/{activity_id}_map.{ext}"
+        return f"media/{activity_id}_map.{ext}"
+
+    def relocate_media(self, target: "VaultLayout", activity_id: int, path: str) -> str:
+        """Translate a media path written under this layout to the target layout.
+
+        Paths this layout doesn't recognise are returned unchanged.
+        """
+        number = self.photo_number(activity_id, path)
+        if number is not None:
+            return target.photo_path(activity_id, number, path.rsplit(".", 1)[1])
+        for ext in ("png", "svg"):
+            if path == self.map_path(activity_id, ext):
+                return target.map_path(activity_id, ext)
+        return path
+
+
+FLAT = VaultLayout("flat")
+YEAR = VaultLayout("year", note_dir_format="%Y", split_media=True)
+YEAR_MONTH = VaultLayout("year-month", note_dir_format="%Y/%Y-%m", split_media=True)
+
+LAYOUTS: dict[str, VaultLayout] = {layout.name: layout for layout in (FLAT, YEAR, YEAR_MONTH)}
+
+
+def get_layout(name: str) -> VaultLayout:
+    """Look up a layout by name."""
+    try:
+        return LAYOUTS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown layout '{name}'. Choose from: {', '.join(sorted(LAYOUTS))}"
+        ) from None
@@ -0,0 +1,286 @@
+"""Offline route map rendering from encoded polylines.
+
+Maps are drawn locally as PNG or SVG, with no tile server or network access.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.polyline import decode_polyline, simplify
+
+MAP_FORMATS = ("png", "svg")
+MAP_WIDTH = 600
+MAP_HEIGHT = 400
+MAP_PADDING = 20  # pixels
+LINE_WIDTH = 3  # pixels
+
+# Inline route sketches embedded directly in notes
+PREVIEW_WIDTH = 240
+PREVIEW_HEIGHT = 160
+PREVIEW_PADDING = 8
+PREVIEW_BUDGET = 2048  # maximum bytes of SVG per note
+PREVIEW_TOLERANCE = 0.5  # starting simplification tolerance, in pixels
+
+# PNG palette: transparent background, route, start marker, end marker
+PALETTE = bytes([255, 255, 255, 252, 76, 2, 46, 160, 67, 200, 30, 30])
+ROUTE, START, END = 1, 2, 3
+ROUTE_COLOR = "#fc4c02"
+START_COLOR = "#2ea043"
+END_COLOR = "#c81e1e"
+
+
+def project(
+    lats: list[float], lngs: list[float], width: int, height: int, padding: int
+) -> tuple[list[float], list[float]]:
+    """
+    Project coordinates to Web Mercator and fit them into an image.
+
+    The route is centered and scaled uniformly so it fills the image minus padding.
+
+    Returns:
+        (x, y) pixel coordinates
+    """
+    xs = [math.radians(lng) for lng in lngs]
+    ys = [-math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) for lat in lats]
+
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+    span = max(max_x - min_x, (max_y - min_y) * (width - 2 * padding) / (height - 2 * padding))
+    scale = (width - 2 * padding) / span if span > 0 else 0.0
+
+    offset_x = (width - (max_x - min_x) * scale) / 2 - min_x * scale
+    offset_y = (height - (max_y - min_y) * scale) / 2 - min_y * scale
+    return (
+        [x * scale + offset_x for x in xs],
+        [y * scale + offset_y for y in ys],
+    )
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(
+    pixels: bytes, width: int, height: int, palette: bytes = PALETTE, level: int = 9
+) -> bytes:
+    """Encode palette indices (one byte per pixel) as an indexed PNG."""
+    rows = b"".join(
+        b"\0" + pixels[y * width:(y + 1) * width] for y in range(height)
+    )
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b"PLTE", palette),
+        _png_chunk(b"tRNS", b"\x00"),  # background palette entry is transparent
+        _png_chunk(b"IDAT", zlib.compress(rows, level)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def _stamp(pixels: bytearray, width: int, height: int, x: int, y: int, r: int, color: int):
+    """Fill a square of radius r around a pixel."""
+    x0, x1 = max(x - r, 0), min(x + r, width - 1)
+    if x1 < x0:
+        return
+    span = bytes([color]) * (x1 - x0 + 1)
+    for row in range(max(y - r, 0), min(y + r, height - 1) + 1):
+        pixels[row * width + x0:row * width + x1 + 1] = span
+
+
+def _dilate(pixels: bytearray, width: int, radius: int) -> bytearray:
+    """
+    Thicken a 0/1 pixel mask by ``radius`` pixels in every direction.
+
+    The whole image is treated as one big integer with a byte per pixel, so each
+    shift-and-or moves every pixel at once instead of looping over them.
+    """
+    size = len(pixels)
+    limit = (1 << (8 * size)) - 1
+    mask = int.from_bytes(pixels, "big")
+    for shift in (8, 8 * width):
+        grown = mask
+        for k in range(1, radius + 1):
+            grown |= (mask << (shift * k)) | (mask >> (shift * k))
+        mask = grown & limit
+    return bytearray(mask.to_bytes(size, "big"))
+
+
+def render_png(
+    lats: list[float], lngs: list[float], width: int = MAP_WIDTH, height: int = MAP_HEIGHT
+) -> bytes:
+    """Rasterize a route to PNG bytes."""
+    pixels = bytearray(width * height)
+    if lats:
+        xs, ys = project(lats, lngs, width, height, MAP_PADDING)
+        # One-pixel line first, then thicken the whole mask in one go
+        for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+            steps = max(int(max(abs(x1 - x0), abs(y1 - y0))), 1)
+            dx = (x1 - x0) / steps
+            dy = (y1 - y0) / steps
+            for i in range(steps + 1):
+                pixels[int(y0 + dy * i + 0.5) * width + int(x0 + dx * i + 0.5)] = ROUTE
+        radius = LINE_WIDTH // 2
+        if radius:
+            pixels = _dilate(pixels, width, radius)
+        _stamp(pixels, width, height, round(xs[0]), round(ys[0]), radius + 3, START)
+        _stamp(pixels, width, height, round(xs[-1]), round(ys[-1]), radius + 3, END)
+    return encode_png(pixels, width, height)
+
+
+def _svg_document(
+    xs: list[float], ys: list[float], width: int, height: int, stroke_width: float
+) -> str:
+    """SVG markup for already-projected route coordinates, on a single line."""
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}">'
+    ]
+    if xs:
+        points = " ".join(f"{x:.0f},{y:.0f}" for x, y in zip(xs, ys))
+        parts.extend([
+            f'<polyline points="{points}" fill="none" stroke="{ROUTE_COLOR}" '
+            f'stroke-width="{stroke_width:g}" stroke-linejoin="round" stroke-linecap="round"/>',
+            f'<circle cx="{xs[0]:.0f}" cy="{ys[0]:.0f}" r="{stroke_width * 1.5:g}" '
+            f'fill="{START_COLOR}"/>',
+            f'<circle cx="{xs[-1]:.0f}" cy="{ys[-1]:.0f}" r="{stroke_width * 1.5:g}" '
+            f'fill="{END_COLOR}"/>',
+        ])
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def render_svg(
+    lats: list[float], lngs: list[float], width: int = MAP_WIDTH, height: int = MAP_HEIGHT
+) -> str:
+    """Draw a route as a standalone SVG document."""
+    if not lats:
+        return _svg_document([], [], width, height, LINE_WIDTH)
+    xs, ys = project(lats, lngs, width, height, MAP_PADDING)
+    return _svg_document(xs, ys, width, height, LINE_WIDTH)
+
+
+def route_preview_svg(polyline: str, budget: int = PREVIEW_BUDGET) -> Optional[str]:
+    """
+    Small inline SVG sketch of a route that fits within a byte budget.
+
+    The route is projected to preview pixels and simplified with Douglas-Peucker,
+    doubling the tolerance until the markup fits. Points closer together than a
+    pixel are invisible at this size anyway, so the first pass is lossless to
+    the eye.
+
+    Returns:
+        SVG markup, or None if the polyline has fewer than two points
+    """
+    lats, lngs = decode_polyline(polyline)
+    if len(lats) < 2:
+        return None
+
+    xs, ys = project(lats, lngs, PREVIEW_WIDTH, PREVIEW_HEIGHT, PREVIEW_PADDING)
+    tolerance = PREVIEW_TOLERANCE
+    while True:
+        keep = simplify(xs, ys, tolerance)
+        svg = _svg_document(
+            [xs[i] for i in keep], [ys[i] for i in keep], PREVIEW_WIDTH, PREVIEW_HEIGHT, 2
+        )
+        if len(svg) <= budget or len(keep) <= 2:
+            return svg
+        tolerance *= 2
+
+
+def render_map(polyline: str, fmt: str = "png") -> bytes:
+    """Decode a polyline and render it in the given format."""
+    lats, lngs = decode_polyline(polyline)
+    if fmt == "svg":
+        return render_svg(lats, lngs).encode("utf-8")
+    return render_png(lats, lngs)
+
+
+def polyline_hash(polyline: str, fmt: str) -> str:
+    """Cache key for a rendered map."""
+    return hashlib.sha1(f"{fmt}:{MAP_WIDTH}x{MAP_HEIGHT}:{polyline}".encode()).hexdigest()[:16]
+
+
+@dataclass
+class MapJob:
+    """A map waiting to be rendered."""
+
+    activity_id: int
+    polyline: str
+    path: Path
+    fmt: str = "png"
+
+
+def _render_job(job: MapJob) -> int:
+    """Render one map to disk (runs in a worker process)."""
+    job.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = job.path.with_suffix(job.path.suffix + ".tmp")
+    tmp_path.write_bytes(render_map(job.polyline, job.fmt))
+    os.replace(tmp_path, job.path)
+    return job.activity_id
+
+
+class MapRenderer:
+    """
+    Queues route maps during an export and renders them in one batch.
+
+    Rendered maps are cached by polyline hash in ``maps.json``, so a route that
+    hasn't changed is never redrawn.
+    """
+
+    def __init__(self, cache_file: Path, fmt: str = "png", workers: Optional[int] = None):
+        self.cache_file = cache_file
+        self.fmt = fmt
+        self.workers = workers
+        self.pending: dict[int, MapJob] = {}
+        self._hashes: dict[str, str] = {}
+        if cache_file.exists():
+            try:
+                self._hashes = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                self._hashes = {}
+
+    def queue(self, activity_id: int, polyline: str, path: Path) -> bool:
+        """
+        Queue a map unless an identical one is already on disk.
+
+        Returns:
+            True if the map will be (re)drawn
+        """
+        key = polyline_hash(polyline, self.fmt)
+        if self._hashes.get(str(activity_id)) == key and path.exists():
+            return False
+        self.pending[activity_id] = MapJob(activity_id, polyline, path, self.fmt)
+        return True
+
+    def flush(self) -> int:
+        """Render all queued maps, in parallel when there are several."""
+        if not self.pending:
+            return 0
+
+        jobs = list(self.pending.values())
+        if len(jobs) == 1:
+            done = [_render_job(jobs[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                done = list(pool.map(_render_job, jobs, chunksize=max(len(jobs) // 32, 1)))
+
+        for activity_id in done:
+            job = self.pending.pop(activity_id)
+            self._hashes[str(activity_id)] = polyline_hash(job.polyline, job.fmt)
+
+        write_atomic(self.cache_file, json.dumps(self._hashes).encode("utf-8"))
+        return len(done)
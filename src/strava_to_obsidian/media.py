@@ -0,0 +1,257 @@
+"""Photo post-processing: thumbnails and size caps, rendered in a process pool.
+
+Needs Pillow (``pip install 'strava-to-obsidian[images]'``).
+"""
+
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.photos import OBJECTS_DIR, PhotoStore
+
+MEDIA_FILENAME = "media.json"
+THUMBS_DIR = "media/thumbs"
+ORIGINALS_DIRNAME = "originals"  # inside the data directory, out of Obsidian's sight
+
+THUMBNAIL_SIZE = 480  # pixels, longest edge
+THUMBNAIL_QUALITY = 80
+PHOTO_QUALITY = 85
+
+
+@dataclass(frozen=True)
+class MediaOptions:
+    """How downloaded photos are post-processed."""
+
+    thumbnail_size: int = THUMBNAIL_SIZE
+    max_size: int = 0  # longest edge for full-size photos; 0 keeps them as downloaded
+    keep_originals: bool = False  # copy photos to .strava/originals before shrinking them
+
+
+def thumbnail_path(relpath: str) -> str:
+    """Relative path of a photo's (JPEG) thumbnail, mirroring its path under media/."""
+    name = relpath[len("media/"):] if relpath.startswith("media/") else relpath
+    if name.startswith("photos/"):
+        name = name[len("photos/"):]
+    return f"{THUMBS_DIR}/{PurePosixPath(name).with_suffix('.jpg')}"
+
+
+def require_pillow() -> None:
+    """Raise a RuntimeError with install instructions if Pillow is missing."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "Thumbnails need Pillow: pip install 'strava-to-obsidian[images]'"
+        ) from e
+
+
+@dataclass
+class MediaJob:
+    """A photo waiting to be processed."""
+
+    relpath: str
+    source: Path
+    thumbnail: Path
+    options: MediaOptions
+    original: Optional[Path] = None  # where to keep the full-size file, if anywhere
+
+
+def _save_jpeg(image, path: Path, quality: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    image.save(tmp_path, "JPEG", quality=quality, optimize=True)
+    os.replace(tmp_path, path)
+
+
+def _resized_path(source: Path) -> Path:
+    """Where a worker leaves the smaller version of a photo for flush() to put in place."""
+    return source.with_suffix(".resized.tmp")
+
+
+def _process_job(job: MediaJob) -> Optional[bool]:
+    """
+    Write a thumbnail and a size-capped copy of the photo (runs in a worker process).
+
+    Returns:
+        Whether a smaller copy was written, or None if the file couldn't be
+        read as an image
+    """
+    try:
+        return _process_image(job)
+    except OSError:  # includes PIL.UnidentifiedImageError
+        return None
+
+
+def _process_image(job: MediaJob) -> bool:
+    from PIL import Image, ImageOps
+
+    with Image.open(job.source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        thumb = image.copy()
+        thumb.thumbnail((job.options.thumbnail_size, job.options.thumbnail_size))
+        _save_jpeg(thumb, job.thumbnail, THUMBNAIL_QUALITY)
+
+        limit = job.options.max_size
+        if limit and max(image.size) > limit:
+            if job.original is not None and not job.original.exists():
+                job.original.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(job.source, job.original)
+            image.thumbnail((limit, limit))
+            # The photo itself may be a link to a content-addressed object, so
+            # it's left alone; flush() stores the smaller version as a new one.
+            # It keeps its format, as that's what its file extension says.
+            resized = _resized_path(job.source)
+            if opened.format in (None, "JPEG"):
+                image.save(resized, "JPEG", quality=PHOTO_QUALITY, optimize=True)
+            else:
+                image.save(resized, opened.format)
+            return True
+    return False
+
+
+def _share(source: Path, target: Path) -> None:
+    """Hard-link (or copy) a finished file to another path."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class MediaProcessor:
+    """
+    Queues photos during an export and processes them in one batch.
+
+    Each processed photo's size and modification time are cached in
+    ``media.json``; a photo that hasn't changed since, and whose thumbnail is
+    still there, is skipped. A photo shrunk to the size cap replaces its
+    object in ``photos`` with a new one for the smaller content.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        cache_file: Path,
+        options: MediaOptions = MediaOptions(),
+        workers: Optional[int] = None,
+        photos: Optional[PhotoStore] = None,
+    ):
+        require_pillow()
+        self.output_dir = output_dir
+        self.cache_file = cache_file
+        self.options = options
+        self.workers = workers
+        self.photos = photos
+        self.pending: dict[str, MediaJob] = {}
+        self._cache: dict[str, list[int]] = {}
+        if cache_file.exists():
+            try:
+                self._cache = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                self._cache = {}
+
+    def _signature(self, relpath: str) -> Optional[list[int]]:
+        try:
+            stat = (self.output_dir / relpath).stat()
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns, self.options.thumbnail_size, self.options.max_size]
+
+    def thumbnail(self, relpath: str) -> Optional[str]:
+        """Relative path of a photo's thumbnail if it's been made and is up to date."""
+        thumb = thumbnail_path(relpath)
+        signature = self._signature(relpath)
+        if signature is None or self._cache.get(relpath) != signature:
+            return None
+        return thumb if (self.output_dir / thumb).exists() else None
+
+    def queue(self, relpath: str) -> Optional[str]:
+        """
+        Queue a photo unless it has already been processed.
+
+        Returns:
+            Relative path of its thumbnail for the note to embed, or None if it
+            isn't made yet (see thumbnail() once flush() has run)
+        """
+        thumb = self.thumbnail(relpath)
+        if thumb is not None or self._signature(relpath) is None:
+            return thumb
+
+        options = self.options
+        if relpath.startswith(f"{OBJECTS_DIR}/"):
+            # Notes embed the object itself here, so it has to stay as it is
+            options = replace(options, max_size=0)
+        original = None
+        if options.keep_originals:
+            original = self.cache_file.parent / ORIGINALS_DIRNAME / relpath
+        self.pending[relpath] = MediaJob(
+            relpath,
+            self.output_dir / relpath,
+            self.output_dir / thumbnail_path(relpath),
+            options,
+            original,
+        )
+        return None
+
+    def flush(self) -> int:
+        """Process all queued photos, in parallel when there are several."""
+        if not self.pending:
+            return 0
+
+        # Hard links to one photo are processed once; the others share its thumbnail
+        groups: dict[tuple[int, int], list[MediaJob]] = {}
+        for job in self.pending.values():
+            try:
+                stat = job.source.stat()
+            except OSError:
+                continue
+            groups.setdefault((stat.st_dev, stat.st_ino), []).append(job)
+        jobs = [group[0] for group in groups.values()]
+
+        if len(jobs) <= 1:
+            results = [_process_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(_process_job, jobs, chunksize=max(len(jobs) // 32, 1)))
+
+        done = 0
+        for group, result in zip(groups.values(), results):
+            if result is None:
+                continue
+            for job in group[1:]:
+                _share(group[0].thumbnail, job.thumbnail)
+            if result:
+                self._put_resized(group)
+            for job in group:
+                signature = self._signature(job.relpath)
+                if signature is not None:
+                    self._cache[job.relpath] = signature
+                done += 1
+        self.pending.clear()
+
+        write_atomic(self.cache_file, json.dumps(self._cache).encode("utf-8"))
+        return done
+
+    def _put_resized(self, group: list[MediaJob]) -> None:
+        """Replace a group of linked photos with the smaller version a worker wrote."""
+        source = group[0].source
+        resized = _resized_path(source)
+        new_object = self.photos.replace_object(source, resized) if self.photos else None
+        if new_object is None:
+            # Not from the photo store (e.g. a primary photo): the file is replaced
+            os.replace(resized, source)
+            shared = group[1:]
+        else:
+            source = self.output_dir / new_object
+            shared = group
+        for job in shared:
+            _share(source, job.source)
@@ -0,0 +1,116 @@
+"""Move an existing vault between layouts using the activity index."""
+
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from strava_to_obsidian.index import ActivityIndex, IndexEntry
+from strava_to_obsidian.layout import VaultLayout, get_layout
+
+
+@dataclass
+class MigrationResult:
+    """Summary of a layout migration."""
+
+    notes_moved: int = 0
+    media_moved: int = 0
+    notes_rewritten: int = 0
+    missing: list[int] = field(default_factory=list)
+
+
+def _entry_date(entry: IndexEntry) -> datetime:
+    """Start date of an indexed activity, falling back to the filename prefix."""
+    date_str = entry.date or Path(entry.file_path).name[:10]
+    return datetime.strptime(date_str, "%Y-%m-%d")
+
+
+def _move(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(src, dst)
+
+
+def _prune_empty_dirs(output_dir: Path, dirs: set[Path]) -> None:
+    """Remove directories left empty by a migration, deepest first."""
+    for directory in sorted(dirs, key=lambda p: len(p.parts), reverse=True):
+        while directory != output_dir and output_dir in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+            directory = directory.parent
+
+
+def migrate_layout(
+    output_dir: Path,
+    index: ActivityIndex,
+    target: VaultLayout,
+    dry_run: bool = False,
+) -> MigrationResult:
+    """
+    Move notes and media to a new layout and rewrite embeds in the notes.
+
+    Everything is driven by the index: each entry already knows its note and
+    media paths, so files are renamed in place without listing the vault.
+
+    Args:
+        output_dir: Root of the exported vault
+        index: Index for the vault (updated in memory, not saved)
+        target: Layout to migrate to
+        dry_run: Count what would change without touching any files
+
+    Returns:
+        Summary of what was moved
+    """
+    source = get_layout(index.layout)
+    result = MigrationResult()
+    vacated: set[Path] = set()
+
+    for entry in index:
+        note_src = output_dir / entry.file_path
+        if not note_src.exists():
+            result.missing.append(entry.strava_id)
+            continue
+
+        # Media first, so the embeds we rewrite below point at real files
+        replacements: dict[str, str] = {}
+        new_media: list[str] = []
+        for media in entry.media_files:
+            new_path = source.relocate_media(target, entry.strava_id, media)
+            new_media.append(new_path)
+            if new_path == media:
+                continue
+            replacements[media] = new_path
+            media_src = output_dir / media
+            if media_src.exists():
+                result.media_moved += 1
+                if not dry_run:
+                    _move(media_src, output_dir / new_path)
+                    vacated.add(media_src.parent)
+
+        new_note = target.note_path(note_src.name, _entry_date(entry))
+        if new_note != entry.file_path:
+            result.notes_moved += 1
+            if not dry_run:
+                _move(note_src, output_dir / new_note)
+                vacated.add(note_src.parent)
+
+        if replacements:
+            result.notes_rewritten += 1
+            if not dry_run:
+                note_dst = output_dir / new_note
+                content = note_dst.read_text(encoding="utf-8")
+                for old, new in replacements.items():
+                    content = content.replace(f"[[{old}]]", f"[[{new}]]")
+                note_dst.write_text(content, encoding="utf-8")
+
+        if not dry_run:
+            entry.file_path = new_note
+            entry.media_files = new_media
+
+    if not dry_run:
+        index.layout = target.name
+        index.mark_dirty()
+        _prune_empty_dirs(output_dir, vacated)
+
+    return result
@@ -6,6 +6,9 @@ from typing import Any, Optional
 
 from slugify import slugify
 
+from strava_to_obsidian.streams import ActivityStreams
+from strava_to_obsidian.timing import timings
+
 
 # Sport type to emoji mapping
 SPORT_ICONS: dict[str, str] = {
@@ -118,6 +121,11 @@ class Lap:
             total_elevation_gain=data.get("total_elevation_gain", 0.0),
         )
 
+    @property
+    def distance_km(self) -> float:
+        """Distance in kilometers."""
+        return self.distance / 1000
+
     @property
     def distance_mi(self) -> float:
         """Distance in miles."""
@@ -128,6 +136,13 @@ class Lap:
         """Formatted elapsed time."""
         return format_duration(self.elapsed_time)
 
+    @property
+    def pace_per_km(self) -> str:
+        """Pace as M:SS per km."""
+        if self.average_speed <= 0:
+            return "—"
+        return format_pace(1000 / self.average_speed)
+
     @property
     def pace_per_mi(self) -> str:
         """Pace as M:SS per mile."""
@@ -139,6 +154,29 @@ class Lap:
         return meters_to_feet(self.total_elevation_gain)
 
 
+@dataclass
+class ActivityPhoto:
+    """One photo from /activities/{id}/photos."""
+
+    unique_id: str
+    url: str
+    caption: str = ""
+    path: Optional[str] = None  # vault path to embed, once stored
+    thumbnail: Optional[str] = None  # vault path of its thumbnail, if made
+
+    @classmethod
+    def from_api_response(cls, data: dict[str, Any]) -> Optional["ActivityPhoto"]:
+        """Create a photo from the API response; None for entries without an image URL."""
+        urls = data.get("urls") or {}
+        if not urls or not data.get("unique_id"):
+            return None
+        # Keys are the requested sizes, e.g. {"2048": "https://..."}
+        url = urls[max(urls, key=lambda size: int(size) if str(size).isdigit() else 0)]
+        if not url:
+            return None
+        return cls(unique_id=str(data["unique_id"]), url=url, caption=data.get("caption") or "")
+
+
 @dataclass
 class Activity:
     """Represents a Strava activity with all relevant data."""
@@ -171,17 +209,25 @@ class Activity:
 
     # Location
     start_latlng: Optional[list[float]] = None
+    end_latlng: Optional[list[float]] = None
+    summary_polyline: Optional[str] = None
+    polyline: Optional[str] = None  # full resolution, detail response only
 
-    # Photo (primary only - API limitation)
+    # Primary photo, and the full set when fetched separately
     photo_url: Optional[str] = None
+    photos: list[ActivityPhoto] = field(default_factory=list)
 
     # Laps
     laps: list["Lap"] = field(default_factory=list)
 
+    # Stream data (only when fetched separately or loaded from the stream store)
+    streams: Optional[ActivityStreams] = None
+
     # Raw data for reference
     raw_data: dict[str, Any] = field(default_factory=dict)
 
     @classmethod
+    @timings.timed("parse.activity")
     def from_api_response(cls, data: dict[str, Any]) -> "Activity":
         """Create Activity from Strava API response."""
         from dateutil.parser import parse as parse_date
@@ -199,6 +245,11 @@ class Activity:
             # Prefer larger sizes
             photo_url = urls.get("600") or urls.get("100")
 
+        # Route polylines (absent for indoor and manual activities)
+        route_map = data.get("map") or {}
+        summary_polyline = route_map.get("summary_polyline") or None
+        polyline = route_map.get("polyline") or None
+
         # Parse laps if available
         laps_data = data.get("laps", [])
         laps = [Lap.from_api_response(lap) for lap in laps_data]
@@ -219,6 +270,9 @@ class Activity:
             max_heartrate=data.get("max_heartrate"),
             calories=data.get("calories"),
             start_latlng=data.get("start_latlng"),
+            end_latlng=data.get("end_latlng"),
+            summary_polyline=summary_polyline,
+            polyline=polyline,
             photo_url=photo_url,
             laps=laps,
             raw_data=data,
@@ -0,0 +1,143 @@
+"""Content-addressed storage for activity photos."""
+
+import hashlib
+import json
+import os
+from pathlib import Path, PurePosixPath
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.timing import timings
+
+PHOTOS_FILENAME = "photos.json"
+OBJECTS_DIR = "media/objects"  # relative to the output directory, so notes can embed it
+
+
+class PhotoStore:
+    """
+    Photo files stored once per content hash, under ``media/objects/``.
+
+    A catalog maps each photo's Strava ID to the object holding its content, so
+    a photo that's already been fetched is never downloaded again, and the same
+    image uploaded twice (or to two activities) is stored once. Per-activity
+    paths are hard links to the object; where the filesystem can't link, notes
+    embed the object itself.
+    """
+
+    def __init__(self, output_dir: Path, catalog_file: Path):
+        self.output_dir = output_dir
+        self.catalog_file = catalog_file
+        self.catalog: dict[str, str] = {}  # photo ID -> object path relative to output_dir
+        self.downloaded = 0
+        self.downloaded_bytes = 0
+        self._dirty = False
+        if catalog_file.exists():
+            try:
+                self.catalog = json.loads(catalog_file.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                self.catalog = {}
+
+    def object_path(self, digest: str, suffix: str = ".jpg") -> str:
+        """Relative path of the object for a content hash."""
+        return f"{OBJECTS_DIR}/{digest[:2]}/{digest}{suffix}"
+
+    def add_bytes(self, key: str, content: bytes, suffix: str = ".jpg") -> str:
+        """
+        Store content for a photo ID, reusing an identical object if there is one.
+
+        Returns:
+            Object path relative to the output directory
+        """
+        relpath = self.object_path(hashlib.sha256(content).hexdigest(), suffix)
+        path = self.output_dir / relpath
+        if not path.exists():
+            with timings.phase("write.photo"):
+                write_atomic(path, content)
+        if self.catalog.get(key) != relpath:
+            self.catalog[key] = relpath
+            self._dirty = True
+        return relpath
+
+    def fetch(self, key: str, url: str) -> Optional[str]:
+        """
+        Object path for a photo, downloading it only if its ID isn't known yet.
+
+        Returns:
+            Object path relative to the output directory, or None if the download failed
+        """
+        known = self.catalog.get(key)
+        if known is not None and (self.output_dir / known).exists():
+            return known
+        try:
+            with timings.phase("media.photo_download"):
+                response = requests.get(url, timeout=30)
+                response.raise_for_status()
+        except requests.RequestException:
+            return None
+        self.downloaded += 1
+        self.downloaded_bytes += len(response.content)
+        suffix = PurePosixPath(urlparse(url).path).suffix.lower() or ".jpg"
+        return self.add_bytes(key, response.content, suffix)
+
+    def link(self, object_relpath: str, relpath: str) -> str:
+        """
+        Hard-link an object to a per-activity path.
+
+        Returns:
+            The path notes should embed: ``relpath``, or the object's own path
+            if hard links aren't supported here
+        """
+        source = self.output_dir / object_relpath
+        target = self.output_dir / relpath
+        try:
+            if target.exists():
+                if os.path.samefile(source, target):
+                    return relpath
+                target.unlink()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.link(source, target)
+        except OSError:
+            return object_relpath
+        return relpath
+
+    def replace_object(self, path: Path, content: Path) -> Optional[str]:
+        """
+        Store new content (e.g. a smaller version) in place of the object a
+        photo is linked to, moving the file in and pointing the catalog at it.
+
+        Returns:
+            The new object's path relative to the output directory, or None if
+            the photo isn't a link to a stored object
+        """
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        objects = (self.output_dir / OBJECTS_DIR / digest[:2]).glob(f"{digest}.*")
+        old = next((found for found in objects if found.suffix != ".tmp"), None)
+        if old is None or not os.path.samefile(old, path):
+            return None
+        old_relpath = old.relative_to(self.output_dir).as_posix()
+        new_relpath = self.object_path(hashlib.sha256(content.read_bytes()).hexdigest(), old.suffix)
+        if new_relpath == old_relpath:
+            content.unlink()
+            return old_relpath
+        new = self.output_dir / new_relpath
+        if new.exists():
+            content.unlink()
+        else:
+            new.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(content, new)
+        for key, relpath in self.catalog.items():
+            if relpath == old_relpath:
+                self.catalog[key] = new_relpath
+                self._dirty = True
+        old.unlink()
+        return new_relpath
+
+    def save(self) -> None:
+        """Write the catalog if it changed."""
+        if not self._dirty:
+            return
+        write_atomic(self.catalog_file, json.dumps(self.catalog).encode("utf-8"))
+        self._dirty = False
@@ -0,0 +1,125 @@
+"""Encoded polyline decoding (Google polyline algorithm, as used by Strava) and simplification."""
+
+from array import array
+from itertools import accumulate
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> tuple[array, array]:
+    """
+    Decode an encoded polyline into coordinate arrays.
+
+    Varints are unpacked in a single pass over the bytes; the running sums that
+    turn deltas into coordinates are done with ``accumulate`` rather than per
+    point in Python.
+
+    Args:
+        encoded: Encoded polyline string (e.g. ``map.summary_polyline``)
+        precision: Number of decimal places encoded (5 for Strava)
+
+    Returns:
+        (latitudes, longitudes) as arrays of doubles in degrees
+    """
+    deltas = array("q")
+    value = 0
+    shift = 0
+    for byte in encoded.encode("ascii"):
+        byte -= 63
+        value |= (byte & 0x1F) << shift
+        if byte < 0x20:
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+            value = 0
+            shift = 0
+        else:
+            shift += 5
+
+    factor = 10.0 ** precision
+    lats = array("d", (v / factor for v in accumulate(deltas[0::2])))
+    lngs = array("d", (v / factor for v in accumulate(deltas[1::2])))
+    if len(lngs) < len(lats):  # truncated input
+        del lats[len(lngs):]
+    return lats, lngs
+
+
+def encode_polyline(lats: list[float], lngs: list[float], precision: int = 5) -> str:
+    """Encode coordinates as a polyline string (inverse of decode_polyline)."""
+    factor = 10.0 ** precision
+    chars: list[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in zip(lats, lngs):
+        ilat = round(lat * factor)
+        ilng = round(lng * factor)
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(chars)
+
+
+def _radial_filter(xs: list[float], ys: list[float], tolerance: float) -> list[int]:
+    """Indices of points at least ``tolerance`` away from the previously kept point."""
+    kept = [0]
+    sq_tol = tolerance * tolerance
+    px, py = xs[0], ys[0]
+    for i in range(1, len(xs) - 1):
+        dx = xs[i] - px
+        dy = ys[i] - py
+        if dx * dx + dy * dy >= sq_tol:
+            kept.append(i)
+            px, py = xs[i], ys[i]
+    kept.append(len(xs) - 1)
+    return kept
+
+
+def simplify(xs: list[float], ys: list[float], tolerance: float) -> list[int]:
+    """
+    Simplify a line with Douglas-Peucker, returning the indices of kept points.
+
+    A cheap radial-distance pass first drops points that are closer than the
+    tolerance to their predecessor, which removes most of a dense GPS track
+    before the recursive step. The recursion itself uses an explicit stack, so
+    long tracks can't hit the recursion limit.
+
+    Args:
+        xs: X coordinates (projected, so the tolerance is in the same units)
+        ys: Y coordinates
+        tolerance: Maximum allowed distance from the simplified line
+
+    Returns:
+        Sorted indices into xs/ys, always including the first and last point
+    """
+    n = len(xs)
+    if n <= 2 or tolerance <= 0:
+        return list(range(n))
+
+    candidates = _radial_filter(xs, ys, tolerance)
+    cx = [xs[i] for i in candidates]
+    cy = [ys[i] for i in candidates]
+
+    keep = bytearray(len(candidates))
+    keep[0] = keep[-1] = 1
+    stack = [(0, len(candidates) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = cx[first], cy[first]
+        dx = cx[last] - ax
+        dy = cy[last] - ay
+        norm = (dx * dx + dy * dy) ** 0.5
+        if norm == 0:
+            dists = [((x - ax) ** 2 + (y - ay) ** 2) ** 0.5
+                     for x, y in zip(cx[first + 1:last], cy[first + 1:last])]
+        else:
+            dists = [abs((x - ax) * dy - (y - ay) * dx) / norm
+                     for x, y in zip(cx[first + 1:last], cy[first + 1:last])]
+        farthest = max(range(len(dists)), key=dists.__getitem__)
+        if dists[farthest] > tolerance:
+            index = first + 1 + farthest
+            keep[index] = 1
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [candidates[i] for i, flag in enumerate(keep) if flag]
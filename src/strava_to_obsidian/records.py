@@ -0,0 +1,253 @@
+"""Personal records tracked incrementally across the archive."""
+
+import json
+import operator
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.hooks import ExportHook
+from strava_to_obsidian.models import Activity, format_duration
+from strava_to_obsidian.streams import ActivityStreams
+
+RECORDS_NOTE = "Personal Records.md"
+
+RUN_TYPES = {"Run", "TrailRun", "VirtualRun"}
+RIDE_TYPES = {
+    "Ride", "GravelRide", "MountainBikeRide", "EBikeRide", "EMountainBikeRide", "VirtualRide",
+}
+
+
+@dataclass(frozen=True)
+class RecordCategory:
+    """A kind of personal record."""
+
+    key: str
+    label: str
+    lower_is_better: bool
+    distance: float = 0.0  # meters, for best efforts
+    strava_effort: str = ""  # name in the detail response's best_efforts
+
+
+CATEGORIES = (
+    RecordCategory("run_1k", "Fastest 1K", True, 1000, "1k"),
+    RecordCategory("run_5k", "Fastest 5K", True, 5000, "5k"),
+    RecordCategory("run_10k", "Fastest 10K", True, 10000, "10k"),
+    RecordCategory("run_half", "Fastest Half Marathon", True, 21097.5, "Half-Marathon"),
+    RecordCategory("run_marathon", "Fastest Marathon", True, 42195, "Marathon"),
+    RecordCategory("longest_ride", "Longest Ride", False),
+    RecordCategory("biggest_climb", "Biggest Climb", False),
+)
+
+# Entries kept per category; more than shown, so a record that gets worse on
+# re-export can fall back to the next best
+KEEP = 10
+SHOWN = 3
+
+
+@dataclass
+class RecordEntry:
+    """One ranked result."""
+
+    value: float
+    activity_id: int
+    date: str
+    name: str
+    note: str  # note filename without extension, for wikilinks
+
+    def sort_key(self, lower_is_better: bool) -> float:
+        return self.value if lower_is_better else -self.value
+
+
+def fastest_effort(streams: ActivityStreams, distance: float) -> Optional[int]:
+    """
+    Shortest time (seconds) to cover a distance anywhere in the activity.
+
+    For every sample the start of the shortest window ending there is found with
+    a bisect on the cumulative distance; the bisects and subtractions are mapped
+    over the whole stream at once.
+    """
+    dist = streams.get("distance")
+    time = streams.get("time")
+    if dist is None or time is None or len(dist) != len(time) or not len(dist):
+        return None
+    if dist[-1] < distance:
+        return None
+
+    first_end = bisect_left(dist, dist[0] + distance)
+    ends = dist[first_end:]
+    # Last sample at least `distance` before each end
+    starts = map(
+        operator.sub,
+        map(bisect_right, repeat(dist), map(operator.sub, ends, repeat(distance))),
+        repeat(1),
+    )
+    durations = map(operator.sub, time[first_end:], map(time.__getitem__, starts))
+    return int(min(durations, default=0)) or None
+
+
+class PersonalRecords:
+    """Top results per category, persisted as JSON and updated per activity."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.records: dict[str, list[RecordEntry]] = {c.key: [] for c in CATEGORIES}
+        self._dirty = False
+
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                for key, entries in data.items():
+                    if key in self.records:
+                        self.records[key] = [RecordEntry(**e) for e in entries]
+            except (json.JSONDecodeError, OSError, TypeError):
+                pass
+
+    @staticmethod
+    def values_for(activity: Activity) -> dict[str, float]:
+        """Candidate record values for an activity, by category key."""
+        values: dict[str, float] = {}
+        if activity.sport_type in RUN_TYPES:
+            efforts = {
+                e.get("name"): e.get("elapsed_time")
+                for e in activity.raw_data.get("best_efforts") or []
+            }
+            for category in CATEGORIES:
+                if not category.distance:
+                    continue
+                seconds = efforts.get(category.strava_effort)
+                if seconds is None and activity.streams is not None:
+                    seconds = fastest_effort(activity.streams, category.distance)
+                if seconds:
+                    values[category.key] = seconds
+        if activity.sport_type in RIDE_TYPES and activity.distance > 0:
+            values["longest_ride"] = activity.distance
+        if activity.total_elevation_gain > 0:
+            values["biggest_climb"] = activity.total_elevation_gain
+        return values
+
+    def update(self, activity: Activity, note: str) -> bool:
+        """
+        Rank an activity in every category.
+
+        Each category list is sorted and capped at KEEP entries, so this is a
+        bisect and a small list insert per category.
+
+        Returns:
+            True if any shown record changed
+        """
+        values = self.values_for(activity)
+        changed = False
+        for category in CATEGORIES:
+            entries = self.records[category.key]
+            before = [(e.activity_id, e.value, e.name, e.note) for e in entries[:SHOWN]]
+
+            entries[:] = [e for e in entries if e.activity_id != activity.id]
+            value = values.get(category.key)
+            if value is not None:
+                entry = RecordEntry(
+                    value=value,
+                    activity_id=activity.id,
+                    date=activity.start_date_local.strftime("%Y-%m-%d"),
+                    name=activity.name,
+                    note=note,
+                )
+                keys = [e.sort_key(category.lower_is_better) for e in entries]
+                position = bisect_right(keys, entry.sort_key(category.lower_is_better))
+                if position < KEEP:
+                    entries.insert(position, entry)
+                    del entries[KEEP:]
+
+            after = [(e.activity_id, e.value, e.name, e.note) for e in entries[:SHOWN]]
+            if before != after:
+                changed = True
+                self._dirty = True
+        return changed
+
+    def remove(self, activity_id: int) -> bool:
+        """
+        Drop an activity from every category; the next kept entries move up.
+
+        Returns:
+            True if any shown record changed
+        """
+        changed = False
+        for entries in self.records.values():
+            shown = [e.activity_id for e in entries[:SHOWN]]
+            kept = [e for e in entries if e.activity_id != activity_id]
+            if len(kept) != len(entries):
+                entries[:] = kept
+                self._dirty = True
+                changed = changed or activity_id in shown
+        return changed
+
+    def save(self) -> None:
+        """Write the records file if it changed."""
+        if not self._dirty:
+            return
+        data = {key: [asdict(e) for e in entries] for key, entries in self.records.items()}
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self._dirty = False
+
+
+def _format_value(category: RecordCategory, value: float) -> str:
+    if category.distance:
+        return format_duration(int(value))
+    if category.key == "longest_ride":
+        return f"{value / 1000:.1f} km ({value / 1609.344:.1f} mi)"
+    return f"{value:.0f} m ({value * 3.28084:.0f} ft)"
+
+
+def generate_records_note(records: PersonalRecords) -> str:
+    """Generate the Personal Records note."""
+    lines = [
+        "---",
+        "tags:",
+        "  - strava-records",
+        "---",
+        "",
+        "# 🏆 Personal Records",
+    ]
+    for category in CATEGORIES:
+        entries = records.records[category.key][:SHOWN]
+        if not entries:
+            continue
+        lines.extend([
+            "",
+            f"## {category.label}",
+            "",
+            "| # | Result | Date | Activity |",
+            "|---|--------|------|----------|",
+        ])
+        for rank, entry in enumerate(entries, start=1):
+            lines.append(
+                f"| {rank} | {_format_value(category, entry.value)} | {entry.date} "
+                f"| [[{entry.note}\\|{entry.name}]] |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+class RecordsHook(ExportHook):
+    """Keeps personal records up to date and rewrites the note only on change."""
+
+    def __init__(self, state_file: Path, note_path: Path):
+        self.records = PersonalRecords(state_file)
+        self.note_path = note_path
+        self.changed = False
+
+    def record(self, activity: Activity, path: Path) -> None:
+        if self.records.update(activity, path.stem):
+            self.changed = True
+
+    def forget(self, activity_id: int) -> None:
+        if self.records.remove(activity_id):
+            self.changed = True
+
+    def flush(self) -> None:
+        self.records.save()
+        if self.changed or not self.note_path.exists():
+            write_atomic(self.note_path, generate_records_note(self.records).encode("utf-8"))
+            self.changed = False
@@ -0,0 +1,176 @@
+"""Weekly and monthly rollup notes generated from the metrics store."""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import MetricsStore
+from strava_to_obsidian.hooks import ExportHook
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import format_duration, get_sport_icon
+
+ROLLUPS_DIRNAME = "rollups"
+
+
+def week_key(day: date) -> str:
+    """ISO week key, e.g. ``2025-W14``."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(day: date) -> str:
+    """Month key, e.g. ``2025-04``."""
+    return day.strftime("%Y-%m")
+
+
+def period_bounds(key: str) -> tuple[date, date]:
+    """First and last day of a week or month key."""
+    if "-W" in key:
+        year, week = key.split("-W")
+        start = date.fromisocalendar(int(year), int(week), 1)
+        return start, start + timedelta(days=6)
+    year, month = (int(part) for part in key.split("-"))
+    start = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return start, following - timedelta(days=1)
+
+
+def _previous_key(key: str) -> str:
+    start, _ = period_bounds(key)
+    previous = start - timedelta(days=1)
+    return week_key(previous) if "-W" in key else month_key(previous)
+
+
+def _next_key(key: str) -> str:
+    _, end = period_bounds(key)
+    following = end + timedelta(days=1)
+    return week_key(following) if "-W" in key else month_key(following)
+
+
+def generate_rollup_note(
+    key: str,
+    rows: list[int],
+    store: MetricsStore,
+    index: Optional[ActivityIndex] = None,
+) -> str:
+    """
+    Generate a rollup note for one period.
+
+    Args:
+        key: Week or month key
+        rows: Store rows of the period's activities, in date order
+        store: Metrics store the rows belong to
+        index: Activity index used to link to the notes
+    """
+    start, end = period_bounds(key)
+    columns = store.columns
+    kind = "week" if "-W" in key else "month"
+
+    totals: dict[int, list[float]] = defaultdict(lambda: [0, 0.0, 0, 0.0])
+    for row in rows:
+        sport_total = totals[columns["sport"][row]]
+        sport_total[0] += 1
+        sport_total[1] += columns["distance"][row]
+        sport_total[2] += columns["moving_time"][row]
+        sport_total[3] += columns["elevation"][row]
+
+    count = len(rows)
+    distance = sum(t[1] for t in totals.values())
+    moving_time = int(sum(t[2] for t in totals.values()))
+    elevation = sum(t[3] for t in totals.values())
+
+    lines = [
+        "---",
+        f"period: {key}",
+        f"period_type: {kind}",
+        f"start: {start.isoformat()}",
+        f"end: {end.isoformat()}",
+        f"activities: {count}",
+        f"distance_km: {distance / 1000:.2f}",
+        f"distance_mi: {distance / 1609.344:.2f}",
+        f"moving_time: {moving_time}",
+        f"elevation_gain_m: {elevation:.1f}",
+        "tags:",
+        "  - strava-rollup",
+        f"  - strava-rollup/{kind}",
+        "---",
+        "",
+        f"# {key}",
+        "",
+        f"← [[{_previous_key(key)}]] | [[{_next_key(key)}]] →",
+        "",
+        "| Sport | Activities | Distance | Moving Time | Elevation |",
+        "|-------|------------|----------|-------------|-----------|",
+    ]
+    for code, (n, dist, seconds, gain) in sorted(totals.items(), key=lambda t: -t[1][1]):
+        sport = store.sports[code]
+        lines.append(
+            f"| {get_sport_icon(sport)} {sport} | {n} | {dist / 1000:.1f} km "
+            f"({dist / 1609.344:.1f} mi) | {format_duration(int(seconds))} | {gain:.0f} m |"
+        )
+    lines.append(
+        f"| **Total** | **{count}** | **{distance / 1000:.1f} km** | "
+        f"**{format_duration(moving_time)}** | **{elevation:.0f} m** |"
+    )
+
+    lines.extend(["", "## Activities", ""])
+    for row in rows:
+        day = date.fromordinal(columns["day"][row])
+        sport = store.sports[columns["sport"][row]]
+        entry = index.get(columns["id"][row]) if index is not None else None
+        link = f"[[{Path(entry.file_path).stem}]]" if entry else f"Activity {columns['id'][row]}"
+        lines.append(
+            f"- {day.isoformat()} {get_sport_icon(sport)} {link} · "
+            f"{columns['distance'][row] / 1000:.1f} km"
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+class RollupHook(ExportHook):
+    """
+    Rewrites the weekly and monthly rollups touched by a run.
+
+    Only periods containing a day changed in the metrics store are regenerated;
+    the first run for a vault (no rollups folder yet) writes every period.
+    """
+
+    def __init__(self, directory: Path, store: MetricsStore, index: Optional[ActivityIndex] = None):
+        self.directory = directory
+        self.store = store
+        self.index = index
+
+    def flush(self) -> None:
+        touched = self.store.take_touched()
+        if not self.directory.exists():
+            touched = set(self.store.columns["day"])
+        if not touched:
+            return
+
+        keys: set[str] = set()
+        for ordinal in touched:
+            day = date.fromordinal(ordinal)
+            keys.add(week_key(day))
+            keys.add(month_key(day))
+
+        # Sort once so each period is a bisect over the day column
+        days = self.store.columns["day"]
+        order = sorted(range(len(days)), key=days.__getitem__)
+        sorted_days = [days[row] for row in order]
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for key in sorted(keys):
+            start, end = period_bounds(key)
+            lo = bisect_left(sorted_days, start.toordinal())
+            hi = bisect_right(sorted_days, end.toordinal())
+            path = self.directory / f"{key}.md"
+            if lo == hi:
+                # Every activity moved out of this period
+                path.unlink(missing_ok=True)
+                continue
+            path.write_text(
+                generate_rollup_note(key, order[lo:hi], self.store, self.index),
+                encoding="utf-8",
+            )
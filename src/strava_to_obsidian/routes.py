@@ -0,0 +1,379 @@
+"""Recognition of repeated routes from activity polylines."""
+
+import json
+import math
+import random
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.hooks import ExportHook, NoteExtras
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity, format_duration, get_sport_icon
+from strava_to_obsidian.polyline import decode_polyline
+from strava_to_obsidian.records import RIDE_TYPES, RUN_TYPES
+from strava_to_obsidian.spatial import METERS_PER_DEGREE
+
+ROUTES_DIRNAME = "routes"
+ROUTES_FILENAME = "routes.json"
+
+CELL_SIZE = 200.0  # meters; side of the grid cells a route is reduced to
+SAMPLE_SPACING = 50.0  # meters between points sampled along the polyline
+MIN_ROUTE_LENGTH = 500.0  # meters; shorter tracks are never matched
+
+# MinHash signature of a route's cell set, split into LSH bands: two routes
+# whose cell sets have Jaccard similarity s share a band with probability
+# 1 - (1 - s**ROWS)**BANDS (about 0.99 at s = 0.8, 0.1 at s = 0.3)
+BANDS = 8
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+MATCH_SIMILARITY = 0.6  # estimated Jaccard similarity to join a route
+MAX_LENGTH_RATIO = 1.25  # routes of very different length never match
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_HASHES)]
+
+
+def sport_group(sport_type: str) -> str:
+    """Sports that can share a route (a trail run and a road run of the same loop)."""
+    if sport_type in RUN_TYPES:
+        return "run"
+    if sport_type in RIDE_TYPES:
+        return "ride"
+    return sport_type.lower()
+
+
+def _cell(lat: float, lng: float) -> tuple[int, int]:
+    """Grid cell of a point, in a sinusoidal projection so cells are about CELL_SIZE wide."""
+    x = lng * METERS_PER_DEGREE * math.cos(math.radians(lat))
+    return math.floor(x / CELL_SIZE), math.floor(lat * METERS_PER_DEGREE / CELL_SIZE)
+
+
+def route_cells(lats, lngs) -> tuple[set[tuple[int, int]], float]:
+    """
+    Grid cells a track passes through, and the track's length in meters.
+
+    Each segment is sampled every SAMPLE_SPACING, so sparse and dense
+    recordings of the same route cover the same cells.
+    """
+    if not len(lats):
+        return set(), 0.0
+    cells = {_cell(lats[0], lngs[0])}
+    length = 0.0
+    for i in range(1, len(lats)):
+        lat0, lng0 = lats[i - 1], lngs[i - 1]
+        dlat = lats[i] - lat0
+        dlng = lngs[i] - lng0
+        kx = math.cos(math.radians(lat0 + dlat / 2))
+        segment = METERS_PER_DEGREE * math.hypot(dlat, dlng * kx)
+        length += segment
+        steps = max(1, math.ceil(segment / SAMPLE_SPACING))
+        for step in range(1, steps + 1):
+            t = step / steps
+            cells.add(_cell(lat0 + dlat * t, lng0 + dlng * t))
+    return cells, length
+
+
+def minhash(cells: set[tuple[int, int]]) -> list[int]:
+    """MinHash signature of a cell set (one minimum per hash function)."""
+    # Spatial hash of each cell; unlike hash() it can't change between Python versions
+    keys = [((cx * 73856093) ^ (cy * 19349663)) & 0xFFFFFFFFFFFF for cx, cy in cells]
+    return [min((a * key + b) % _PRIME for key in keys) for a, b in _HASH_PARAMS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def _bands(signature: list[int]) -> list[tuple]:
+    return [(band, *signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+@dataclass
+class Route:
+    """A cluster of activities along the same path, keyed by its first activity."""
+
+    id: int
+    sport: str
+    length: float  # meters, of the first activity
+    signature: list[int]
+    activities: list[int] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f"Route {self.id}"
+
+
+@dataclass
+class RouteVisit:
+    """One activity on a route, as listed in the route's history."""
+
+    activity_id: int
+    route: int
+    date: str
+    name: str
+    note: str  # note filename without extension, for wikilinks
+    sport_type: str
+    distance: float
+    moving_time: int
+
+
+class RouteStore:
+    """
+    Routes and the activities assigned to them, persisted as JSON.
+
+    Each route keeps the MinHash signature of its first activity. Band keys of
+    those signatures are bucketed on load, so matching a new activity looks up
+    BANDS dictionary keys and compares signatures with the few routes found
+    there, however many routes and activities the archive has.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.routes: dict[int, Route] = {}
+        self.visits: dict[int, RouteVisit] = {}
+        self._buckets: dict[tuple, list[int]] = defaultdict(list)
+        self._dirty = False
+
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                for item in data.get("routes", []):
+                    self._add_route(Route(**item))
+                for item in data.get("visits", []):
+                    visit = RouteVisit(**item)
+                    self.visits[visit.activity_id] = visit
+            except (json.JSONDecodeError, OSError, TypeError):
+                self.routes.clear()
+                self.visits.clear()
+                self._buckets.clear()
+
+    def _add_route(self, route: Route) -> None:
+        self.routes[route.id] = route
+        for key in _bands(route.signature):
+            self._buckets[key].append(route.id)
+
+    def match(self, sport: str, signature: list[int], length: float) -> Optional[Route]:
+        """The most similar known route, if any is similar enough."""
+        candidates = {rid for key in _bands(signature) for rid in self._buckets.get(key, ())}
+        best, best_score = None, MATCH_SIMILARITY
+        for rid in candidates:
+            route = self.routes[rid]
+            if route.sport != sport:
+                continue
+            if max(route.length, length) > MAX_LENGTH_RATIO * min(route.length, length):
+                continue
+            score = similarity(route.signature, signature)
+            if score >= best_score:
+                best, best_score = route, score
+        return best
+
+    def assign(self, activity: Activity) -> Optional[Route]:
+        """
+        The route an activity belongs to, creating a new route if none matches.
+
+        An activity keeps the route it was first assigned to on re-export.
+        Activities without a usable polyline get no route.
+        """
+        visit = self.visits.get(activity.id)
+        if visit is not None and visit.route in self.routes:
+            return self.routes[visit.route]
+
+        encoded = activity.summary_polyline or activity.polyline
+        if not encoded:
+            return None
+        cells, length = route_cells(*decode_polyline(encoded))
+        if length < MIN_ROUTE_LENGTH:
+            return None
+        # Strava's measured distance is steadier than a noisy polyline's length
+        length = activity.distance or length
+
+        sport = sport_group(activity.sport_type)
+        signature = minhash(cells)
+        route = self.match(sport, signature, length)
+        if route is None:
+            route = Route(max(self.routes, default=0) + 1, sport, length, signature)
+            self._add_route(route)
+        self._dirty = True
+        return route
+
+    def add_visit(self, route: Route, activity: Activity, note: str) -> None:
+        """Record (or refresh) an activity's entry in a route's history."""
+        if activity.id not in route.activities:
+            route.activities.append(activity.id)
+        self.visits[activity.id] = RouteVisit(
+            activity_id=activity.id,
+            route=route.id,
+            date=activity.start_date_local.strftime("%Y-%m-%d"),
+            name=activity.name,
+            note=note,
+            sport_type=activity.sport_type,
+            distance=activity.distance,
+            moving_time=activity.moving_time,
+        )
+        self._dirty = True
+
+    def remove_visit(self, activity_id: int) -> Optional[Route]:
+        """Drop an activity from its route's history, returning the route it was on."""
+        visit = self.visits.pop(activity_id, None)
+        if visit is None:
+            return None
+        route = self.routes.get(visit.route)
+        if route is not None and activity_id in route.activities:
+            route.activities.remove(activity_id)
+        self._dirty = True
+        return route
+
+    def history(self, route: Route) -> list[RouteVisit]:
+        """A route's activities, newest first."""
+        visits = [self.visits[aid] for aid in route.activities if aid in self.visits]
+        return sorted(visits, key=lambda visit: (visit.date, visit.activity_id), reverse=True)
+
+    def save(self) -> None:
+        """Write the routes file if it changed."""
+        if not self._dirty:
+            return
+        data = {
+            "routes": [asdict(route) for route in self.routes.values()],
+            "visits": [asdict(visit) for visit in self.visits.values()],
+        }
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self._dirty = False
+
+
+def generate_route_note(route: Route, history: list[RouteVisit]) -> str:
+    """Generate a route's note with its history table."""
+    fastest = min(history, key=lambda visit: visit.moving_time or float("inf"))
+    first = min(visit.date for visit in history)
+    last = max(visit.date for visit in history)
+
+    lines = [
+        "---",
+        f"route_id: {route.id}",
+        f"sport: {route.sport}",
+        f"distance_km: {route.length / 1000:.2f}",
+        f"activities: {len(history)}",
+        f"first: {first}",
+        f"last: {last}",
+        "tags:",
+        "  - strava-route",
+        "---",
+        "",
+        f"# 🗺️ {route.name}",
+        "",
+        f"**{len(history)}** activities · {route.length / 1000:.1f} km · "
+        f"fastest {format_duration(fastest.moving_time)} ([[{fastest.note}\\|{fastest.date}]])",
+        "",
+        "## History",
+        "",
+        "| Date | Activity | Distance | Moving Time | Pace |",
+        "|------|----------|----------|-------------|------|",
+    ]
+    for visit in history:
+        pace = "—"
+        if visit.distance > 0 and visit.moving_time > 0:
+            seconds_per_km = int(visit.moving_time / (visit.distance / 1000))
+            pace = f"{seconds_per_km // 60}:{seconds_per_km % 60:02d} /km"
+        marker = " 🏆" if visit is fastest else ""
+        lines.append(
+            f"| {visit.date} | {get_sport_icon(visit.sport_type)} "
+            f"[[{visit.note}\\|{visit.name}]] | {visit.distance / 1000:.2f} km "
+            f"| {format_duration(visit.moving_time)}{marker} | {pace} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def add_route_field(path: Path, link: str) -> bool:
+    """
+    Add a ``route`` field to an existing note's frontmatter, before its tags.
+
+    Returns:
+        True if the note was changed
+    """
+    try:
+        content = path.read_text(encoding="utf-8")
+    except OSError:
+        return False
+    end = content.find("\n---", 3)
+    if not content.startswith("---\n") or end < 0:
+        return False
+    frontmatter = content[:end]
+    if "\nroute:" in frontmatter:
+        return False
+    field_line = f'route: "{link}"\n'
+    position = frontmatter.find("\ntags:")
+    position = end + 1 if position < 0 else position + 1
+    write_atomic(path, (content[:position] + field_line + content[position:]).encode("utf-8"))
+    return True
+
+
+class RouteHook(ExportHook):
+    """
+    Assigns activities to routes and keeps route notes up to date.
+
+    A route only becomes visible once it has been done twice: from then on its
+    activities get a ``route`` field linking to the route note. When the second
+    activity arrives, the first one's note gets the field added in place.
+    """
+
+    def __init__(
+        self,
+        store: RouteStore,
+        directory: Path,
+        index: Optional[ActivityIndex] = None,
+        output_dir: Optional[Path] = None,
+    ):
+        self.store = store
+        self.directory = directory
+        self.index = index
+        self.output_dir = output_dir
+        self._pending: dict[int, Route] = {}
+        self._changed: set[int] = set()
+
+    def _link(self, route: Route) -> str:
+        return f"[[{route.name}]]"
+
+    def annotate(self, activity: Activity, extras: NoteExtras) -> None:
+        route = self.store.assign(activity)
+        if route is None:
+            return
+        self._pending[activity.id] = route
+        others = [aid for aid in route.activities if aid != activity.id]
+        if others:
+            extras.frontmatter["route"] = self._link(route)
+
+    def record(self, activity: Activity, path: Path) -> None:
+        route = self._pending.pop(activity.id, None)
+        if route is None:
+            return
+        self.store.add_visit(route, activity, path.stem)
+        self._changed.add(route.id)
+        if len(route.activities) == 2 and self.index is not None and self.output_dir:
+            # The route's first activity was exported before it was a route
+            entry = self.index.get(route.activities[0])
+            if entry is not None:
+                add_route_field(self.output_dir / entry.file_path, self._link(route))
+
+    def forget(self, activity_id: int) -> None:
+        self._pending.pop(activity_id, None)
+        route = self.store.remove_visit(activity_id)
+        if route is not None:
+            self._changed.add(route.id)
+
+    def flush(self) -> None:
+        self.store.save()
+        for route_id in sorted(self._changed):
+            route = self.store.routes[route_id]
+            history = self.store.history(route)
+            path = self.directory / f"{route.name}.md"
+            # A note once written is kept while its route has any activities
+            # left, so the links to it stay valid
+            if len(history) >= 2 or (history and path.exists()):
+                write_atomic(path, generate_route_note(route, history).encode("utf-8"))
+            elif not history:
+                path.unlink(missing_ok=True)
+        self._changed.clear()
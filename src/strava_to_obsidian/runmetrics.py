@@ -0,0 +1,117 @@
+"""Machine-readable metrics for each export run, for graphing cron syncs."""
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.timing import PhaseStats
+
+METRICS_FORMATS = ("jsonl", "prometheus")
+PROMETHEUS_PREFIX = "strava_to_obsidian"
+
+# Per-run gauges written to the Prometheus textfile: field -> help text
+GAUGES = {
+    "exported": "Activities exported by the last run",
+    "skipped": "Activities skipped by the last run (already exported or duplicates)",
+    "failed": "Activities that failed in the last run",
+    "unchanged": "Activities re-rendered identically by the last run",
+    "api_requests": "Strava API requests made by the last run",
+    "remaining_15min": "Strava API requests left in the current 15-minute window",
+    "remaining_daily": "Strava API requests left today",
+    "media_bytes": "Bytes of photos downloaded by the last run",
+    "duration_seconds": "Wall-clock duration of the last run",
+    "success": "Whether the last run finished without an API error",
+}
+
+
+@dataclass
+class RunMetrics:
+    """What one export or sync run did, and the API quota it left."""
+
+    command: str
+    finished_at: float = field(default_factory=time.time)  # Unix time
+    duration_seconds: float = 0.0
+    exported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    unchanged: int = 0
+    api_requests: int = 0
+    remaining_15min: int = 0
+    remaining_daily: int = 0
+    media_bytes: int = 0
+    success: bool = True
+    phases: list[PhaseStats] = field(default_factory=list)
+
+
+def metrics_format(path: Path, fmt: Optional[str] = None) -> str:
+    """The format to write metrics in: as given, else from the file extension."""
+    fmt = fmt or ("prometheus" if path.suffix == ".prom" else "jsonl")
+    if fmt not in METRICS_FORMATS:
+        raise ValueError(
+            f"Unknown metrics format '{fmt}'. Choose from: {', '.join(METRICS_FORMATS)}"
+        )
+    return fmt
+
+
+def append_jsonl(path: Path, metrics: RunMetrics) -> None:
+    """Append a run's metrics to a JSON-lines file, one object per run."""
+    data = asdict(metrics)
+    data["phases"] = {stats.pop("phase"): stats for stats in data["phases"]}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def prometheus_text(metrics: RunMetrics) -> str:
+    """A run's metrics in the Prometheus text exposition format."""
+    command = f'command="{_label(metrics.command)}"'
+    lines = []
+
+    def gauge(name: str, help_text: str, samples: list[tuple[str, float]]) -> None:
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{{{labels}}} {_number(value)}" for labels, value in samples)
+
+    for name, help_text in GAUGES.items():
+        gauge(name, help_text, [(command, float(getattr(metrics, name)))])
+    gauge("last_run_timestamp_seconds", "When the last run finished, as Unix time",
+          [(command, metrics.finished_at)])
+    for name, attr, help_text in (
+        ("phase_seconds", "total", "Time spent in each phase by the last run"),
+        ("phase_calls", "count", "Calls of each phase in the last run"),
+        ("phase_p95_seconds", "p95", "95th percentile duration of a call of each phase"),
+    ):
+        samples = [
+            (f'{command},phase="{_label(stats.phase)}"', float(getattr(stats, attr)))
+            for stats in metrics.phases
+        ]
+        if samples:
+            gauge(name, help_text, samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: Path, metrics: RunMetrics, fmt: Optional[str] = None) -> None:
+    """
+    Record a run's metrics.
+
+    JSON lines are appended, one object per run, to keep the history. A
+    Prometheus textfile holds only the latest run (the collector reads it as
+    current gauge values, and the time series is kept by Prometheus), so it's
+    replaced atomically rather than appended to.
+    """
+    if metrics_format(path, fmt) == "prometheus":
+        write_atomic(path, prometheus_text(metrics).encode("utf-8"))
+    else:
+        append_jsonl(path, metrics)
@@ -0,0 +1,191 @@
+"""Rebuild the activity index from notes already in the vault."""
+
+import os
+import re
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.index import ActivityIndex, IndexEntry
+from strava_to_obsidian.layout import LAYOUTS, get_layout
+
+# Frontmatter puts strava_id and date in the first few lines (see generate_frontmatter)
+HEADER_BYTES = 512
+STRAVA_ID_RE = re.compile(rb"^strava_id:\s*(\d+)\s*$", re.MULTILINE)
+DATE_RE = re.compile(rb"^date:\s*(\d{4}-\d{2}-\d{2})", re.MULTILINE)
+
+# Files per worker task; large enough to amortise the pool overhead
+CHUNK_SIZE = 256
+
+
+@dataclass
+class ScanResult:
+    """Outcome of a vault scan."""
+
+    notes_scanned: int = 0
+    layout: str = "flat"
+    entries: dict[int, IndexEntry] = field(default_factory=dict)
+    duplicates: dict[int, list[str]] = field(default_factory=dict)
+
+
+def _walk_notes(root: Path, rel: str = "") -> Iterator[str]:
+    """Yield relative paths of Markdown files, skipping media and hidden folders."""
+    with os.scandir(root / rel if rel else root) as it:
+        for dirent in it:
+            if dirent.name.startswith("."):
+                continue
+            relpath = f"{rel}/{dirent.name}" if rel else dirent.name
+            if dirent.is_dir(follow_symlinks=False):
+                if relpath != "media":
+                    yield from _walk_notes(root, relpath)
+            elif dirent.name.endswith(".md"):
+                yield relpath
+
+
+def _walk_media(root: Path) -> set[str]:
+    """Relative paths of every file under media/."""
+    found: set[str] = set()
+    stack = ["media"]
+    while stack:
+        rel = stack.pop()
+        try:
+            with os.scandir(root / rel) as it:
+                for dirent in it:
+                    relpath = f"{rel}/{dirent.name}"
+                    if dirent.is_dir(follow_symlinks=False):
+                        stack.append(relpath)
+                    else:
+                        found.add(relpath)
+        except OSError:
+            continue
+    return found
+
+
+def read_note_header(path: Path) -> Optional[tuple[int, str]]:
+    """
+    Read the Strava ID and date from the start of a note's frontmatter.
+
+    Only the first HEADER_BYTES of the file are read.
+
+    Returns:
+        (strava_id, YYYY-MM-DD date) or None if the file isn't an activity note
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+    except OSError:
+        return None
+
+    if not head.startswith(b"---"):
+        return None
+    id_match = STRAVA_ID_RE.search(head)
+    if not id_match:
+        return None
+    date_match = DATE_RE.search(head)
+    date = date_match.group(1).decode() if date_match else ""
+    return int(id_match.group(1)), date
+
+
+def _read_chunk(root: Path, relpaths: list[str]) -> list[tuple[str, Optional[tuple[int, str]]]]:
+    return [(relpath, read_note_header(root / relpath)) for relpath in relpaths]
+
+
+def _infer_layout(relpath: str) -> str:
+    """Guess the vault layout from how deeply a note is nested."""
+    depth = relpath.count("/")
+    for layout in LAYOUTS.values():
+        if layout.note_dir_format.count("/") + bool(layout.note_dir_format) == depth:
+            return layout.name
+    return "flat"
+
+
+def scan_vault(
+    output_dir: Path, layout: Optional[str] = None, workers: Optional[int] = None
+) -> ScanResult:
+    """
+    Scan a vault for activity notes in parallel.
+
+    Args:
+        output_dir: Root of the exported vault
+        layout: Layout used to recognise media files belonging to each note
+            (inferred from where the notes live if not given)
+        workers: Thread count (defaults to a few per CPU; the work is I/O bound)
+
+    Returns:
+        Entries keyed by Strava ID, plus any IDs found in more than one note
+    """
+    result = ScanResult()
+    if not output_dir.is_dir():
+        return result
+
+    relpaths = list(_walk_notes(output_dir))
+    result.notes_scanned = len(relpaths)
+    chunks = [relpaths[i:i + CHUNK_SIZE] for i in range(0, len(relpaths), CHUNK_SIZE)]
+
+    found: list[tuple[str, int, str]] = []
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(lambda c: _read_chunk(output_dir, c), chunks):
+            found.extend((rel, *header) for rel, header in chunk if header)
+
+    if layout is None:
+        layout = _infer_layout(found[0][0]) if found else "flat"
+    result.layout = layout
+    vault_layout = get_layout(layout)
+    media = _walk_media(output_dir)
+
+    for relpath, activity_id, date in found:
+        existing = result.entries.get(activity_id)
+        if existing is not None:
+            result.duplicates.setdefault(activity_id, [existing.file_path]).append(relpath)
+            # Keep the most recently written copy
+            if (output_dir / relpath).stat().st_mtime <= (
+                output_dir / existing.file_path
+            ).stat().st_mtime:
+                continue
+
+        candidates = [
+            vault_layout.photo_path(activity_id),
+            vault_layout.map_path(activity_id, "png"),
+            vault_layout.map_path(activity_id, "svg"),
+        ]
+        result.entries[activity_id] = IndexEntry(
+            strava_id=activity_id,
+            file_path=relpath,
+            date=date,
+            media_files=[path for path in candidates if path in media],
+        )
+
+    return result
+
+
+def rebuild_index(
+    output_dir: Path, index: ActivityIndex, workers: Optional[int] = None
+) -> ScanResult:
+    """
+    Replace the contents of an index with what is actually in the vault.
+
+    The layout recorded in the index is kept; for a vault that has never been
+    indexed it is inferred from where the notes live (a vault with no notes yet
+    keeps the layout the index was given). Export timestamps and media recorded
+    for notes that haven't moved are preserved.
+    """
+    layout = index.layout if index.exists() else None
+    result = scan_vault(output_dir, layout, workers=workers)
+    if result.entries:
+        index.layout = result.layout
+    else:
+        result.layout = index.layout
+
+    for activity_id, entry in result.entries.items():
+        previous = index.get(activity_id)
+        if previous is not None and previous.file_path == entry.file_path:
+            entry.exported_at = previous.exported_at
+            entry.strava_updated_at = previous.strava_updated_at
+            entry.media_files = list(dict.fromkeys(previous.media_files + entry.media_files))
+
+    index.entries = result.entries
+    index.mark_dirty()
+    return result
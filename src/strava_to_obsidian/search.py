@@ -0,0 +1,239 @@
+"""Full-text search index over exported activities (SQLite FTS5)."""
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from strava_to_obsidian.columnar import read_note_metrics
+from strava_to_obsidian.hooks import ExportHook
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+
+SEARCH_FILENAME = "search.db"
+
+# Documents written per transaction
+BATCH_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    distance REAL NOT NULL DEFAULT 0,
+    file_path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_start_date ON documents (start_date);
+CREATE INDEX IF NOT EXISTS idx_documents_distance ON documents (distance);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes USING fts5(
+    name, description, sport_type,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+
+@dataclass
+class SearchResult:
+    """A matching activity."""
+
+    strava_id: int
+    name: str
+    sport_type: str
+    start_date: str
+    distance: float  # meters
+    file_path: str
+    snippet: str
+
+
+def _quote_terms(query: str) -> str:
+    """Turn free text into an FTS5 query that matches every word literally."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SearchIndex:
+    """
+    FTS5 index of activity name, description and sport type, with date and
+    distance kept in an ordinary indexed table for range filters.
+
+    Documents are replaced by activity ID, so re-exporting keeps one entry per
+    activity; writes are batched into a transaction.
+    """
+
+    def __init__(self, path: Path, batch_size: int = BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.created = not path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pending: dict[int, tuple] = {}
+
+    def add(
+        self,
+        strava_id: int,
+        name: str,
+        description: str,
+        sport_type: str,
+        start_date: str,
+        distance: float,
+        file_path: str,
+    ) -> None:
+        """Queue a document for the next batch, replacing any earlier version."""
+        self._pending[strava_id] = (
+            strava_id, name, description, sport_type, start_date, distance, file_path
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_activity(self, activity: Activity, file_path: str) -> None:
+        """Queue an exported activity."""
+        self.add(
+            activity.id,
+            activity.name,
+            activity.description or "",
+            activity.sport_type,
+            activity.start_date_local.strftime("%Y-%m-%dT%H:%M:%S"),
+            activity.distance,
+            file_path,
+        )
+
+    def flush(self) -> None:
+        """Write queued documents in a single transaction."""
+        if not self._pending:
+            return
+        rows = list(self._pending.values())
+        ids = [(row[0],) for row in rows]
+        with self.conn:
+            self.conn.executemany("DELETE FROM notes WHERE rowid = ?", ids)
+            self.conn.executemany(
+                "INSERT INTO notes (rowid, name, description, sport_type) VALUES (?, ?, ?, ?)",
+                [row[:4] for row in rows],
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, start_date, distance, file_path) "
+                "VALUES (?, ?, ?, ?)",
+                [(row[0], *row[4:]) for row in rows],
+            )
+        self._pending = {}
+
+    def remove(self, strava_id: int) -> None:
+        """Delete an activity's document, including a queued one."""
+        self._pending.pop(strava_id, None)
+        with self.conn:
+            self.conn.execute("DELETE FROM notes WHERE rowid = ?", (strava_id,))
+            self.conn.execute("DELETE FROM documents WHERE id = ?", (strava_id,))
+
+    def close(self) -> None:
+        """Flush and close the connection."""
+        self.flush()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def search(
+        self,
+        query: str,
+        sport: Optional[str] = None,
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None,
+        min_distance: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        limit: int = 20,
+    ) -> list[SearchResult]:
+        """
+        Find activities matching a full-text query, best matches first.
+
+        Args:
+            query: FTS5 query (e.g. ``hill repeats``, ``name:parkrun``, ``tempo*``);
+                text that isn't valid FTS5 syntax is matched word by word
+            sport: Only this sport type
+            after: Only activities starting on or after this time
+            before: Only activities starting before this time
+            min_distance: Minimum distance in meters
+            max_distance: Maximum distance in meters
+            limit: Maximum number of results
+        """
+        clauses = ["notes MATCH ?"]
+        params: list[Any] = [query]
+        if sport:
+            clauses.append("notes.sport_type = ? COLLATE NOCASE")
+            params.append(sport)
+        if after:
+            clauses.append("documents.start_date >= ?")
+            params.append(after.strftime("%Y-%m-%dT%H:%M:%S"))
+        if before:
+            clauses.append("documents.start_date < ?")
+            params.append(before.strftime("%Y-%m-%dT%H:%M:%S"))
+        if min_distance is not None:
+            clauses.append("documents.distance >= ?")
+            params.append(min_distance)
+        if max_distance is not None:
+            clauses.append("documents.distance <= ?")
+            params.append(max_distance)
+
+        sql = (
+            "SELECT notes.rowid, notes.name, notes.sport_type, documents.start_date, "
+            "documents.distance, documents.file_path, "
+            "snippet(notes, 1, '**', '**', '…', 12) "
+            "FROM notes JOIN documents ON documents.id = notes.rowid "
+            f"WHERE {' AND '.join(clauses)} ORDER BY rank LIMIT ?"
+        )
+        params.append(limit)
+
+        self.flush()
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            params[0] = _quote_terms(query)
+            rows = self.conn.execute(sql, params).fetchall()
+        return [SearchResult(*row) for row in rows]
+
+    def backfill(self, output_dir: Path, index: ActivityIndex) -> int:
+        """
+        Add activities exported before the search index existed, from note frontmatter.
+
+        Returns:
+            Number of activities added
+        """
+        added = 0
+        for entry in index:
+            fields = read_note_metrics(output_dir / entry.file_path)
+            if fields is None or "date" not in fields:
+                continue
+            try:
+                distance = float(fields.get("distance_m", 0))
+            except ValueError:
+                distance = 0.0
+            self.add(
+                entry.strava_id,
+                fields.get("name", ""),
+                fields.get("description", "").replace('\\"', '"'),
+                fields.get("sport_type", ""),
+                fields["date"],
+                distance,
+                entry.file_path,
+            )
+            added += 1
+        self.flush()
+        return added
+
+
+class SearchHook(ExportHook):
+    """Keeps the search index up to date as notes are written."""
+
+    def __init__(self, search_index: SearchIndex, output_dir: Path):
+        self.search_index = search_index
+        self.output_dir = output_dir
+
+    def record(self, activity: Activity, path: Path) -> None:
+        self.search_index.add_activity(activity, path.relative_to(self.output_dir).as_posix())
+
+    def forget(self, activity_id: int) -> None:
+        self.search_index.remove(activity_id)
+
+    def flush(self) -> None:
+        self.search_index.flush()
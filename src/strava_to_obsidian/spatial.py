@@ -0,0 +1,307 @@
+"""Grid index of activity start/end points and offline place tagging."""
+
+import csv
+import math
+import struct
+from array import array
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from slugify import slugify
+
+from strava_to_obsidian.columnar import (
+    pack_columns,
+    read_note_metrics,
+    unpack_columns,
+    write_atomic,
+)
+from strava_to_obsidian.hooks import ExportHook, NoteExtras
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.streams import LATLNG_SCALE
+
+SPATIAL_FILENAME = "spatial.bin"
+MAGIC = b"S2OG"
+
+# Grid cell size in degrees (about 1.1 km of latitude)
+CELL_DEGREES = 0.01
+EARTH_RADIUS = 6_371_008.8  # meters
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+# Two rows per activity: its start and end point
+COLUMNS = {
+    "id": "q",
+    "lat": "i",  # degrees * 1e7
+    "lng": "i",  # degrees * 1e7
+}
+POINT_KINDS = ("start", "end")
+MISSING = -(2 ** 31)  # no coordinate (indoor or manual activity)
+
+DEFAULT_PLACE_RADIUS = 1000.0  # meters
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters (haversine)."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat: float, lng: float) -> tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES)
+
+
+class PointGrid:
+    """Items bucketed by fixed-size lat/lng cells for radius queries."""
+
+    def __init__(self) -> None:
+        self.cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+
+    def add(self, item: int, lat: float, lng: float) -> None:
+        self.cells[_cell(lat, lng)].append(item)
+
+    def remove(self, item: int, lat: float, lng: float) -> None:
+        bucket = self.cells.get(_cell(lat, lng))
+        if bucket and item in bucket:
+            bucket.remove(item)
+
+    def candidates(self, lat: float, lng: float, radius: float) -> Iterator[int]:
+        """Items in every cell overlapping the radius's bounding box."""
+        dlat = radius / METERS_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        lat0, lng0 = _cell(lat - dlat, lng - dlng)
+        lat1, lng1 = _cell(lat + dlat, lng + dlng)
+        for i in range(lat0, lat1 + 1):
+            for j in range(lng0, lng1 + 1):
+                yield from self.cells.get((i, j), ())
+
+
+@dataclass
+class NearbyActivity:
+    """An activity with a start or end point near a location."""
+
+    activity_id: int
+    point: str  # "start" or "end"
+    distance: float  # meters
+
+
+class SpatialIndex:
+    """
+    Start and end points of every exported activity.
+
+    Points are stored as typed columns and bucketed into a grid on load, so a
+    radius query only measures points in the few cells around it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.columns: dict[str, array] = {name: array(code) for name, code in COLUMNS.items()}
+        try:
+            self.columns, _ = unpack_columns(path.read_bytes(), MAGIC, COLUMNS)
+        except (OSError, ValueError, struct.error):
+            pass
+
+        self.grid = PointGrid()
+        self._rows: dict[int, int] = {}  # activity ID -> row of its start point
+        ids, lats, lngs = self.columns["id"], self.columns["lat"], self.columns["lng"]
+        for row in range(0, len(ids), 2):
+            self._rows[ids[row]] = row
+        for row in range(len(ids)):
+            if lats[row] != MISSING:
+                self.grid.add(row, lats[row] / LATLNG_SCALE, lngs[row] / LATLNG_SCALE)
+        self._dirty = False
+
+    def exists(self) -> bool:
+        """Check if the index has been written."""
+        return self.path.exists()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, activity_id: object) -> bool:
+        return activity_id in self._rows
+
+    def _point(self, row: int) -> Optional[tuple[float, float]]:
+        lat = self.columns["lat"][row]
+        if lat == MISSING:
+            return None
+        return lat / LATLNG_SCALE, self.columns["lng"][row] / LATLNG_SCALE
+
+    def update(
+        self,
+        activity_id: int,
+        start: Optional[list[float]],
+        end: Optional[list[float]],
+    ) -> None:
+        """Add or replace an activity's start and end points."""
+        first = self._rows.get(activity_id)
+        if first is None:
+            first = len(self.columns["id"])
+            self._rows[activity_id] = first
+            for name, fill in (("id", activity_id), ("lat", MISSING), ("lng", MISSING)):
+                self.columns[name].extend([fill, fill])
+        else:
+            for row in (first, first + 1):
+                point = self._point(row)
+                if point is not None:
+                    self.grid.remove(row, *point)
+
+        for row, latlng in ((first, start), (first + 1, end)):
+            if latlng and len(latlng) == 2:
+                self.columns["lat"][row] = round(latlng[0] * LATLNG_SCALE)
+                self.columns["lng"][row] = round(latlng[1] * LATLNG_SCALE)
+                self.grid.add(row, latlng[0], latlng[1])
+            else:
+                self.columns["lat"][row] = MISSING
+                self.columns["lng"][row] = MISSING
+        self._dirty = True
+
+    def near(self, lat: float, lng: float, radius: float) -> list[NearbyActivity]:
+        """
+        Activities starting or ending within a radius, nearest first.
+
+        Each activity is listed once, by whichever of its points is closer.
+        """
+        best: dict[int, NearbyActivity] = {}
+        ids = self.columns["id"]
+        for row in self.grid.candidates(lat, lng, radius):
+            point = self._point(row)
+            if point is None:
+                continue
+            meters = distance_m(lat, lng, *point)
+            if meters > radius:
+                continue
+            activity_id = ids[row]
+            current = best.get(activity_id)
+            if current is None or meters < current.distance:
+                best[activity_id] = NearbyActivity(activity_id, POINT_KINDS[row % 2], meters)
+        return sorted(best.values(), key=lambda match: match.distance)
+
+    def save(self) -> None:
+        """Write the index if it changed."""
+        if not self._dirty:
+            return
+        write_atomic(self.path, pack_columns(MAGIC, self.columns))
+        self._dirty = False
+
+    def backfill(self, output_dir: Path, index: ActivityIndex) -> int:
+        """
+        Add activities exported before the spatial index existed, from note frontmatter.
+
+        Returns:
+            Number of activities added
+        """
+        def latlng(value: Optional[str]) -> Optional[list[float]]:
+            try:
+                return [float(part) for part in value.split(",")] if value else None
+            except ValueError:
+                return None
+
+        added = 0
+        for entry in index:
+            if entry.strava_id in self:
+                continue
+            fields = read_note_metrics(output_dir / entry.file_path)
+            if fields is None:
+                continue
+            self.update(
+                entry.strava_id,
+                latlng(fields.get("coordinates")),
+                latlng(fields.get("end_coordinates")),
+            )
+            added += 1
+        return added
+
+
+@dataclass(frozen=True)
+class Place:
+    """A named local area: everything within ``radius`` meters of a point."""
+
+    name: str
+    lat: float
+    lng: float
+    radius: float = DEFAULT_PLACE_RADIUS
+
+    @property
+    def tag(self) -> str:
+        """Obsidian tag for the place."""
+        return f"place/{slugify(self.name)}"
+
+
+def load_places(path: Path) -> list[Place]:
+    """
+    Read places from a CSV file with ``name``, ``lat``, ``lon`` and an optional
+    ``radius`` (meters) column.
+
+    Raises:
+        ValueError: If a row is missing a name or has invalid coordinates
+    """
+    places = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                radius = row.get("radius") or DEFAULT_PLACE_RADIUS
+                places.append(
+                    Place(row["name"].strip(), float(row["lat"]), float(row["lon"]), float(radius))
+                )
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"{path}:{line}: invalid place ({e})") from e
+    return places
+
+
+class PlaceFinder:
+    """Looks up the places containing a point."""
+
+    def __init__(self, places: list[Place]):
+        self.places = places
+        self.max_radius = max((place.radius for place in places), default=0.0)
+        self.grid = PointGrid()
+        for i, place in enumerate(places):
+            self.grid.add(i, place.lat, place.lng)
+
+    def find(self, lat: float, lng: float) -> list[Place]:
+        """Places whose radius covers the point, nearest first."""
+        matches = []
+        for i in self.grid.candidates(lat, lng, self.max_radius):
+            place = self.places[i]
+            meters = distance_m(lat, lng, place.lat, place.lng)
+            if meters <= place.radius:
+                matches.append((meters, place))
+        return [place for _, place in sorted(matches, key=lambda match: match[0])]
+
+
+class SpatialHook(ExportHook):
+    """Indexes start/end points and tags notes with the places they're in."""
+
+    def __init__(self, spatial_index: SpatialIndex, places: Optional[PlaceFinder] = None):
+        self.spatial_index = spatial_index
+        self.places = places
+
+    def annotate(self, activity: Activity, extras: NoteExtras) -> None:
+        if self.places is None:
+            return
+        found: dict[str, Place] = {}
+        for latlng in (activity.start_latlng, activity.end_latlng):
+            if latlng and len(latlng) == 2:
+                for place in self.places.find(latlng[0], latlng[1]):
+                    found.setdefault(place.name, place)
+        if found:
+            extras.frontmatter["places"] = list(found)
+            extras.tags.extend(place.tag for place in found.values())
+
+    def record(self, activity: Activity, path: Path) -> None:
+        self.spatial_index.update(activity.id, activity.start_latlng, activity.end_latlng)
+
+    def forget(self, activity_id: int) -> None:
+        # Without points the activity drops out of the grid; its slot stays
+        if activity_id in self.spatial_index:
+            self.spatial_index.update(activity_id, None, None)
+
+    def flush(self) -> None:
+        self.spatial_index.save()
@@ -0,0 +1,112 @@
+"""Per-kilometre and per-mile splits computed from distance and time streams."""
+
+import operator
+from bisect import bisect_left
+from itertools import accumulate, repeat
+from typing import Optional
+
+from strava_to_obsidian.models import Lap
+from strava_to_obsidian.streams import ActivityStreams
+
+KM = 1000.0
+MILE = 1609.344
+
+# A trailing partial split shorter than this fraction of a full one is dropped
+MIN_PARTIAL_FRACTION = 0.05
+
+
+def _prefix_sums(values) -> list[float]:
+    """Running totals with a leading zero, so sum(values[i:j]) == p[j] - p[i]."""
+    return list(accumulate(values, initial=0.0))
+
+
+def _interpolate_time(distance, time, index: int, boundary: float) -> float:
+    """Time at which the stream crossed a distance boundary."""
+    if index == 0:
+        return float(time[0])
+    d0, d1 = distance[index - 1], distance[index]
+    t0, t1 = time[index - 1], time[index]
+    if d1 <= d0:
+        return float(t1)
+    return t0 + (boundary - d0) / (d1 - d0) * (t1 - t0)
+
+
+def compute_splits(streams: ActivityStreams, split_distance: float) -> list[Lap]:
+    """
+    Split an activity into fixed-distance segments.
+
+    Per-point work is done once, as prefix sums built with ``map``/``accumulate``
+    over the whole stream; each split is then a bisect and a few subtractions,
+    so cost grows with the number of splits rather than with a Python loop over
+    every sample.
+
+    Args:
+        streams: Streams with at least ``distance`` and ``time``
+        split_distance: Split length in meters (KM or MILE)
+
+    Returns:
+        Splits as Lap objects, ready for generate_laps_table()
+    """
+    distance = streams.get("distance")
+    time = streams.get("time")
+    if distance is None or time is None or len(distance) < 2 or len(time) != len(distance):
+        return []
+
+    total = float(distance[-1])
+    count = int(total // split_distance)
+    boundaries = [split_distance * k for k in range(1, count + 1)]
+    if total - split_distance * count >= split_distance * MIN_PARTIAL_FRACTION:
+        boundaries.append(total)
+    if not boundaries:
+        return []
+
+    # dt[i] is the time spent reaching sample i + 1
+    dt = list(map(operator.sub, time[1:], time[:-1]))
+
+    heartrate = streams.get("heartrate")
+    hr_sums: Optional[list[float]] = None
+    hr_time: Optional[list[float]] = None
+    if heartrate is not None and len(heartrate) == len(distance):
+        # Only time with a reading counts towards the average
+        has_hr = [dt_i if hr else 0 for dt_i, hr in zip(dt, heartrate[1:])]
+        hr_sums = _prefix_sums(map(operator.mul, heartrate[1:], dt))
+        hr_time = _prefix_sums(has_hr)
+
+    altitude = streams.get("altitude")
+    gain_sums: Optional[list[float]] = None
+    if altitude is not None and len(altitude) == len(distance):
+        climbs = map(max, map(operator.sub, altitude[1:], altitude[:-1]), repeat(0.0))
+        gain_sums = _prefix_sums(climbs)
+
+    splits = []
+    last = len(distance) - 1
+    prev_index = 0
+    prev_time = float(time[0])
+    prev_boundary = 0.0
+    for lap_index, boundary in enumerate(boundaries, start=1):
+        index = min(bisect_left(distance, boundary), last)
+        at_time = _interpolate_time(distance, time, index, boundary)
+        elapsed = at_time - prev_time
+        split_len = boundary - prev_boundary
+
+        average_hr = None
+        if hr_sums is not None and hr_time is not None:
+            seconds = hr_time[index] - hr_time[prev_index]
+            if seconds > 0:
+                average_hr = (hr_sums[index] - hr_sums[prev_index]) / seconds
+
+        gain = gain_sums[index] - gain_sums[prev_index] if gain_sums is not None else 0.0
+
+        splits.append(
+            Lap(
+                lap_index=lap_index,
+                distance=split_len,
+                elapsed_time=round(elapsed),
+                average_speed=split_len / elapsed if elapsed > 0 else 0.0,
+                average_heartrate=average_hr,
+                total_elevation_gain=gain,
+            )
+        )
+        prev_index, prev_time, prev_boundary = index, at_time, boundary
+
+    return splits
@@ -0,0 +1,199 @@
+"""Activity stream data stored as compact, memory-mappable binary arrays."""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Optional, Union
+
+# Stream types requested from /activities/{id}/streams
+STREAM_TYPES = ("latlng", "time", "distance", "altitude", "heartrate", "cadence", "watts")
+
+# Stored channels and their array typecodes. latlng is split into two channels of
+# integer 1e-7 degrees, which keeps centimetre precision in four bytes per value.
+CHANNEL_TYPES: dict[str, str] = {
+    "time": "I",  # seconds from start
+    "distance": "f",  # meters
+    "altitude": "f",  # meters
+    "heartrate": "H",  # bpm
+    "cadence": "H",  # rpm
+    "watts": "H",  # watts
+    "lat": "i",  # degrees * 1e7
+    "lng": "i",  # degrees * 1e7
+}
+LATLNG_SCALE = 1e7
+
+# File layout: header, one directory record per channel, then 8-byte aligned data
+MAGIC = b"S2OS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBcxI")  # magic, version, channel count, byte order, points
+RECORD = struct.Struct("<12sc3xII")  # name, typecode, offset, length
+ALIGN = 8
+
+Channel = Union[array, memoryview]
+
+
+class ActivityStreams:
+    """Per-channel typed arrays for one activity, all of the same length."""
+
+    def __init__(self, channels: dict[str, Channel]):
+        self.channels = channels
+
+    @classmethod
+    def from_api_response(cls, data: dict[str, Any]) -> "ActivityStreams":
+        """
+        Create streams from a ``key_by_type`` streams response.
+
+        Accepts either the raw response (``{"time": {"data": [...]}}``) or plain
+        lists per stream type. Gaps reported as null are stored as 0.
+        """
+        channels: dict[str, Channel] = {}
+        for key, stream in data.items():
+            values = stream.get("data", []) if isinstance(stream, dict) else stream
+            if key == "latlng":
+                channels["lat"] = array(
+                    "i", (round(p[0] * LATLNG_SCALE) if p else 0 for p in values)
+                )
+                channels["lng"] = array(
+                    "i", (round(p[1] * LATLNG_SCALE) if p else 0 for p in values)
+                )
+            elif key in CHANNEL_TYPES:
+                typecode = CHANNEL_TYPES[key]
+                if typecode in "fd":
+                    channels[key] = array(typecode, (v or 0.0 for v in values))
+                else:
+                    channels[key] = array(typecode, (round(v or 0) for v in values))
+        return cls(channels)
+
+    def __len__(self) -> int:
+        return max((len(values) for values in self.channels.values()), default=0)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.channels
+
+    def __getitem__(self, name: str) -> Channel:
+        return self.channels[name]
+
+    def get(self, name: str) -> Optional[Channel]:
+        """Get a channel if present."""
+        return self.channels.get(name)
+
+    @property
+    def has_latlng(self) -> bool:
+        """Whether GPS coordinates are available."""
+        return "lat" in self.channels and "lng" in self.channels
+
+    def latlng(self) -> list[tuple[float, float]]:
+        """GPS coordinates as (lat, lng) degree pairs."""
+        if not self.has_latlng:
+            return []
+        return [
+            (lat / LATLNG_SCALE, lng / LATLNG_SCALE)
+            for lat, lng in zip(self.channels["lat"], self.channels["lng"])
+        ]
+
+    def to_bytes(self) -> bytes:
+        """Serialize to the binary stream file format."""
+        names = [name for name in CHANNEL_TYPES if name in self.channels]
+        offset = HEADER.size + RECORD.size * len(names)
+        records = []
+        blobs = []
+        for name in names:
+            values = self.channels[name]
+            if not isinstance(values, array) or values.typecode != CHANNEL_TYPES[name]:
+                values = array(CHANNEL_TYPES[name], values)
+            padding = -offset % ALIGN
+            offset += padding
+            blobs.append(b"\0" * padding + values.tobytes())
+            records.append(
+                RECORD.pack(name.encode(), values.typecode.encode(), offset, len(values))
+            )
+            offset += len(values) * values.itemsize
+
+        byteorder = b"<" if sys.byteorder == "little" else b">"
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(names), byteorder, len(self))
+        return b"".join([header, *records, *blobs])
+
+    @classmethod
+    def from_buffer(cls, buffer: Union[bytes, mmap.mmap]) -> "ActivityStreams":
+        """
+        Read streams from the binary format without copying.
+
+        Channels are memoryviews over the buffer, so a memory-mapped file is
+        paged in lazily as values are touched.
+        """
+        magic, version, count, byteorder, _ = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a stream file")
+
+        native = byteorder == (b"<" if sys.byteorder == "little" else b">")
+        view = memoryview(buffer)
+        channels: dict[str, Channel] = {}
+        for i in range(count):
+            raw_name, typecode, offset, length = RECORD.unpack_from(
+                buffer, HEADER.size + i * RECORD.size
+            )
+            code = typecode.decode()
+            size = array(code).itemsize * length
+            data = view[offset:offset + size]
+            if native:
+                channels[raw_name.rstrip(b"\0").decode()] = data.cast(code)
+            else:
+                values = array(code, data.tobytes())
+                values.byteswap()
+                channels[raw_name.rstrip(b"\0").decode()] = values
+        return cls(channels)
+
+    def release(self) -> None:
+        """Let go of the buffer read by from_buffer(), so a memory map can be closed."""
+        for channel in self.channels.values():
+            if isinstance(channel, memoryview):
+                channel.release()
+
+
+class StreamStore:
+    """One binary stream file per activity in a directory."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def path(self, activity_id: int) -> Path:
+        """File path for an activity's streams."""
+        return self.directory / f"{activity_id}.streams"
+
+    def exists(self, activity_id: int) -> bool:
+        """Check if streams have been stored for an activity."""
+        return self.path(activity_id).exists()
+
+    def save(self, activity_id: int, streams: ActivityStreams) -> Path:
+        """Write streams for an activity, replacing any previous file atomically."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(activity_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(streams.to_bytes())
+        os.replace(tmp_path, path)
+        return path
+
+    def delete(self, activity_id: int) -> bool:
+        """Remove an activity's streams, returning whether there were any."""
+        try:
+            self.path(activity_id).unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def load(self, activity_id: int) -> Optional[ActivityStreams]:
+        """Memory-map the streams for an activity, or None if not stored."""
+        try:
+            with open(self.path(activity_id), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            return ActivityStreams.from_buffer(buffer)
+        except (ValueError, struct.error):
+            buffer.close()
+            return None
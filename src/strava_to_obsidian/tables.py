@@ -0,0 +1,112 @@
+"""Tabular export of the local archive (CSV, or Parquet with pyarrow installed)."""
+
+import csv
+import sqlite3
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import Any, Optional
+
+from strava_to_obsidian.columnar import read_note_metrics
+from strava_to_obsidian.database import ACTIVITY_COLUMNS, LAP_COLUMNS, note_row
+from strava_to_obsidian.index import ActivityIndex
+
+TABLE_FORMATS = ("csv", "parquet")
+
+# Rows held in memory at once while writing
+CHUNK_SIZE = 5000
+
+ACTIVITY_TYPES: dict[str, type] = dict(zip(ACTIVITY_COLUMNS, (
+    int, str, str, str, float, int, int, float, float, float, float, int, float, float, float, str,
+)))
+LAP_TYPES: dict[str, type] = dict(zip(LAP_COLUMNS, (int, int, float, int, float, float, float)))
+
+
+def activity_rows_from_notes(output_dir: Path, index: ActivityIndex) -> Iterator[tuple]:
+    """Activity rows read one note at a time from the archive's frontmatter."""
+    for entry in index:
+        fields = read_note_metrics(output_dir / entry.file_path)
+        if fields is not None and "date" in fields:
+            yield note_row(entry.strava_id, entry.file_path, fields)
+
+
+def rows_from_database(conn: sqlite3.Connection, table: str, columns: tuple) -> Iterator[tuple]:
+    """Rows of a database table, fetched lazily from the cursor."""
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY 1, 2")
+    while True:
+        batch = cursor.fetchmany(CHUNK_SIZE)
+        if not batch:
+            return
+        yield from (tuple(row) for row in batch)
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_csv(path: Path, columns: dict[str, type], rows: Iterable[tuple]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for chunk in _chunks(rows, CHUNK_SIZE):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+def _write_parquet(path: Path, columns: dict[str, type], rows: Iterable[tuple]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Parquet output needs pyarrow: pip install 'strava-to-obsidian[parquet]'"
+        ) from e
+
+    arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns.items()])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(rows, CHUNK_SIZE):
+            # One row group per chunk; columns are built by transposing the rows
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*chunk), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def write_table(
+    path: Path,
+    columns: dict[str, type],
+    rows: Iterable[tuple],
+    fmt: Optional[str] = None,
+) -> int:
+    """
+    Write rows to a CSV or Parquet file in chunks of CHUNK_SIZE.
+
+    Rows are consumed lazily, so memory use doesn't grow with the archive.
+
+    Args:
+        path: Output file
+        columns: Column names and their Python types
+        rows: Row tuples in column order
+        fmt: "csv" or "parquet" (default: from the file extension)
+
+    Returns:
+        Number of rows written
+    """
+    fmt = fmt or ("parquet" if path.suffix == ".parquet" else "csv")
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer: Any = _write_parquet if fmt == "parquet" else _write_csv
+    return writer(path, columns, rows)
@@ -0,0 +1,110 @@
+"""Per-phase timing of an export: call counts, totals and percentiles."""
+
+import functools
+import json
+import math
+import time
+from array import array
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+PROFILE_FILENAME = "export.prof"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def percentile(ordered: "array[float]", q: float) -> float:
+    """Nearest-rank percentile of values sorted in ascending order."""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class PhaseStats:
+    """Summary of one phase's calls, in seconds."""
+
+    phase: str
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+
+
+class PhaseTimer:
+    """
+    Collects the duration of every call to each instrumented phase.
+
+    Recording a call costs two ``perf_counter`` reads and an array append, so
+    instrumentation stays on for every run; the summary is computed only when
+    asked for.
+    """
+
+    def __init__(self) -> None:
+        self.samples: dict[str, array] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Record one call of a phase."""
+        samples = self.samples.get(phase)
+        if samples is None:
+            samples = self.samples[phase] = array("d")
+        samples.append(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of a ``with`` block as one call of a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """Decorator that times every call of a function as a phase."""
+
+        def decorate(func: F) -> F:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+    def reset(self) -> None:
+        """Forget all recorded calls."""
+        self.samples.clear()
+
+    def stats(self) -> list[PhaseStats]:
+        """Per-phase summaries, the most expensive phase first."""
+        result = []
+        for name, samples in self.samples.items():
+            ordered = array("d", sorted(samples))
+            result.append(PhaseStats(
+                name,
+                len(ordered),
+                math.fsum(ordered),
+                percentile(ordered, 50),
+                percentile(ordered, 95),
+                percentile(ordered, 99),
+            ))
+        return sorted(result, key=lambda stats: -stats.total)
+
+    def write_json(self, path: Path) -> None:
+        """Write the summaries as JSON."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"phases": [asdict(stats) for stats in self.stats()]}
+        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+# Process-wide timer used by the instrumented API, rendering and media functions
+timings = PhaseTimer()
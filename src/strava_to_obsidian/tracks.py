@@ -0,0 +1,281 @@
+"""GPX and TCX track files written from stored streams, in a process pool."""
+
+import calendar
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.records import RIDE_TYPES, RUN_TYPES
+from strava_to_obsidian.streams import LATLNG_SCALE, ActivityStreams
+
+TRACKS_FILENAME = "tracks.json"
+TRACKS_DIR = "media/tracks"
+TRACK_FORMATS = ("gpx", "tcx")
+CHUNK_POINTS = 1000  # trackpoints formatted per write
+
+GPX_NAMESPACE = "http://www.topografix.com/GPX/1/1"
+GPX_TPX_NAMESPACE = "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+TCX_NAMESPACE = "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+TCX_AX_NAMESPACE = "http://www.garmin.com/xmlschemas/ActivityExtension/v2"
+
+
+def track_path(activity_id: int, fmt: str = "gpx") -> str:
+    """Relative path of an activity's track file."""
+    return f"{TRACKS_DIR}/{activity_id}.{fmt}"
+
+
+def has_track(streams: ActivityStreams, fmt: str = "gpx") -> bool:
+    """Whether streams hold enough for a track file (GPS for GPX, times for TCX)."""
+    if fmt == "tcx":
+        return "time" in streams
+    return streams.has_latlng
+
+
+def tcx_sport(sport_type: str) -> str:
+    """TCX only knows three sports."""
+    if sport_type in RUN_TYPES:
+        return "Running"
+    if sport_type in RIDE_TYPES:
+        return "Biking"
+    return "Other"
+
+
+@dataclass
+class TrackJob:
+    """A track file waiting to be written."""
+
+    activity_id: int
+    streams_path: Path
+    path: Path
+    fmt: str
+    name: str
+    sport_type: str
+    start: str  # ISO 8601; UTC when it ends in Z
+    key: str
+
+
+class _Clock:
+    """Formats stream offsets as timestamps, in the zone the start time was given in."""
+
+    def __init__(self, start: str):
+        base = datetime.fromisoformat(start.replace("Z", "+00:00"))
+        self.suffix = ""
+        if base.tzinfo is not None:
+            base = base.astimezone(timezone.utc).replace(tzinfo=None)
+            self.suffix = "Z"
+        self.epoch = calendar.timegm(base.timetuple())
+
+    def __call__(self, offset: float) -> str:
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.epoch + offset)) + self.suffix
+
+
+def _write_gpx(out: IO[str], streams: ActivityStreams, job: TrackJob, clock: _Clock) -> None:
+    name = escape(job.name)
+    out.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<gpx version="1.1" creator="strava-to-obsidian" xmlns="{GPX_NAMESPACE}" '
+        f'xmlns:gpxtpx="{GPX_TPX_NAMESPACE}">\n'
+        f" <metadata><name>{name}</name><time>{clock(0)}</time></metadata>\n"
+        f" <trk><name>{name}</name><type>{escape(job.sport_type)}</type><trkseg>\n"
+    )
+    lats, lngs = streams["lat"], streams["lng"]
+    times = streams.get("time")
+    altitude = streams.get("altitude")
+    heartrate, cadence = streams.get("heartrate"), streams.get("cadence")
+    watts = streams.get("watts")
+    for first in range(0, len(lats), CHUNK_POINTS):
+        chunk = []
+        for i in range(first, min(first + CHUNK_POINTS, len(lats))):
+            lat, lng = lats[i], lngs[i]
+            if lat == 0 and lng == 0:  # a gap in the GPS stream
+                continue
+            point = [f'  <trkpt lat="{lat / LATLNG_SCALE:.7f}" lon="{lng / LATLNG_SCALE:.7f}">']
+            if altitude is not None:
+                point.append(f"<ele>{altitude[i]:.1f}</ele>")
+            if times is not None:
+                point.append(f"<time>{clock(times[i])}</time>")
+            extensions = []
+            if heartrate is not None and heartrate[i]:
+                extensions.append(f"<gpxtpx:hr>{heartrate[i]}</gpxtpx:hr>")
+            if cadence is not None and cadence[i]:
+                extensions.append(f"<gpxtpx:cad>{cadence[i]}</gpxtpx:cad>")
+            if extensions or (watts is not None and watts[i]):
+                point.append("<extensions>")
+                if watts is not None and watts[i]:
+                    point.append(f"<power>{watts[i]}</power>")
+                if extensions:
+                    point.append("<gpxtpx:TrackPointExtension>")
+                    point.extend(extensions)
+                    point.append("</gpxtpx:TrackPointExtension>")
+                point.append("</extensions>")
+            point.append("</trkpt>\n")
+            chunk.append("".join(point))
+        out.write("".join(chunk))
+    out.write(" </trkseg></trk>\n</gpx>\n")
+
+
+def _write_tcx(out: IO[str], streams: ActivityStreams, job: TrackJob, clock: _Clock) -> None:
+    times = streams["time"]
+    lats, lngs = streams.get("lat"), streams.get("lng")
+    distance, altitude = streams.get("distance"), streams.get("altitude")
+    heartrate, cadence = streams.get("heartrate"), streams.get("cadence")
+    watts = streams.get("watts")
+    total_time = times[-1] if len(times) else 0
+    total_distance = distance[-1] if distance is not None and len(distance) else 0.0
+    out.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<TrainingCenterDatabase xmlns="{TCX_NAMESPACE}" xmlns:ns3="{TCX_AX_NAMESPACE}">\n'
+        f" <Activities><Activity Sport={quoteattr(tcx_sport(job.sport_type))}>"
+        f"<Id>{clock(0)}</Id>\n"
+        f'  <Lap StartTime="{clock(0)}"><TotalTimeSeconds>{total_time}</TotalTimeSeconds>'
+        f"<DistanceMeters>{total_distance:.1f}</DistanceMeters>"
+        "<Intensity>Active</Intensity><TriggerMethod>Manual</TriggerMethod>\n"
+        "  <Track>\n"
+    )
+    for first in range(0, len(times), CHUNK_POINTS):
+        chunk = []
+        for i in range(first, min(first + CHUNK_POINTS, len(times))):
+            point = [f"   <Trackpoint><Time>{clock(times[i])}</Time>"]
+            if lats is not None and (lats[i] or lngs[i]):
+                point.append(
+                    f"<Position><LatitudeDegrees>{lats[i] / LATLNG_SCALE:.7f}</LatitudeDegrees>"
+                    f"<LongitudeDegrees>{lngs[i] / LATLNG_SCALE:.7f}</LongitudeDegrees></Position>"
+                )
+            if altitude is not None:
+                point.append(f"<AltitudeMeters>{altitude[i]:.1f}</AltitudeMeters>")
+            if distance is not None:
+                point.append(f"<DistanceMeters>{distance[i]:.1f}</DistanceMeters>")
+            if heartrate is not None and heartrate[i]:
+                point.append(f"<HeartRateBpm><Value>{heartrate[i]}</Value></HeartRateBpm>")
+            if cadence is not None and cadence[i]:
+                point.append(f"<Cadence>{min(cadence[i], 254)}</Cadence>")
+            if watts is not None and watts[i]:
+                point.append(f"<Extensions><ns3:TPX><ns3:Watts>{watts[i]}</ns3:Watts>"
+                             "</ns3:TPX></Extensions>")
+            point.append("</Trackpoint>\n")
+            chunk.append("".join(point))
+        out.write("".join(chunk))
+    out.write("  </Track>\n  </Lap>\n </Activity></Activities>\n</TrainingCenterDatabase>\n")
+
+
+def _write_job(job: TrackJob) -> Optional[int]:
+    """
+    Write one track file (runs in a worker process).
+
+    The streams are memory-mapped and points are formatted a chunk at a time,
+    so memory use doesn't grow with the length of the activity.
+
+    Returns:
+        The job's activity ID, or None if its streams couldn't be read
+    """
+    try:
+        with open(job.streams_path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    job.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = job.path.with_suffix(job.path.suffix + ".tmp")
+    writer = _write_tcx if job.fmt == "tcx" else _write_gpx
+    with buffer:
+        try:
+            streams = ActivityStreams.from_buffer(buffer)
+        except (ValueError, struct.error):
+            return None
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                writer(out, streams, job, _Clock(job.start))
+        finally:
+            streams.release()
+    os.replace(tmp_path, job.path)
+    return job.activity_id
+
+
+def track_key(activity: Activity, streams_path: Path, fmt: str) -> str:
+    """Cache key for a track file: the stream data and the fields written with it."""
+    digest = hashlib.sha1(f"{fmt}:{activity.name}:{activity.sport_type}:".encode())
+    digest.update(_start_time(activity).encode())
+    digest.update(streams_path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _start_time(activity: Activity) -> str:
+    # The API's start_date is UTC; otherwise fall back to the local start time
+    start = activity.raw_data.get("start_date")
+    if isinstance(start, str) and start:
+        return start
+    return activity.start_date_local.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class TrackWriter:
+    """
+    Queues track files during an export and writes them in one batch.
+
+    Each written file's key (a hash of the stream file plus the name, sport and
+    start time) is cached in ``tracks.json``, so a track whose data hasn't
+    changed is never rewritten.
+    """
+
+    def __init__(self, cache_file: Path, fmt: str = "gpx", workers: Optional[int] = None):
+        self.cache_file = cache_file
+        self.fmt = fmt
+        self.workers = workers
+        self.pending: dict[int, TrackJob] = {}
+        self._keys: dict[str, str] = {}
+        if cache_file.exists():
+            try:
+                self._keys = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                self._keys = {}
+
+    def queue(self, activity: Activity, streams_path: Path, path: Path) -> bool:
+        """
+        Queue a track file unless an identical one is already on disk.
+
+        Returns:
+            True if the file will be (re)written
+        """
+        try:
+            key = track_key(activity, streams_path, self.fmt)
+        except OSError:
+            return False
+        if self._keys.get(str(activity.id)) == key and path.exists():
+            return False
+        self.pending[activity.id] = TrackJob(
+            activity.id, streams_path, path, self.fmt, activity.name, activity.sport_type,
+            _start_time(activity), key,
+        )
+        return True
+
+    def flush(self) -> int:
+        """Write all queued tracks, in parallel when there are several."""
+        if not self.pending:
+            return 0
+
+        jobs = list(self.pending.values())
+        if len(jobs) == 1:
+            done = [_write_job(jobs[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                done = list(pool.map(_write_job, jobs, chunksize=max(len(jobs) // 32, 1)))
+
+        written = 0
+        for job, activity_id in zip(jobs, done):
+            if activity_id is not None:
+                self._keys[str(activity_id)] = job.key
+                written += 1
+        self.pending.clear()
+
+        write_atomic(self.cache_file, json.dumps(self._keys).encode("utf-8"))
+        return written
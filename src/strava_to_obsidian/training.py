@@ -0,0 +1,285 @@
+"""Heart-rate zones, TRIMP and rolling training load (ATL/CTL)."""
+
+import json
+import math
+import operator
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from itertools import compress, repeat
+from pathlib import Path
+from typing import Optional
+
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.hooks import ExportHook, NoteExtras
+from strava_to_obsidian.models import Activity, format_duration
+from strava_to_obsidian.streams import ActivityStreams
+
+# Zone lower bounds as a fraction of max heart rate (zones 2-5; zone 1 is below)
+ZONE_BOUNDS = (0.6, 0.7, 0.8, 0.9)
+ZONE_NAMES = ("Recovery", "Endurance", "Tempo", "Threshold", "VO2 Max")
+NO_ZONE = 255
+
+# Time constants (days) for acute and chronic training load
+ATL_DAYS = 7
+CTL_DAYS = 42
+
+# Contributions older than this many CTL time constants are below 0.3% and dropped
+HISTORY_HORIZON = 6 * CTL_DAYS
+
+
+@dataclass(frozen=True)
+class HeartRateProfile:
+    """Athlete heart-rate settings used for zones and TRIMP."""
+
+    max_heartrate: int = 190
+    resting_heartrate: int = 60
+
+    def zone_table(self) -> bytes:
+        """Zone index (0-4) for every integer heart rate; 0 bpm (a gap) maps to NO_ZONE."""
+        thresholds = [b * self.max_heartrate for b in ZONE_BOUNDS]
+        return bytes([NO_ZONE] + [sum(hr >= t for t in thresholds) for hr in range(1, 256)])
+
+    def trimp_table(self) -> array:
+        """Banister TRIMP weight per minute for every integer heart rate."""
+        reserve = max(self.max_heartrate - self.resting_heartrate, 1)
+        weights = array("d", [0.0]) * 256
+        for hr in range(1, 256):
+            ratio = min(max((hr - self.resting_heartrate) / reserve, 0.0), 1.0)
+            weights[hr] = ratio * 0.64 * math.exp(1.92 * ratio)
+        return weights
+
+
+def _hr_and_dt(streams: ActivityStreams) -> Optional[tuple[bytes, list[int]]]:
+    """Heart rate per sample (clamped to a byte) and the seconds each covers."""
+    heartrate = streams.get("heartrate")
+    time = streams.get("time")
+    if heartrate is None or time is None or len(heartrate) != len(time) or len(time) < 2:
+        return None
+    hr = bytes(map(min, heartrate[1:], repeat(255)))
+    dt = list(map(operator.sub, time[1:], time[:-1]))
+    return hr, dt
+
+
+def time_in_zones(streams: ActivityStreams, profile: HeartRateProfile) -> Optional[list[int]]:
+    """
+    Seconds spent in each heart-rate zone.
+
+    Samples are mapped to zones in one ``bytes.translate`` over the whole stream,
+    then each zone's time is summed with ``compress``; no per-sample Python code.
+    """
+    data = _hr_and_dt(streams)
+    if data is None:
+        return None
+    hr, dt = data
+
+    zones = hr.translate(profile.zone_table())
+    result = []
+    for zone in range(len(ZONE_NAMES)):
+        in_zone = zones.translate(bytes(int(z == zone) for z in range(256)))
+        result.append(sum(compress(dt, in_zone)))
+    return result
+
+
+def trimp_from_streams(streams: ActivityStreams, profile: HeartRateProfile) -> Optional[float]:
+    """Banister TRIMP from the heart-rate stream."""
+    data = _hr_and_dt(streams)
+    if data is None:
+        return None
+    hr, dt = data
+    weights = profile.trimp_table()
+    return sum(map(operator.mul, map(weights.__getitem__, hr), dt)) / 60
+
+
+def trimp_from_average(activity: Activity, profile: HeartRateProfile) -> Optional[float]:
+    """Approximate TRIMP from average heart rate and moving time."""
+    if not activity.average_heartrate or not activity.moving_time:
+        return None
+    hr = min(int(round(activity.average_heartrate)), 255)
+    return profile.trimp_table()[hr] * activity.moving_time / 60
+
+
+class TrainingLoad:
+    """
+    Exponentially weighted acute (ATL) and chronic (CTL) training load.
+
+    Both are sums of decayed per-activity loads, so adding or replacing one
+    activity is O(1): its contribution is decayed to the state's reference day
+    and added or subtracted. Nothing is recomputed from the archive.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.day = 0  # ordinal of the reference day
+        self.atl = 0.0
+        self.ctl = 0.0
+        self.loads: dict[str, tuple[int, float]] = {}  # activity ID -> (day, load)
+        self._dirty = False
+
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                self.day = data["day"]
+                self.atl = data["atl"]
+                self.ctl = data["ctl"]
+                self.loads = {k: (v[0], v[1]) for k, v in data["loads"].items()}
+            except (json.JSONDecodeError, OSError, KeyError, TypeError, IndexError):
+                pass
+
+    @staticmethod
+    def _gain(days: int) -> tuple[float, float]:
+        """Weight of a load applied ``days`` before the reference day."""
+        return (
+            (1 - math.exp(-1 / ATL_DAYS)) * math.exp(-days / ATL_DAYS),
+            (1 - math.exp(-1 / CTL_DAYS)) * math.exp(-days / CTL_DAYS),
+        )
+
+    def _apply(self, day: int, load: float) -> None:
+        atl_gain, ctl_gain = self._gain(self.day - day)
+        self.atl += load * atl_gain
+        self.ctl += load * ctl_gain
+
+    def update(self, activity_id: int, day: date, load: float) -> bool:
+        """
+        Add or replace an activity's load.
+
+        Returns:
+            True if the state now reflects the activity's own day, i.e. it
+            wasn't older than an activity added before it
+        """
+        key = str(activity_id)
+        ordinal = day.toordinal()
+
+        previous = self.loads.pop(key, None)
+        if previous is not None and previous[0] <= self.day:
+            self._apply(previous[0], -previous[1])
+
+        if ordinal > self.day:
+            atl_decay, ctl_decay = (
+                math.exp(-(ordinal - self.day) / ATL_DAYS),
+                math.exp(-(ordinal - self.day) / CTL_DAYS),
+            )
+            self.atl *= atl_decay
+            self.ctl *= ctl_decay
+            self.day = ordinal
+            # Forget loads too old to matter if their activity is exported again
+            cutoff = self.day - HISTORY_HORIZON
+            self.loads = {k: v for k, v in self.loads.items() if v[0] >= cutoff}
+
+        if self.day - ordinal <= HISTORY_HORIZON:
+            self._apply(ordinal, load)
+            self.loads[key] = (ordinal, load)
+
+        self._dirty = True
+        return ordinal == self.day
+
+    def preview(self, activity_id: int, day: date, load: float) -> Optional[tuple[float, float]]:
+        """
+        ATL and CTL as of an activity's day once update() has added it,
+        without changing the state.
+
+        Returns:
+            (ATL, CTL), or None if the activity is older than the newest one
+            added, as its day's values aren't kept
+        """
+        ordinal = day.toordinal()
+        if ordinal < self.day:
+            return None
+        atl, ctl = self.atl, self.ctl
+        previous = self.loads.get(str(activity_id))
+        if previous is not None and previous[0] <= self.day:
+            atl_gain, ctl_gain = self._gain(self.day - previous[0])
+            atl -= previous[1] * atl_gain
+            ctl -= previous[1] * ctl_gain
+        atl *= math.exp(-(ordinal - self.day) / ATL_DAYS)
+        ctl *= math.exp(-(ordinal - self.day) / CTL_DAYS)
+        atl_gain, ctl_gain = self._gain(0)
+        return atl + load * atl_gain, ctl + load * ctl_gain
+
+    def remove(self, activity_id: int) -> bool:
+        """Take an activity's load out again, returning whether it was counted."""
+        previous = self.loads.pop(str(activity_id), None)
+        if previous is None:
+            return False
+        if previous[0] <= self.day:
+            self._apply(previous[0], -previous[1])
+        self._dirty = True
+        return True
+
+    @property
+    def tsb(self) -> float:
+        """Training stress balance (form): CTL minus ATL."""
+        return self.ctl - self.atl
+
+    def save(self) -> None:
+        """Write the state file if it changed."""
+        if not self._dirty:
+            return
+        data = {"day": self.day, "atl": self.atl, "ctl": self.ctl, "loads": self.loads}
+        write_atomic(self.path, json.dumps(data).encode("utf-8"))
+        self._dirty = False
+
+
+def generate_zones_table(zones: list[int]) -> list[str]:
+    """Generate a Markdown table for time in heart-rate zones."""
+    total = sum(zones) or 1
+    lines = [
+        "## Heart Rate Zones",
+        "",
+        "| Zone | Time | Share |",
+        "|------|------|-------|",
+    ]
+    for i, (name, seconds) in enumerate(zip(ZONE_NAMES, zones), start=1):
+        lines.append(f"| Z{i} {name} | {format_duration(seconds)} | {seconds / total:.0%} |")
+    return lines
+
+
+class TrainingLoadHook(ExportHook):
+    """
+    Adds zones, TRIMP and ATL/CTL/TSB to notes and keeps the load state.
+
+    The load only counts once the note has been written.
+    """
+
+    def __init__(self, state_file: Path, profile: HeartRateProfile):
+        self.profile = profile
+        self.state = TrainingLoad(state_file)
+        self._pending: dict[int, tuple[date, float]] = {}
+
+    def annotate(self, activity: Activity, extras: NoteExtras) -> None:
+        zones = None
+        trimp = None
+        if activity.streams is not None:
+            zones = time_in_zones(activity.streams, self.profile)
+            trimp = trimp_from_streams(activity.streams, self.profile)
+        if trimp is None:
+            trimp = trimp_from_average(activity, self.profile)
+        if trimp is None:
+            return
+
+        extras.frontmatter["trimp"] = round(trimp, 1)
+        if zones is not None and sum(zones) > 0:
+            extras.frontmatter["hr_zones"] = zones
+            extras.sections.append(generate_zones_table(zones))
+
+        day = activity.start_date_local.date()
+        self._pending[activity.id] = (day, trimp)
+        # Values as of this activity's day are only known when it's the newest so far
+        load = self.state.preview(activity.id, day, trimp)
+        if load is not None:
+            atl, ctl = load
+            extras.frontmatter["atl"] = round(atl, 1)
+            extras.frontmatter["ctl"] = round(ctl, 1)
+            extras.frontmatter["tsb"] = round(ctl - atl, 1)
+
+    def record(self, activity: Activity, path: Path) -> None:
+        pending = self._pending.pop(activity.id, None)
+        if pending is not None:
+            self.state.update(activity.id, *pending)
+
+    def forget(self, activity_id: int) -> None:
+        self._pending.pop(activity_id, None)
+        self.state.remove(activity_id)
+
+    def flush(self) -> None:
+        self.state.save()
@@ -0,0 +1,378 @@
+"""Strava webhook receiver feeding a durable queue of activity work."""
+
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import requests
+
+from strava_to_obsidian.api import STRAVA_API_BASE, StravaAPIError
+from strava_to_obsidian.columnar import write_atomic
+from strava_to_obsidian.config import Config
+
+QUEUE_FILENAME = "webhook_queue.json"
+WEBHOOK_PORT = 8081
+SUBSCRIPTIONS_URL = f"{STRAVA_API_BASE}/push_subscriptions"
+ASPECT_TYPES = ("create", "update", "delete")
+
+
+@dataclass
+class WebhookEvent:
+    """An event pushed by Strava to the subscription's callback URL."""
+
+    object_type: str  # "activity" or "athlete"
+    object_id: int
+    aspect_type: str  # create, update or delete
+    owner_id: int = 0
+    subscription_id: int = 0
+    event_time: int = 0  # Unix time
+    updates: dict[str, str] = field(default_factory=dict)  # e.g. {"title": "Evening Ride"}
+
+    @classmethod
+    def from_payload(cls, data: Any) -> "WebhookEvent":
+        """Parse an event's JSON body, raising ValueError if it isn't one."""
+        try:
+            event = cls(
+                object_type=str(data["object_type"]),
+                object_id=int(data["object_id"]),
+                aspect_type=str(data["aspect_type"]),
+                owner_id=int(data.get("owner_id") or 0),
+                subscription_id=int(data.get("subscription_id") or 0),
+                event_time=int(data.get("event_time") or 0),
+                updates=dict(data.get("updates") or {}),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Not a webhook event: {e}") from e
+        if event.aspect_type not in ASPECT_TYPES:
+            raise ValueError(f"Unknown aspect type '{event.aspect_type}'")
+        return event
+
+
+@dataclass
+class QueuedWork:
+    """What's left to do for one activity."""
+
+    activity_id: int
+    action: str  # "export" (fetch and re-render) or "delete"
+    event_time: int
+    version: int = 1  # bumped whenever another event is folded in
+
+
+class EventQueue:
+    """
+    Pending activity work, kept on disk so events survive a restart.
+
+    There's at most one item per activity. A create and any number of
+    updates coalesce into a single fetch and re-render, and a delete
+    supersedes them; events older than the one already queued (Strava may
+    deliver out of order) are dropped. An item is only removed once it has
+    been carried out, and not if another event for the activity arrived in the
+    meantime, so nothing received is ever lost. Work that failed can be
+    deferred, which moves it to the back and holds it back for a while.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._items: dict[int, QueuedWork] = {}
+        self._retry_at: dict[int, float] = {}  # monotonic time deferred work is due
+        self._changed = threading.Condition()
+        try:
+            for item in json.loads(path.read_text(encoding="utf-8")):
+                work = QueuedWork(**item)
+                self._items[work.activity_id] = work
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def __len__(self) -> int:
+        with self._changed:
+            return len(self._items)
+
+    def get(self, activity_id: int) -> Optional[QueuedWork]:
+        """A copy of the work queued for an activity, if any."""
+        with self._changed:
+            work = self._items.get(activity_id)
+            return replace(work) if work else None
+
+    def push(self, event: WebhookEvent) -> bool:
+        """
+        Queue the work for an event.
+
+        Returns:
+            True if it was queued or folded into queued work, False if ignored
+        """
+        if event.object_type != "activity":
+            return False
+        action = "delete" if event.aspect_type == "delete" else "export"
+        with self._changed:
+            work = self._items.get(event.object_id)
+            if work is None:
+                self._items[event.object_id] = QueuedWork(
+                    event.object_id, action, event.event_time
+                )
+            elif event.event_time < work.event_time:
+                return False
+            else:
+                work.action = action
+                work.event_time = event.event_time
+                work.version += 1
+            self._save()
+            self._changed.notify_all()
+        return True
+
+    def next(self, timeout: Optional[float] = None) -> Optional[QueuedWork]:
+        """
+        A copy of the oldest queued work that isn't deferred, waiting up to
+        ``timeout`` for some.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                for work in self._items.values():
+                    if self._retry_at.get(work.activity_id, now) <= now:
+                        return replace(work)
+                waits = [due - now for due in self._retry_at.values()]
+                if deadline is not None:
+                    if deadline <= now:
+                        return None
+                    waits.append(deadline - now)
+                self._changed.wait(min(waits) if waits else None)
+
+    def defer(self, work: QueuedWork, delay: float) -> None:
+        """Move work that failed to the back of the queue, not to be retried for ``delay``."""
+        with self._changed:
+            current = self._items.pop(work.activity_id, None)
+            if current is None:
+                return
+            self._items[work.activity_id] = current
+            self._retry_at[work.activity_id] = time.monotonic() + delay
+            self._save()
+
+    def done(self, work: QueuedWork) -> bool:
+        """Remove work that was carried out, unless an event arrived for it since."""
+        with self._changed:
+            current = self._items.get(work.activity_id)
+            if current is None or current.version != work.version:
+                return False
+            del self._items[work.activity_id]
+            self._retry_at.pop(work.activity_id, None)
+            self._save()
+            return True
+
+    def _save(self) -> None:
+        data = [asdict(work) for work in self._items.values()]
+        write_atomic(self.path, json.dumps(data).encode("utf-8"))
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP handler for Strava's validation request and event posts."""
+
+    queue: EventQueue
+    verify_token: str = ""
+    subscription_id: Optional[int] = None  # accept events for any subscription if None
+    owner_id: Optional[int] = None  # accept events for any athlete if None
+    on_event: Optional[Callable[[WebhookEvent, bool], None]] = None
+
+    def _send_json(self, status: int, data: dict[str, Any]) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        """Answer the subscription validation request by echoing the challenge."""
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        mode = params.get("hub.mode", [""])[0]
+        token = params.get("hub.verify_token", [""])[0]
+        challenge = params.get("hub.challenge", [""])[0]
+        if mode == "subscribe" and challenge and self.verify_token and token == self.verify_token:
+            self._send_json(200, {"hub.challenge": challenge})
+        else:
+            self._send_json(403, {"error": "verification failed"})
+
+    def do_POST(self) -> None:
+        """Queue an event. Strava wants a 200 within two seconds, so nothing else happens here."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            event = WebhookEvent.from_payload(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if self.subscription_id is not None and event.subscription_id != self.subscription_id:
+            self._send_json(403, {"error": "unknown subscription"})
+            return
+        if self.owner_id is not None and event.owner_id != self.owner_id:
+            queued = False  # still acknowledged, or Strava would keep resending it
+        else:
+            queued = self.queue.push(event)
+        self._send_json(200, {"queued": queued})
+        if self.on_event:
+            self.on_event(event, queued)
+
+    def log_message(self, format: str, *args) -> None:
+        """Suppress default logging."""
+        pass
+
+
+def make_server(
+    queue: EventQueue,
+    verify_token: str,
+    host: str = "localhost",
+    port: int = WEBHOOK_PORT,
+    subscription_id: Optional[int] = None,
+    on_event: Optional[Callable[[WebhookEvent, bool], None]] = None,
+    owner_id: Optional[int] = None,
+) -> http.server.ThreadingHTTPServer:
+    """
+    An HTTP server that answers validation requests and queues events.
+
+    With ``owner_id``, only events about that athlete's activities are queued.
+    """
+    handler = type(
+        "BoundWebhookHandler",
+        (WebhookHandler,),
+        {
+            "queue": queue,
+            "verify_token": verify_token,
+            "subscription_id": subscription_id,
+            "owner_id": owner_id,
+            "on_event": staticmethod(on_event) if on_event else None,
+        },
+    )
+    return http.server.ThreadingHTTPServer((host, port), handler)
+
+
+def process_events(
+    queue: EventQueue,
+    apply: Callable[[QueuedWork], None],
+    stop: threading.Event,
+    on_idle: Optional[Callable[[], None]] = None,
+    on_error: Optional[Callable[[QueuedWork, Exception], None]] = None,
+    retry_delay: float = 60.0,
+    max_retry_delay: float = 6 * 3600.0,
+) -> int:
+    """
+    Carry out queued work until ``stop`` is set.
+
+    Work whose ``apply`` raises is reported to ``on_error`` and left queued.
+    Hitting the rate limit pauses everything for ``retry_delay``; any other
+    failure only defers that activity, for ``retry_delay`` doubling with each
+    failure in a row up to ``max_retry_delay``, so the rest of the queue
+    carries on. ``on_idle`` is called when the queue empties after some work
+    was done (and once more on stopping), to save state in batches.
+
+    Returns:
+        Number of items carried out
+    """
+    done = 0
+    pending_idle = False
+    failures: dict[int, int] = {}
+    while not stop.is_set():
+        work = queue.next(timeout=1.0)
+        if work is None:
+            if pending_idle and on_idle:
+                on_idle()
+            pending_idle = False
+            continue
+        try:
+            apply(work)
+        except Exception as e:
+            if on_error:
+                on_error(work, e)
+            if isinstance(e, StravaAPIError) and e.status_code == 429:
+                stop.wait(retry_delay)
+                continue
+            failures[work.activity_id] = failures.get(work.activity_id, 0) + 1
+            delay = retry_delay * 2 ** (failures[work.activity_id] - 1)
+            queue.defer(work, min(delay, max_retry_delay))
+            continue
+        failures.pop(work.activity_id, None)
+        queue.done(work)
+        done += 1
+        pending_idle = True
+    if pending_idle and on_idle:
+        on_idle()
+    return done
+
+
+def create_subscription(config: Config, callback_url: str, verify_token: str) -> int:
+    """
+    Register the callback URL for webhook events.
+
+    Strava validates the URL with a GET before answering, so the receiver must
+    already be reachable there.
+
+    Returns:
+        The subscription ID
+    """
+    response = requests.post(
+        SUBSCRIPTIONS_URL,
+        data={
+            "client_id": config.strava.client_id,
+            "client_secret": config.strava.client_secret,
+            "callback_url": callback_url,
+            "verify_token": verify_token,
+        },
+        timeout=30,
+    )
+    if not response.ok:
+        raise StravaAPIError(f"Subscription failed: {response.text}", response.status_code)
+    return int(response.json()["id"])
+
+
+class EventSimulator:
+    """
+    Sends requests shaped like Strava's to a receiver, to try it out (or test
+    it) without a public URL or a subscription.
+    """
+
+    def __init__(self, url: str, owner_id: int = 0, subscription_id: int = 0):
+        self.url = url
+        self.owner_id = owner_id
+        self.subscription_id = subscription_id
+        self._clock = 0
+
+    def validate(self, verify_token: str, challenge: str = "strava-challenge") -> Optional[str]:
+        """Send the validation request, returning the challenge echoed back if any."""
+        response = requests.get(
+            self.url,
+            params={
+                "hub.mode": "subscribe",
+                "hub.verify_token": verify_token,
+                "hub.challenge": challenge,
+            },
+            timeout=10,
+        )
+        if response.status_code != 200:
+            return None
+        return response.json().get("hub.challenge")
+
+    def send(
+        self,
+        aspect_type: str,
+        object_id: int,
+        updates: Optional[dict[str, str]] = None,
+        object_type: str = "activity",
+        event_time: Optional[int] = None,
+    ) -> requests.Response:
+        """Post an event; event times count up so each one is newer than the last."""
+        if event_time is None:
+            self._clock = max(self._clock + 1, int(time.time()))
+            event_time = self._clock
+        payload = {
+            "aspect_type": aspect_type,
+            "event_time": event_time,
+            "object_id": object_id,
+            "object_type": object_type,
+            "owner_id": self.owner_id,
+            "subscription_id": self.subscription_id,
+            "updates": updates or {},
+        }
+        return requests.post(self.url, json=payload, timeout=10)
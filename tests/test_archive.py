@@ -0,0 +1,150 @@
+"""Tests for importing a Strava account export archive."""
+
+import gzip
+import io
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from strava_to_obsidian.archive import (
+    StravaArchive,
+    activity_from_row,
+    parse_track,
+    sport_type_from_label,
+)
+from strava_to_obsidian.cli import main
+
+HEADER = (
+    "Activity ID,Activity Date,Activity Name,Activity Type,Activity Description,"
+    "Elapsed Time,Distance,Filename,Elapsed Time,Moving Time,Distance,Elevation Gain,"
+    "Average Heart Rate,Media"
+)
+ROWS = [
+    '101,"Mar 2, 2025, 7:00:00 AM",Morning Run,Run,Easy one,1800,5.01,'
+    "activities/101.gpx.gz,1800,1750,5012.3,42.0,148.5,media/ab12.jpg|media/clip.mp4",
+    '102,"Mar 3, 2025, 6:30:00 PM",Turbo,Virtual Ride,,3600,30.2,'
+    "activities/102.tcx,3600,3600,30200.0,0,,",
+    '103,"Mar 4, 2025, 12:00:00 PM",Swim,Swim,,1200,1.5,activities/103.fit.gz,1200,1100,1500,,,',
+    ",,Broken row,Run,,,,,,,,,,",
+]
+
+GPX = b"""<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1"
+     xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">
+  <metadata><time>2025-03-02T06:59:00Z</time></metadata>
+  <trk><trkseg>
+    <trkpt lat="51.5000" lon="-0.1200"><ele>10.0</ele><time>2025-03-02T07:00:00Z</time>
+      <extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>140</gpxtpx:hr>
+      </gpxtpx:TrackPointExtension></extensions></trkpt>
+    <trkpt lat="51.5050" lon="-0.1200"><ele>12.5</ele><time>2025-03-02T07:02:30Z</time>
+      <extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>150</gpxtpx:hr>
+      </gpxtpx:TrackPointExtension></extensions></trkpt>
+    <trkpt lat="51.5100" lon="-0.1200"><ele>11.0</ele><time>2025-03-02T07:05:00Z</time>
+    </trkpt>
+  </trkseg></trk>
+</gpx>"""
+
+TCX = b"""<?xml version="1.0"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+  <Activities><Activity Sport="Biking"><Lap StartTime="2025-03-03T18:30:00Z">
+    <AverageHeartRateBpm><Value>130</Value></AverageHeartRateBpm>
+    <Track>
+      <Trackpoint><Time>2025-03-03T18:30:00Z</Time><Watts>200</Watts>
+        <DistanceMeters>0.0</DistanceMeters>
+        <HeartRateBpm><Value>120</Value></HeartRateBpm></Trackpoint>
+      <Trackpoint><Time>2025-03-03T18:30:01.500Z</Time><Watts>210</Watts>
+        <DistanceMeters>12.5</DistanceMeters>
+        <HeartRateBpm><Value>122</Value></HeartRateBpm></Trackpoint>
+    </Track>
+  </Lap></Activity></Activities>
+</TrainingCenterDatabase>"""
+
+
+def make_archive(path, prefix: str = "") -> None:
+    """Write a small account export ZIP."""
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(prefix + "activities.csv", "\n".join([HEADER, *ROWS]) + "\n")
+        archive.writestr(prefix + "activities/101.gpx.gz", gzip.compress(GPX))
+        archive.writestr(prefix + "activities/102.tcx", TCX)
+        archive.writestr(prefix + "activities/103.fit.gz", gzip.compress(b"not parsed"))
+        archive.writestr(prefix + "media/ab12.jpg", b"jpeg bytes")
+        archive.writestr(prefix + "media/clip.mp4", b"video bytes")
+
+
+class TestArchiveParsing:
+    """Tests for reading rows and track files."""
+
+    def test_activity_from_row(self):
+        """Test mapping columns, where later duplicate columns are in meters."""
+        activity = activity_from_row({
+            "Activity ID": "7",
+            "Activity Date": "Jan 5, 2024, 7:02:15 AM",
+            "Activity Name": "Hill reps",
+            "Activity Type": "Trail Run",
+            "Elapsed Time": "3000",
+            "Moving Time": "",
+            "Distance": "8.5",
+            "Max Heart Rate": "181.0",
+        }, distance_scale=1000)
+        assert activity.id == 7
+        assert activity.sport_type == "TrailRun"
+        assert activity.start_date_local.strftime("%Y-%m-%d %H:%M") == "2024-01-05 07:02"
+        assert activity.moving_time == 3000
+        assert activity.distance == 8500
+        assert activity.max_heartrate == 181
+        assert sport_type_from_label("E-Bike Ride") == "EBikeRide"
+
+    def test_parse_gpx_and_tcx(self):
+        """Test reading points from GPX and TCX, ignoring lap-level values."""
+        gpx = parse_track(io.BytesIO(GPX))
+        assert list(gpx["time"]) == [0, 150, 300]
+        assert list(gpx["heartrate"]) == [140, 150, 0]
+        assert gpx.latlng()[-1] == (51.51, -0.12)
+        assert gpx["distance"][0] == 0
+        assert gpx["distance"][1] == pytest.approx(556, abs=1)
+        assert gpx["distance"][2] == pytest.approx(1112, abs=1)
+
+        tcx = parse_track(io.BytesIO(TCX))
+        assert not tcx.has_latlng
+        assert list(tcx["heartrate"]) == [120, 122]
+        assert list(tcx["watts"]) == [200, 210]
+        assert list(tcx["distance"]) == [0, 12.5]
+        assert parse_track(io.BytesIO(b"<gpx/>")) is None
+
+
+class TestImportArchive:
+    """Tests for the import-archive command."""
+
+    def test_import_and_rerun(self, tmp_path):
+        """Test importing notes, tracks and photos, then skipping them on a second run."""
+        archive = tmp_path / "export_123.zip"
+        make_archive(archive, prefix="export_123/")
+        output = tmp_path / "vault"
+        runner = CliRunner()
+
+        result = runner.invoke(main, ["import-archive", str(archive), "-o", str(output)])
+        assert result.exit_code == 0, result.output
+        assert "Imported: 3" in result.output
+        assert "Failed:   1" in result.output
+
+        run = (output / "2025-03-02-morning-run-101.md").read_text()
+        assert "distance_km: 5.01" in run
+        assert 'photo: "[[media/101_photo.jpg]]"' in run
+        assert (output / "media" / "101_photo.jpg").read_bytes() == b"jpeg bytes"
+        assert (output / ".strava" / "streams" / "101.streams").exists()
+        assert "sport_type: VirtualRide" in (output / "2025-03-03-turbo-102.md").read_text()
+
+        result = runner.invoke(main, ["import-archive", str(archive), "-o", str(output)])
+        assert "Imported: 0" in result.output
+        assert "Skipped:  3" in result.output
+
+    def test_rejects_other_zips(self, tmp_path):
+        """Test that a ZIP without activities.csv is refused."""
+        path = tmp_path / "other.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("notes.txt", "hello")
+        with pytest.raises(ValueError, match="activities.csv"):
+            StravaArchive(path)
+        result = CliRunner().invoke(main, ["import-archive", str(path), "-o", str(tmp_path)])
+        assert result.exit_code == 1
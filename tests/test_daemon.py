@@ -0,0 +1,172 @@
+"""Tests for the resident sync scheduler."""
+
+import os
+import signal
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from strava_to_obsidian.api import RateLimitInfo, StravaAPIError, StravaClient
+from strava_to_obsidian.cli import export_new_activities
+from strava_to_obsidian.config import Config
+from strava_to_obsidian.daemon import (
+    ActivityClock,
+    PollScheduler,
+    poll_until_stopped,
+    stop_on_signals,
+)
+from strava_to_obsidian.exporter import ActivityExporter
+
+
+def morning_runner(tmp_path) -> ActivityClock:
+    """A clock for an athlete whose runs finish between 7 and 8 every day."""
+    clock = ActivityClock(tmp_path / "clock.json")
+    for day in range(1, 29):
+        clock.add(datetime(2025, 6, day, 6, 30), 3000)
+    return clock
+
+
+def at(hour: int, minute: int = 0) -> tuple[datetime, datetime]:
+    """Local and UTC time on a Monday, with local time being UTC."""
+    utc = datetime(2025, 6, 2, hour, minute, tzinfo=timezone.utc)
+    return utc.replace(tzinfo=None), utc
+
+
+def summary(activity_id: int) -> dict:
+    """An activity as listed, finishing at 7:50 on day ``activity_id`` of June."""
+    return {
+        "id": activity_id,
+        "name": f"Run {activity_id}",
+        "sport_type": "Run",
+        "start_date_local": f"2025-06-{activity_id:02d}T07:00:00Z",
+        "elapsed_time": 3000,
+    }
+
+
+class FakeClient:
+    """Lists the given activities and serves their details, counting detail requests."""
+
+    def __init__(self, activity_ids: list[int], on_detail=None):
+        self.summaries = [summary(activity_id) for activity_id in activity_ids]
+        self.on_detail = on_detail
+        self.requests: list[int] = []
+
+    def get_activities(self, after=None):
+        return iter(self.summaries)
+
+    def get_activity_detail(self, activity_id: int) -> dict:
+        self.requests.append(activity_id)
+        if self.on_detail:
+            self.on_detail(activity_id)
+        return summary(activity_id)
+
+
+class TestActivityClock:
+    """Tests for learning when activities happen."""
+
+    def test_counts_by_finish_hour_and_reloads(self, tmp_path):
+        """Test that activities count in the hour they end, and survive a reload."""
+        clock = morning_runner(tmp_path)
+        assert clock.add_summary({"start_date_local": "2025-06-02T23:30:00Z", "elapsed_time": 3600})
+        assert not clock.add_summary({"name": "no start"})
+        clock.save()
+
+        reloaded = ActivityClock(tmp_path / "clock.json")
+        assert len(reloaded) == 29
+        assert reloaded.counts[7] == 4  # Mondays at 7
+        assert reloaded.counts[24] == 1  # Tuesday at 0:30
+        assert reloaded.weight(7) > reloaded.weight(8) > reloaded.weight(12) > 0
+
+
+class TestPollScheduler:
+    """Tests for fitting polls to activity times and the quota."""
+
+    def test_polls_more_often_when_activities_usually_finish(self, tmp_path):
+        """Test that usual hours get short intervals and quiet hours long ones."""
+        scheduler = PollScheduler(morning_runner(tmp_path))
+        quota = RateLimitInfo(usage_daily=100)
+        assert scheduler.next_poll(quota, *at(7)) == 300
+        assert scheduler.next_poll(quota, *at(3)) == 3600
+        assert 300 < scheduler.next_poll(quota, *at(8)) < scheduler.next_poll(quota, *at(12))
+
+    def test_quota(self, tmp_path):
+        """Test waiting for the 15-minute window, and for the daily reset."""
+        scheduler = PollScheduler(morning_runner(tmp_path), reserve=100)
+        assert scheduler.next_poll(RateLimitInfo(usage_15min=100), *at(7, 7)) == 8 * 60 + 5
+        assert scheduler.next_poll(RateLimitInfo(usage_daily=950), *at(20)) == 4 * 3600 + 60
+
+        # With little quota left the gaps grow past the usual maximum
+        tight = scheduler.next_poll(RateLimitInfo(usage_daily=880), *at(3))
+        assert tight > 3600
+
+
+class TestPollLoop:
+    """Tests for running and stopping the poll loop."""
+
+    def test_signal_stops_after_the_current_poll(self, tmp_path):
+        """Test that SIGTERM during a poll lets it finish, then ends the loop."""
+        scheduler = PollScheduler(morning_runner(tmp_path))
+        stop = threading.Event()
+        finished = []
+
+        def poll() -> None:
+            os.kill(os.getpid(), signal.SIGTERM)
+            finished.append(True)  # still reached: the signal only sets the event
+
+        previous = signal.getsignal(signal.SIGTERM)
+        with stop_on_signals(stop):
+            polls = poll_until_stopped(
+                poll, scheduler, RateLimitInfo(), stop, now=lambda: datetime(2025, 6, 2, 7)
+            )
+        assert polls == len(finished) == 1
+        assert signal.getsignal(signal.SIGTERM) is previous
+
+    def test_poll_exports_only_new_activities(self, tmp_path):
+        """Test that a poll fetches only activities the vault doesn't have yet."""
+        exporter = ActivityExporter(tmp_path / "vault")
+        clock = ActivityClock(tmp_path / "clock.json")
+        client = FakeClient([1, 2])
+
+        counts = export_new_activities(client, exporter, clock, datetime(2025, 6, 1))
+        assert counts.exported == 2 and client.requests == [1, 2]
+        assert len(clock) == 2  # learnt from the first listing
+
+        client.summaries.append(summary(3))
+        counts = export_new_activities(client, exporter, clock, datetime(2025, 6, 1))
+        assert counts.exported == 1 and client.requests == [1, 2, 3]
+        assert len(clock) == 3 and clock.counts[24 + 7] == 1  # Tuesday 3 June at 7
+        assert export_new_activities(client, exporter, clock, datetime(2025, 6, 1)) is None
+
+    def test_stop_leaves_the_rest_for_later(self, tmp_path):
+        """Test that stopping mid-poll finishes the current activity and leaves the rest."""
+        exporter = ActivityExporter(tmp_path / "vault")
+        clock = ActivityClock(tmp_path / "clock.json")
+        stop = threading.Event()
+        client = FakeClient([1, 2, 3], on_detail=lambda activity_id: stop.set())
+
+        counts = export_new_activities(client, exporter, clock, datetime(2025, 6, 1), stop=stop)
+        assert counts.exported == 1 and client.requests == [1]
+        assert exporter.is_known(1) and not exporter.is_known(2)
+        assert 1 in ActivityExporter(tmp_path / "vault").index  # flushed
+
+        stop.clear()
+        client.on_detail = None
+        export_new_activities(client, exporter, clock, datetime(2025, 6, 1), stop=stop)
+        assert client.requests == [1, 2, 3]
+
+    def test_stop_cuts_rate_limit_wait_short(self, tmp_path, monkeypatch):
+        """Test that the wait after a 429 ends as soon as the daemon is told to stop."""
+        config = Config(token_file=tmp_path / "tokens.json")
+        config.strava.access_token = config.strava.refresh_token = "token"
+        config.strava.token_expires_at = 2**40
+        client = StravaClient(config)
+        client.stop = threading.Event()
+        client.stop.set()
+        response = SimpleNamespace(status_code=429, headers={})
+        monkeypatch.setattr(client._session, "request", lambda *args, **kwargs: response)
+
+        with pytest.raises(StravaAPIError) as raised:
+            client.get_athlete()
+        assert raised.value.status_code == 429 and client.requests_made == 1
@@ -0,0 +1,93 @@
+"""Tests for the SQLite activity database."""
+
+from datetime import datetime
+
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.database import DB_FILENAME, ActivityDatabase, DatabaseHook
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.layout import DATA_DIRNAME
+from strava_to_obsidian.models import Activity, Lap
+
+
+def activity(activity_id: int, sport: str, km: float, year: int = 2023) -> Activity:
+    """A minimal activity."""
+    return Activity(
+        id=activity_id,
+        name=f"{sport} {activity_id}",
+        sport_type=sport,
+        start_date_local=datetime(year, 6, activity_id % 28 + 1, 8, 0, 0),
+        distance=km * 1000,
+        moving_time=int(km * 150),
+        laps=[Lap(lap_index=1, distance=km * 500, elapsed_time=60, average_speed=5.0),
+              Lap(lap_index=2, distance=km * 500, elapsed_time=60, average_speed=5.0)],
+    )
+
+
+class TestDatabase:
+    """Tests for batched inserts and queries."""
+
+    def test_batches_and_queries(self, tmp_path):
+        """Test that rows are written per batch and filters use them."""
+        database = ActivityDatabase(tmp_path / DB_FILENAME, batch_size=3)
+        for i, (sport, km, year) in enumerate(
+            [("Ride", 120, 2023), ("Ride", 80, 2023), ("Run", 10, 2023), ("Ride", 150, 2022)],
+            start=1,
+        ):
+            database.add(activity(i, sport, km, year))
+        assert len(database) == 3  # the fourth is still buffered
+        database.flush()
+
+        rides = database.find(
+            sport="ride",
+            after=datetime(2023, 1, 1),
+            before=datetime(2024, 1, 1),
+            min_distance=100_000,
+        )
+        assert [row["id"] for row in rides] == [1]
+        assert database.conn.execute("SELECT COUNT(*) FROM laps").fetchone()[0] == 8
+
+        by_sport = {row["grp"]: row["count"] for row in database.stats("sport")}
+        assert by_sport == {"Ride": 3, "Run": 1}
+
+    def test_reexport_replaces_rows(self, tmp_path):
+        """Test that exporting an activity again replaces its laps, and deleting drops them."""
+        database = ActivityDatabase(tmp_path / DB_FILENAME)
+        exporter = ActivityExporter(tmp_path, hooks=[DatabaseHook(database, tmp_path)])
+        exporter.export_activity(activity(1, "Ride", 50))
+        exporter.flush()
+        updated = activity(1, "Ride", 55)
+        updated.laps = updated.laps[:1]
+        exporter.export_activity(updated, force=True)
+        exporter.flush()
+
+        rows = database.find()
+        assert len(rows) == 1
+        assert rows[0]["distance"] == 55000
+        assert rows[0]["file_path"] == "2023-06-02-ride-1-1.md"
+        assert database.conn.execute("SELECT COUNT(*) FROM laps").fetchone()[0] == 1
+
+        exporter.delete_activity(1)
+        assert database.find() == []
+        assert database.conn.execute("SELECT COUNT(*) FROM laps").fetchone()[0] == 0
+
+    def test_backfill_and_cli(self, tmp_path):
+        """Test filling the database from existing notes and querying it."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.export_activity(activity(1, "Ride", 120))
+        exporter.export_activity(activity(2, "Run", 10))
+        exporter.flush()
+
+        database = ActivityDatabase(tmp_path / DATA_DIRNAME / DB_FILENAME)
+        assert database.backfill(tmp_path, exporter.index) == 2
+        database.close()
+
+        runner = CliRunner()
+        result = runner.invoke(main, ["query", "-o", str(tmp_path), "--min-km", "100"])
+        assert result.exit_code == 0
+        assert "Ride 1" in result.output
+        assert "Run 2" not in result.output
+
+        result = runner.invoke(main, ["stats", "-o", str(tmp_path), "--by", "year"])
+        assert "2023" in result.output
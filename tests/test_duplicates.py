@@ -0,0 +1,117 @@
+"""Tests for duplicate-recording detection."""
+
+from datetime import datetime
+
+from strava_to_obsidian.duplicates import BLOCK, IntervalIndex
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+
+
+def run(activity_id: int, minute: int, **kwargs) -> Activity:
+    """A 30-minute run starting at 7:<minute> on 1 June 2025."""
+    fields = {
+        "name": f"Run {activity_id}",
+        "sport_type": "Run",
+        "start_date_local": datetime(2025, 6, 1, 7, minute, 0),
+        "elapsed_time": 1800,
+        "moving_time": 1750,
+        "distance": 5000.0,
+    }
+    fields.update(kwargs)
+    return Activity(id=activity_id, **fields)
+
+
+class TestIntervalIndex:
+    """Tests for the interval index."""
+
+    def test_overlap_queries(self, tmp_path):
+        """Test finding overlapping spans of the same sport group, after reloading."""
+        intervals = IntervalIndex(tmp_path / "intervals.bin")
+        intervals.add(1, 1000, 2800, "Run")
+        intervals.add(2, 100_000, 190_000, "Ride")  # a long ride, stored out of order
+        intervals.add(3, 3000, 3600, "Run")
+        intervals.add(4, 150_000, 151_000, "VirtualRide")
+        intervals.save()
+
+        reloaded = IntervalIndex(tmp_path / "intervals.bin")
+        assert list(reloaded.columns["start"]) == [1000, 3000, 100_000, 150_000]
+        assert reloaded.overlapping(2000, 3200, "TrailRun") == [(1, 800, 1800), (3, 200, 600)]
+        assert reloaded.overlapping(180_000, 181_000, "Ride") == [(2, 1000, 90_000)]
+        assert reloaded.overlapping(2000, 3200, "Swim") == []
+        assert reloaded.overlapping(2800, 3000, "Run") == []  # touching isn't overlapping
+
+        reloaded.add(1, 5000, 5100, "Run")
+        assert reloaded.overlapping(2000, 2500, "Run") == []
+        assert len(reloaded) == 4
+
+        reloaded.remove(2)
+        assert reloaded.longest == 1000
+
+    def test_blocks_split_and_stay_sorted(self, tmp_path):
+        """Test that out-of-order inserts past a block's size keep every row findable."""
+        intervals = IntervalIndex(tmp_path / "intervals.bin")
+        count = 3 * BLOCK
+        for i in range(count):
+            start = (i * 7919) % count * 100  # a permutation of the start times
+            intervals.add(i, start, start + 50, "Run")
+        assert len(intervals.blocks) > 1
+
+        assert list(intervals.columns["start"]) == [i * 100 for i in range(count)]
+        for i in range(0, count, 97):
+            start = (i * 7919) % count * 100
+            assert intervals.overlapping(start + 10, start + 20, "Run") == [(i, 10, 50)]
+        intervals.save()
+        reloaded = IntervalIndex(tmp_path / "intervals.bin")
+        assert reloaded.remove(5)
+        assert len(reloaded) == count - 1
+
+
+class TestDuplicatePolicies:
+    """Tests for linking, merging and skipping duplicates."""
+
+    def test_link(self, tmp_path):
+        """Test that a second recording links to the first."""
+        exporter = ActivityExporter(tmp_path, duplicates="link")
+        first = exporter.export_activity(run(1, 0))
+        second = exporter.export_activity(run(2, 1))
+        separate = exporter.export_activity(run(3, 40))  # starts after the first ends
+        exporter.flush()
+
+        assert 'duplicate_of: "[[2025-06-01-run-1-1]]"' in second.read_text()
+        assert "duplicate_of" not in first.read_text()
+        assert "duplicate_of" not in separate.read_text()
+        assert exporter.duplicates.flagged == 1
+
+        # A re-export of the original doesn't flag it as a duplicate of its copy
+        exporter.export_activity(run(1, 0), force=True)
+        assert "duplicate_of" not in first.read_text()
+
+    def test_merge(self, tmp_path):
+        """Test that a merge fills the first note's gaps and writes no second note."""
+        exporter = ActivityExporter(tmp_path, duplicates="merge")
+        phone = exporter.export_activity(run(1, 0))
+        watch = run(2, 0, elapsed_time=1790, average_heartrate=151.0, max_heartrate=178)
+        assert exporter.export_activity(watch) is None
+        exporter.flush()
+
+        content = phone.read_text()
+        assert "average_heartrate: 151\nmax_heartrate: 178\nmerged:\n  - 2\ntags:" in content
+        assert not (tmp_path / "2025-06-01-run-2-2.md").exists()
+        assert 2 not in exporter.index
+
+        # Remembered across runs, so the next sync skips it
+        reloaded = ActivityExporter(tmp_path, duplicates="merge")
+        assert reloaded.activity_exists(watch)
+        assert reloaded.export_activity(run(3, 5)) is None
+        assert "merged:\n  - 2\n  - 3\ntags:" in phone.read_text()
+
+    def test_skip_and_backfill(self, tmp_path):
+        """Test skipping, with notes from before the index existed backfilled."""
+        ActivityExporter(tmp_path).export_activity(run(1, 0))  # not flushed: no index file
+
+        exporter = ActivityExporter(tmp_path, duplicates="skip")
+        exporter.ensure_index()
+        assert exporter.export_activity(run(2, 10)) is None
+        assert exporter.export_activity(run(3, 0, sport_type="Ride")) is not None
+        exporter.flush()
+        assert "merged" not in (tmp_path / "2025-06-01-run-1-1.md").read_text()
@@ -0,0 +1,87 @@
+"""Tests for the lifetime heatmap."""
+
+from datetime import datetime
+
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.heatmap import HEADER, MAX_SIDE, HeatmapGrid, HeatmapHook
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.polyline import encode_polyline
+from strava_to_obsidian.streams import ActivityStreams
+
+LINE = ([51.50, 51.51], [-0.12, -0.12])  # about 1.1 km due north
+
+
+def peak_pixels(grid: HeatmapGrid) -> int:
+    """Number of pixels holding the peak count."""
+    return grid._map[HEADER.size:].count(bytes([grid.peak]))
+
+
+class TestHeatmapGrid:
+    """Tests for accumulating tracks."""
+
+    def test_counts_activities_once(self, tmp_path):
+        """Test that pixels count activities and re-adding an activity is ignored."""
+        grid = HeatmapGrid(tmp_path / "heatmap.bin")
+        assert grid.add_tracks({1: LINE, 2: LINE}) == 2
+        assert grid.add_tracks({1: LINE}) == 0
+        assert grid.peak == 2
+        assert grid.zoom == 14
+        grid.save()
+        grid.close()
+
+        reloaded = HeatmapGrid(tmp_path / "heatmap.bin")
+        assert 1 in reloaded and len(reloaded) == 2
+        reloaded.add_tracks({3: LINE})
+        assert reloaded.peak == 3
+        assert peak_pixels(reloaded) > 100  # the whole line, at ~6 m per pixel
+
+        png = reloaded.render()
+        assert png.startswith(b"\x89PNG")
+
+    def test_grows_and_drops_zoom(self, tmp_path):
+        """Test that distant tracks widen the grid at a coarser zoom, keeping counts."""
+        grid = HeatmapGrid(tmp_path / "heatmap.bin")
+        grid.add_tracks({1: LINE, 2: LINE})
+        grid.add_tracks({3: ([51.8, 51.81], [0.4, 0.4])})  # ~45 km away
+
+        assert grid.zoom < 14
+        assert max(grid.width, grid.height) <= MAX_SIDE
+        assert grid.peak == 2
+
+        # Too far to fit at any zoom: kept out rather than shrinking the map
+        extent = (grid.zoom, grid.x0, grid.y0, grid.width, grid.height)
+        grid.add_tracks({4: ([40.70, 40.71], [-74.0, -74.0])})
+        assert (grid.zoom, grid.x0, grid.y0, grid.width, grid.height) == extent
+        assert 4 in grid
+
+
+class TestHeatmapHook:
+    """Tests for the export hook and command."""
+
+    def test_export_and_redraw(self, tmp_path):
+        """Test that exports draw the image and the command backfills from streams."""
+        image = tmp_path / "media" / "heatmap.png"
+        grid = HeatmapGrid(tmp_path / ".strava" / "other.bin")
+        exporter = ActivityExporter(tmp_path, hooks=[HeatmapHook(grid, image)])
+        exporter.export_activity(Activity(
+            id=1, name="Run", sport_type="Run", start_date_local=datetime(2025, 4, 1),
+            summary_polyline=encode_polyline(*LINE),
+        ))
+        exporter.export_activity(Activity(
+            id=2, name="Ride", sport_type="Ride", start_date_local=datetime(2025, 4, 2),
+            streams=ActivityStreams.from_api_response(
+                {"latlng": [[51.5, -0.1], None, [51.52, -0.1]]}
+            ),
+        ))
+        exporter.flush()
+        assert image.exists()
+        assert len(grid) == 2
+
+        # The command's own grid starts empty and picks up the stored streams
+        result = CliRunner().invoke(main, ["heatmap", "-o", str(tmp_path)])
+        assert result.exit_code == 0, result.output
+        assert "Added 1 existing activities" in result.output
+        assert "from 1 activities (zoom 14" in result.output
@@ -0,0 +1,112 @@
+"""Tests for polyline decoding and offline map rendering."""
+
+import math
+from datetime import datetime
+
+from strava_to_obsidian.exporter import ActivityExporter, generate_markdown
+from strava_to_obsidian.maps import MapRenderer, render_map, route_preview_svg
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.polyline import decode_polyline, encode_polyline, simplify
+
+# Example from the Google polyline algorithm documentation
+EXAMPLE_POLYLINE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+class TestPolyline:
+    """Tests for polyline decoding."""
+
+    def test_decode(self):
+        """Test decoding the reference polyline."""
+        lats, lngs = decode_polyline(EXAMPLE_POLYLINE)
+
+        assert list(lats) == [38.5, 40.7, 43.252]
+        assert list(lngs) == [-120.2, -120.95, -126.453]
+
+    def test_encode_roundtrip(self):
+        """Test that encoding inverts decoding."""
+        lats, lngs = decode_polyline(EXAMPLE_POLYLINE)
+        assert encode_polyline(lats, lngs) == EXAMPLE_POLYLINE
+
+    def test_simplify_straight_line(self):
+        """Test that collinear points are dropped."""
+        xs = [float(i) for i in range(100)]
+        ys = [2.0 * i for i in range(100)]
+        assert simplify(xs, ys, 0.5) == [0, 99]
+
+    def test_simplify_keeps_corners(self):
+        """Test that a corner survives simplification."""
+        xs = [0.0, 1.0, 2.0, 3.0, 3.0, 3.0, 3.0]
+        ys = [0.0, 0.0, 0.0, 0.0, 1.0, 2.0, 3.0]
+        assert simplify(xs, ys, 0.1) == [0, 3, 6]
+
+    def test_decode_empty(self):
+        """Test decoding an empty polyline."""
+        lats, lngs = decode_polyline("")
+        assert len(lats) == 0
+        assert len(lngs) == 0
+
+
+class TestMaps:
+    """Tests for map rendering."""
+
+    def test_render_png(self):
+        """Test rendering a PNG."""
+        data = render_map(EXAMPLE_POLYLINE, "png")
+        assert data.startswith(b"\x89PNG\r\n\x1a\n")
+
+    def test_render_svg(self):
+        """Test rendering an SVG."""
+        data = render_map(EXAMPLE_POLYLINE, "svg").decode()
+        assert data.startswith("<svg")
+        assert "<polyline" in data
+
+    def test_renderer_skips_unchanged(self, tmp_path):
+        """Test that unchanged routes are not redrawn."""
+        renderer = MapRenderer(tmp_path / "maps.json")
+        path = tmp_path / "1_map.png"
+        assert renderer.queue(1, EXAMPLE_POLYLINE, path)
+        assert renderer.flush() == 1
+        assert path.exists()
+
+        renderer = MapRenderer(tmp_path / "maps.json")
+        assert not renderer.queue(1, EXAMPLE_POLYLINE, path)
+        assert renderer.queue(1, EXAMPLE_POLYLINE + "??", path)
+
+    def test_export_embeds_map(self, tmp_path):
+        """Test that exported notes embed the rendered map."""
+        activity = Activity(
+            id=42,
+            name="Morning Ride",
+            sport_type="Ride",
+            start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+            summary_polyline=EXAMPLE_POLYLINE,
+        )
+        exporter = ActivityExporter(tmp_path, map_format="png")
+        note = exporter.export_activity(activity)
+        exporter.flush()
+
+        assert "![[media/42_map.png]]" in note.read_text()
+        assert (tmp_path / "media" / "42_map.png").exists()
+        assert exporter.index.get(42).media_files == ["media/42_map.png"]
+
+    def test_route_preview_budget(self):
+        """Test that a dense track is simplified to fit the size budget."""
+        lats = [47.6 + 0.02 * math.sin(i / 300) + 0.0001 * (i % 7) for i in range(5000)]
+        lngs = [-122.3 + 0.03 * math.cos(i / 350) for i in range(5000)]
+        svg = route_preview_svg(encode_polyline(lats, lngs), budget=1500)
+
+        assert svg.startswith("<svg")
+        assert len(svg) <= 1500
+
+    def test_markdown_embeds_route_preview(self):
+        """Test that notes get an inline route sketch without a rendered map."""
+        activity = Activity(
+            id=42,
+            name="Morning Ride",
+            sport_type="Ride",
+            start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+            summary_polyline=EXAMPLE_POLYLINE,
+        )
+
+        assert "## Route\n\n<svg" in generate_markdown(activity)
+        assert "## Route" not in generate_markdown(activity, map_path="media/42_map.png")
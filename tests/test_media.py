@@ -0,0 +1,89 @@
+"""Tests for photo thumbnails and size caps."""
+
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.media import MediaOptions, MediaProcessor, thumbnail_path
+from strava_to_obsidian.models import Activity, ActivityPhoto
+
+
+def activity(activity_id: int, photos: list[ActivityPhoto]) -> Activity:
+    """A minimal activity with a fetched photo set."""
+    return Activity(
+        id=activity_id,
+        name=f"Walk {activity_id}",
+        sport_type="Walk",
+        start_date_local=datetime(2025, 4, activity_id, 9, 0, 0),
+        photos=photos,
+    )
+
+
+class TestThumbnails:
+    """Tests for the media pipeline."""
+
+    def test_thumbnail_paths(self):
+        """Test that thumbnails mirror photo paths under media/thumbs."""
+        assert thumbnail_path("media/1_photo_2.jpg") == "media/thumbs/1_photo_2.jpg"
+        assert thumbnail_path("media/photos/1/002_photo.jpg") == "media/thumbs/1/002_photo.jpg"
+
+    def test_missing_pillow(self, tmp_path, monkeypatch):
+        """Test that a clear error is raised without Pillow."""
+        monkeypatch.setitem(sys.modules, "PIL", None)
+        with pytest.raises(RuntimeError, match="Pillow"):
+            MediaProcessor(tmp_path, tmp_path / "media.json")
+
+    def test_export_with_thumbnails(self, tmp_path):
+        """Test thumbnails, size caps and skipping."""
+        image = pytest.importorskip("PIL.Image")
+        options = MediaOptions(thumbnail_size=64, max_size=200, keep_originals=True)
+        exporter = ActivityExporter(tmp_path, media=options)
+        for key, color in (("p1", "red"), ("p2", "blue")):
+            path = tmp_path / "source.jpg"
+            image.new("RGB", (800, 600), color).save(path)
+            exporter.photos.add_bytes(key, path.read_bytes())
+
+        photos = [ActivityPhoto("p1", "u1", "Bridge"), ActivityPhoto("p2", "u2")]
+        note = exporter.export_activity(activity(1, photos))
+        exporter.export_activity(activity(2, [ActivityPhoto("p2", "u2")]))
+        assert "thumbs" not in note.read_text()  # not until they're made
+        exporter.flush()
+
+        content = note.read_text()
+        assert "![[media/thumbs/1_photo.jpg]]\n*Bridge* · [[media/1_photo.jpg|Full size]]" in (
+            content
+        )
+        with image.open(tmp_path / "media" / "thumbs" / "1_photo.jpg") as thumb:
+            assert thumb.size == (64, 48)
+        with image.open(tmp_path / "media" / "1_photo_2.jpg") as photo:
+            assert photo.size == (200, 150)
+        media = tmp_path / "media"
+        assert os.path.samefile(media / "1_photo_2.jpg", media / "2_photo.jpg")
+        assert (tmp_path / ".strava" / "originals" / "media" / "1_photo.jpg").exists()
+
+        # The smaller photos are new objects; every object still matches its hash
+        assert os.path.samefile(media / "1_photo_2.jpg", tmp_path / exporter.photos.catalog["p2"])
+        objects = list((media / "objects").rglob("*.jpg"))
+        assert len(objects) == 2
+        for path in objects:
+            assert hashlib.sha256(path.read_bytes()).hexdigest() == path.stem
+
+        # Nothing left to do on a re-export
+        exporter.export_activity(activity(1, photos), force=True)
+        assert exporter.media.pending == {}
+
+    def test_unreadable_photo_keeps_full_size_embed(self, tmp_path):
+        """Test that a photo without a thumbnail stays embedded full size."""
+        pytest.importorskip("PIL")
+        exporter = ActivityExporter(tmp_path, media=MediaOptions())
+        exporter.photos.add_bytes("p1", b"not an image")
+
+        note = exporter.export_activity(activity(1, [ActivityPhoto("p1", "u1")]))
+        exporter.flush()
+
+        assert "![[media/1_photo.jpg]]" in note.read_text()
+        assert not (tmp_path / "media" / "thumbs" / "1_photo.jpg").exists()
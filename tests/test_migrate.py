@@ -0,0 +1,98 @@
+"""Tests for vault layouts, the activity index and layout migration."""
+
+from datetime import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.layout import FLAT, YEAR_MONTH, get_layout
+from strava_to_obsidian.migrate import migrate_layout
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.scanner import rebuild_index
+
+
+@pytest.fixture
+def activity():
+    """Create a sample activity with a photo."""
+    return Activity(
+        id=12345678901,
+        name="Morning Run",
+        sport_type="Run",
+        start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+        distance=5000.0,
+        photo_url="https://example.com/photo.jpg",
+    )
+
+
+class TestLayout:
+    """Tests for vault layouts."""
+
+    def test_flat_paths(self):
+        """Test the legacy flat layout."""
+        assert FLAT.note_path("a.md", datetime(2025, 4, 1)) == "a.md"
+        assert FLAT.photo_path(1) == "media/1_photo.jpg"
+        assert FLAT.map_path(1) == "media/1_map.png"
+
+    def test_year_month_paths(self):
+        """Test the sharded layout."""
+        assert YEAR_MONTH.note_path("a.md", datetime(2025, 4, 1)) == "2025/2025-04/a.md"
+        assert YEAR_MONTH.photo_path(1) == "media/photos/1/001_photo.jpg"
+        assert YEAR_MONTH.map_path(1, "svg") == "media/maps/1_map.svg"
+
+    def test_unknown_layout(self):
+        """Test looking up an unknown layout."""
+        with pytest.raises(ValueError):
+            get_layout("nested")
+
+
+class TestMigration:
+    """Tests for exporting into a layout and migrating between layouts."""
+
+    def test_export_records_index(self, tmp_path, activity):
+        """Test that exports land in the layout and are indexed."""
+        exporter = ActivityExporter(tmp_path, layout=YEAR_MONTH)
+        path = exporter.export_activity(activity, download_photo=False)
+        exporter.flush()
+
+        assert path == tmp_path / "2025" / "2025-11" / activity.generate_filename()
+        assert "[[media/photos/12345678901/001_photo.jpg]]" in path.read_text()
+
+        index = ActivityIndex.load(tmp_path)
+        assert index.layout == "year-month"
+        assert index.get(activity.id).file_path == f"2025/2025-11/{activity.generate_filename()}"
+
+    def test_migrate_flat_to_year_month(self, tmp_path, activity):
+        """Test moving a flat vault, its media and embeds to the sharded layout."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.export_activity(activity, download_photo=False)
+        (tmp_path / "media" / "12345678901_photo.jpg").write_bytes(b"jpg")
+
+        # Simulate a vault exported before the index existed
+        index = ActivityIndex.load(tmp_path)
+        assert len(rebuild_index(tmp_path, index).entries) == 1
+
+        result = migrate_layout(tmp_path, index, YEAR_MONTH)
+
+        assert result.notes_moved == 1
+        assert result.media_moved == 1
+        note = tmp_path / "2025" / "2025-11" / activity.generate_filename()
+        assert note.exists()
+        assert not (tmp_path / activity.generate_filename()).exists()
+        assert (tmp_path / "media" / "photos" / "12345678901" / "001_photo.jpg").exists()
+        content = note.read_text()
+        assert "[[media/photos/12345678901/001_photo.jpg]]" in content
+        assert "[[media/12345678901_photo.jpg]]" not in content
+        assert index.layout == "year-month"
+
+    def test_cli_missing_output_dir(self, tmp_path):
+        """Test that migrating a directory that doesn't exist fails without creating it."""
+        missing = tmp_path / "activities"
+        result = CliRunner().invoke(
+            main, ["migrate", "-o", str(missing), "--layout", "year-month"]
+        )
+        assert result.exit_code == 1
+        assert "does not exist" in result.output
+        assert not missing.exists()
@@ -0,0 +1,112 @@
+"""Tests for the content-addressed photo store."""
+
+import os
+from datetime import datetime
+
+import requests
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.layout import FLAT, YEAR
+from strava_to_obsidian.models import Activity, ActivityPhoto
+from strava_to_obsidian.photos import PhotoStore
+
+
+class FakeResponse:
+    """Just enough of requests.Response for a download."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def activity(activity_id: int, photos: list[ActivityPhoto]) -> Activity:
+    """A minimal activity with a fetched photo set."""
+    return Activity(
+        id=activity_id,
+        name=f"Hike {activity_id}",
+        sport_type="Hike",
+        start_date_local=datetime(2025, 4, activity_id, 9, 0, 0),
+        photo_url="https://example.com/primary-600.jpg",
+        photos=photos,
+    )
+
+
+class TestPhotoStore:
+    """Tests for storing and linking photos."""
+
+    def test_duplicates_are_stored_once(self, tmp_path, monkeypatch):
+        """Test that identical images share one object and known IDs aren't fetched."""
+        content = {"a.jpg": b"same image", "b.jpg": b"same image", "c.jpg": b"other"}
+        downloads = []
+
+        def fake_get(url, timeout):
+            downloads.append(url)
+            return FakeResponse(content[url.rsplit("/", 1)[-1]])
+
+        monkeypatch.setattr(requests, "get", fake_get)
+        store = PhotoStore(tmp_path, tmp_path / ".strava" / "photos.json")
+        first = store.fetch("1", "https://example.com/a.jpg")
+        second = store.fetch("2", "https://example.com/b.jpg")
+        third = store.fetch("3", "https://example.com/c.jpg")
+        store.save()
+
+        assert first == second != third
+        assert first.startswith("media/objects/")
+        reloaded = PhotoStore(tmp_path, tmp_path / ".strava" / "photos.json")
+        assert reloaded.fetch("1", "https://example.com/a.jpg") == first
+        assert len(downloads) == 3
+
+    def test_photo_from_api_response(self):
+        """Test picking the largest URL and skipping entries without one."""
+        photo = ActivityPhoto.from_api_response({
+            "unique_id": "abc",
+            "urls": {"100": "small.jpg", "2048": "large.jpg"},
+            "caption": "Summit",
+        })
+        assert (photo.url, photo.caption) == ("large.jpg", "Summit")
+        assert ActivityPhoto.from_api_response({"unique_id": "v", "urls": {}}) is None
+
+
+class TestExportPhotos:
+    """Tests for the full photo set in exported notes."""
+
+    def test_notes_embed_hard_links(self, tmp_path):
+        """Test that notes embed per-activity links that share the stored object."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.photos.add_bytes("p1", b"jpeg one")
+        exporter.photos.add_bytes("p2", b"jpeg two")
+
+        path = exporter.export_activity(activity(1, [
+            ActivityPhoto("p1", "https://example.com/1.jpg", "Trailhead"),
+            ActivityPhoto("p2", "https://example.com/2.jpg"),
+        ]))
+        exporter.export_activity(activity(2, [ActivityPhoto("p2", "https://example.com/2.jpg")]))
+        exporter.flush()
+
+        content = path.read_text()
+        assert 'photo: "[[media/1_photo.jpg]]"\nphotos: 2' in content
+        assert "## Photos\n\n![[media/1_photo.jpg]]\n*Trailhead*\n![[media/1_photo_2.jpg]]" in (
+            content
+        )
+        media = tmp_path / "media"
+        assert os.path.samefile(media / "1_photo_2.jpg", media / "2_photo.jpg")
+        assert exporter.index.get(1).media_files == ["media/1_photo.jpg", "media/1_photo_2.jpg"]
+
+    def test_links_keep_the_object_extension(self, tmp_path):
+        """Test that a PNG is linked under a .png name, and moves with it on migration."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.photos.add_bytes("p1", b"jpeg one")
+        exporter.photos.add_bytes("p2", b"png two", suffix=".png")
+
+        path = exporter.export_activity(activity(1, [
+            ActivityPhoto("p1", "https://example.com/1.jpg"),
+            ActivityPhoto("p2", "https://example.com/2.png"),
+        ]))
+
+        assert "![[media/1_photo_2.png]]" in path.read_text()
+        assert (tmp_path / "media" / "1_photo_2.png").read_bytes() == b"png two"
+        assert FLAT.relocate_media(YEAR, 1, "media/1_photo_2.png") == (
+            "media/photos/1/002_photo.png"
+        )
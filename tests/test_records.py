@@ -0,0 +1,102 @@
+"""Tests for personal records."""
+
+from datetime import datetime
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.records import PersonalRecords, RecordsHook, fastest_effort
+from strava_to_obsidian.streams import ActivityStreams
+
+
+def run(activity_id: int, five_k: int, day: int = 1) -> Activity:
+    """A run with a 5K best effort as reported by Strava."""
+    return Activity(
+        id=activity_id,
+        name=f"Run {activity_id}",
+        sport_type="Run",
+        start_date_local=datetime(2025, 4, day, 7, 0, 0),
+        distance=5000,
+        raw_data={"best_efforts": [{"name": "5k", "elapsed_time": five_k}]},
+    )
+
+
+class TestFastestEffort:
+    """Tests for best efforts computed from streams."""
+
+    def test_finds_fastest_window(self):
+        """Test that the fastest stretch is found anywhere in the activity."""
+        # 4 m/s for 500 s, then 5 m/s for 400 s
+        time = list(range(901))
+        distance = [4.0 * t if t <= 500 else 2000 + 5.0 * (t - 500) for t in time]
+        streams = ActivityStreams.from_api_response({"time": time, "distance": distance})
+
+        assert fastest_effort(streams, 1000) == 200
+        assert fastest_effort(streams, 10000) is None
+
+
+class TestPersonalRecords:
+    """Tests for the incremental records state."""
+
+    def test_ranking_and_change_detection(self, tmp_path):
+        """Test that only results entering the top three count as changes."""
+        records = PersonalRecords(tmp_path / "records.json")
+        assert records.update(run(1, 1500), "run-1")
+        assert records.update(run(2, 1400), "run-2")
+        assert records.update(run(3, 1600), "run-3")
+        assert not records.update(run(4, 1700), "run-4")
+
+        fastest = [e.activity_id for e in records.records["run_5k"][:3]]
+        assert fastest == [2, 1, 3]
+
+    def test_reexport_replaces_entry(self, tmp_path):
+        """Test that an activity exported again isn't ranked twice."""
+        records = PersonalRecords(tmp_path / "records.json")
+        records.update(run(1, 1500), "run-1")
+        records.update(run(1, 1450), "run-1")
+
+        assert [e.value for e in records.records["run_5k"]] == [1450]
+
+    def test_hook_rewrites_note_only_on_change(self, tmp_path):
+        """Test that the note is written on change and left alone otherwise."""
+        note = tmp_path / "Personal Records.md"
+        hook = RecordsHook(tmp_path / "records.json", note)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        exporter.export_activity(run(1, 1500))
+        exporter.flush()
+
+        content = note.read_text()
+        assert "## Fastest 5K" in content
+        assert "| 1 | 25:00 | 2025-04-01 | [[2025-04-01-run-1-1\\|Run 1]] |" in content
+
+        note.write_text("untouched")
+        hook = RecordsHook(tmp_path / "records.json", note)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        for i in range(2, 6):
+            exporter.export_activity(run(i, 2000 + i, day=i))
+        exporter.flush()
+        assert note.read_text() != "untouched"
+
+        note.write_text("untouched")
+        hook = RecordsHook(tmp_path / "records.json", note)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        exporter.export_activity(run(9, 3000, day=9))
+        exporter.flush()
+        assert note.read_text() == "untouched"
+
+    def test_deleted_activity_leaves_records(self, tmp_path):
+        """Test that deleting an activity lets the next best result move up."""
+        note = tmp_path / "Personal Records.md"
+        hook = RecordsHook(tmp_path / "records.json", note)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        for i in range(1, 5):
+            exporter.export_activity(run(i, 1400 + 100 * i, day=i))
+        exporter.flush()
+
+        exporter.delete_activity(1)
+        exporter.flush()
+
+        reloaded = PersonalRecords(tmp_path / "records.json")
+        assert [e.activity_id for e in reloaded.records["run_5k"]] == [2, 3, 4]
+        content = note.read_text()
+        assert "Run 1]]" not in content
+        assert "| 3 | 30:00 | 2025-04-04 |" in content
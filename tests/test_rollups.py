@@ -0,0 +1,90 @@
+"""Tests for the metrics store and rollup notes."""
+
+from datetime import date, datetime
+
+from strava_to_obsidian.columnar import MetricsStore, backfill_metrics
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.rollups import RollupHook, month_key, period_bounds, week_key
+
+
+def activity(activity_id: int, day: date, sport: str = "Run", km: float = 5) -> Activity:
+    """A minimal activity on a given day."""
+    return Activity(
+        id=activity_id,
+        name=f"{sport} {activity_id}",
+        sport_type=sport,
+        start_date_local=datetime(day.year, day.month, day.day, 7, 0, 0),
+        distance=km * 1000,
+        moving_time=int(km * 300),
+        elapsed_time=int(km * 320),
+        total_elevation_gain=km * 10,
+    )
+
+
+class TestMetricsStore:
+    """Tests for the columnar metrics store."""
+
+    def test_round_trip_and_upsert(self, tmp_path):
+        """Test that rows persist and re-exports replace rather than append."""
+        store = MetricsStore(tmp_path / "metrics.bin")
+        store.add_activity(activity(1, date(2025, 4, 1)))
+        store.add_activity(activity(2, date(2025, 4, 2), "Ride", 30))
+        store.add_activity(activity(1, date(2025, 4, 1), km=6))
+        store.save()
+
+        reloaded = MetricsStore(tmp_path / "metrics.bin")
+        assert len(reloaded) == 2
+        assert list(reloaded.columns["distance"]) == [6000, 30000]
+        assert [reloaded.sports[c] for c in reloaded.columns["sport"]] == ["Run", "Ride"]
+        assert 2 in reloaded
+
+    def test_backfill_from_notes(self, tmp_path):
+        """Test filling the store from notes exported before it existed."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.export_activity(activity(1, date(2025, 4, 1), km=10))
+        exporter.index.save()
+
+        store = MetricsStore(tmp_path / "fresh.bin")
+        assert backfill_metrics(store, tmp_path, ActivityIndex.load(tmp_path)) == 1
+        assert store.columns["distance"][0] == 10000
+        assert store.columns["moving_time"][0] == 3000
+
+
+class TestRollups:
+    """Tests for weekly and monthly rollup notes."""
+
+    def test_period_keys(self):
+        """Test ISO week and month keys and their bounds."""
+        assert week_key(date(2025, 4, 1)) == "2025-W14"
+        assert month_key(date(2025, 4, 1)) == "2025-04"
+        assert period_bounds("2025-W14") == (date(2025, 3, 31), date(2025, 4, 6))
+        assert period_bounds("2024-12") == (date(2024, 12, 1), date(2024, 12, 31))
+
+    def test_only_touched_periods_rewritten(self, tmp_path):
+        """Test that a run rewrites the periods of the activities it exported."""
+        rollups = tmp_path / "rollups"
+        exporter = ActivityExporter(tmp_path)
+        exporter.hooks.append(RollupHook(rollups, exporter.metrics, exporter.index))
+        exporter.export_activity(activity(1, date(2025, 4, 1)))
+        exporter.export_activity(activity(2, date(2025, 4, 3), "Ride", 20))
+        exporter.export_activity(activity(3, date(2025, 5, 20)))
+        exporter.flush()
+
+        week = (rollups / "2025-W14.md").read_text()
+        assert "activities: 2" in week
+        assert "| 🚴 Ride | 1 | 20.0 km" in week
+        assert "[[2025-04-01-run-1-1]]" in week
+        assert {p.name for p in rollups.iterdir()} == {
+            "2025-W14.md", "2025-W21.md", "2025-04.md", "2025-05.md",
+        }
+
+        (rollups / "2025-05.md").write_text("untouched")
+        exporter = ActivityExporter(tmp_path)
+        exporter.hooks.append(RollupHook(rollups, exporter.metrics, exporter.index))
+        exporter.export_activity(activity(4, date(2025, 4, 2)), force=True)
+        exporter.flush()
+
+        assert "activities: 3" in (rollups / "2025-04.md").read_text()
+        assert (rollups / "2025-05.md").read_text() == "untouched"
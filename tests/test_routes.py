@@ -0,0 +1,113 @@
+"""Tests for route recognition."""
+
+import math
+import random
+from datetime import datetime
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.polyline import decode_polyline, encode_polyline
+from strava_to_obsidian.routes import RouteHook, RouteStore, minhash, route_cells, similarity
+
+
+def loop(lat: float, lng: float, radius_deg: float, points: int = 120, jitter: float = 0.0,
+         seed: int = 0) -> str:
+    """An encoded circular route, optionally with GPS noise (in degrees)."""
+    rng = random.Random(seed)
+    lats, lngs = [], []
+    for i in range(points + 1):
+        angle = 2 * math.pi * i / points
+        lats.append(lat + radius_deg * math.sin(angle) + rng.uniform(-jitter, jitter))
+        lngs.append(lng + radius_deg * 1.6 * math.cos(angle) + rng.uniform(-jitter, jitter))
+    return encode_polyline(lats, lngs)
+
+
+def activity(activity_id: int, polyline: str, moving_time: int = 1800) -> Activity:
+    """A minimal run along a polyline."""
+    return Activity(
+        id=activity_id,
+        name=f"Run {activity_id}",
+        sport_type="Run",
+        start_date_local=datetime(2025, 4, activity_id, 7, 0, 0),
+        distance=6000,
+        moving_time=moving_time,
+        summary_polyline=polyline,
+    )
+
+
+PARK = loop(51.50, -0.16, 0.01)
+
+
+class TestFingerprints:
+    """Tests for route fingerprints."""
+
+    def test_noisy_and_sparse_recordings_match(self):
+        """Test that recordings of the same loop have similar signatures."""
+        reference = minhash(route_cells(*decode_polyline(PARK))[0])
+        noisy = minhash(route_cells(*decode_polyline(loop(51.50, -0.16, 0.01, 400, 2e-4, 1)))[0])
+        sparse = minhash(route_cells(*decode_polyline(loop(51.50, -0.16, 0.01, 30)))[0])
+        elsewhere = minhash(route_cells(*decode_polyline(loop(51.52, -0.10, 0.01)))[0])
+
+        assert similarity(reference, noisy) >= 0.6
+        assert similarity(reference, sparse) >= 0.6
+        assert similarity(reference, elsewhere) < 0.2
+
+
+class TestRouteHook:
+    """Tests for assigning activities to routes during export."""
+
+    def test_repeated_route_gets_field_and_note(self, tmp_path):
+        """Test that the second run of a loop links both notes to a route note."""
+        store = RouteStore(tmp_path / ".strava" / "routes.json")
+        exporter = ActivityExporter(tmp_path)
+        exporter.hooks.append(RouteHook(store, tmp_path / "routes", exporter.index, tmp_path))
+
+        first = exporter.export_activity(activity(1, PARK, moving_time=1900))
+        other = exporter.export_activity(activity(2, loop(51.52, -0.10, 0.01)))
+        second = exporter.export_activity(
+            activity(3, loop(51.50, -0.16, 0.01, 200, 0.0001, 2), moving_time=1800)
+        )
+        exporter.flush()
+
+        assert 'route: "[[Route 1]]"\ntags:' in first.read_text()
+        assert 'route: "[[Route 1]]"' in second.read_text()
+        assert "route:" not in other.read_text()
+
+        note = (tmp_path / "routes" / "Route 1.md").read_text()
+        assert "activities: 2\n" in note
+        history = note[note.index("## History"):]
+        assert history.index("2025-04-03") < history.index("2025-04-01")  # newest first
+        assert "| 30:00 🏆 | 5:00 /km |" in note
+        assert not (tmp_path / "routes" / "Route 2.md").exists()
+
+    def test_deleted_activity_leaves_route_history(self, tmp_path):
+        """Test that deleting an activity drops it from the route note and store."""
+        store = RouteStore(tmp_path / ".strava" / "routes.json")
+        exporter = ActivityExporter(tmp_path)
+        exporter.hooks.append(RouteHook(store, tmp_path / "routes", exporter.index, tmp_path))
+        for activity_id, moving_time in ((1, 1900), (3, 1800), (4, 2000)):
+            exporter.export_activity(activity(activity_id, PARK, moving_time=moving_time))
+        exporter.flush()
+
+        assert exporter.delete_activity(3)
+        exporter.flush()
+
+        note = (tmp_path / "routes" / "Route 1.md").read_text()
+        assert "activities: 2\n" in note
+        assert "2025-04-03" not in note and "Run 3" not in note
+        assert "| 31:40 🏆 |" in note
+        reloaded = RouteStore(tmp_path / ".strava" / "routes.json")
+        assert 3 not in reloaded.visits and reloaded.routes[1].activities == [1, 4]
+
+    def test_store_persists_assignments(self, tmp_path):
+        """Test that a reloaded store keeps routes and matches new activities."""
+        path = tmp_path / "routes.json"
+        store = RouteStore(path)
+        route = store.assign(activity(1, PARK))
+        store.add_visit(route, activity(1, PARK), "2025-04-01-run-1-1")
+        store.save()
+
+        reloaded = RouteStore(path)
+        assert reloaded.assign(activity(1, loop(51.52, -0.10, 0.01))).id == route.id
+        assert reloaded.assign(activity(5, loop(51.50, -0.16, 0.01, 60))).id == route.id
+        assert reloaded.assign(activity(6, encode_polyline([51.5, 51.5001], [0, 0]))) is None
@@ -0,0 +1,84 @@
+"""Tests for per-run metrics."""
+
+import json
+import os
+from datetime import datetime
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.runmetrics import RunMetrics, metrics_format, write_metrics
+from strava_to_obsidian.timing import PhaseTimer
+
+
+def sample_metrics(exported: int = 3) -> RunMetrics:
+    """Metrics of a sync run that made a few API requests."""
+    timer = PhaseTimer()
+    for seconds in (0.2, 0.3, 0.4):
+        timer.add("api.request", seconds)
+    return RunMetrics(
+        command="sync",
+        finished_at=1_750_000_000.5,
+        duration_seconds=2.5,
+        exported=exported,
+        skipped=10,
+        unchanged=1,
+        api_requests=4,
+        remaining_15min=96,
+        remaining_daily=950,
+        media_bytes=123_456,
+        phases=timer.stats(),
+    )
+
+
+class TestRunMetrics:
+    """Tests for writing run metrics."""
+
+    def test_jsonl_appends_one_line_per_run(self, tmp_path):
+        """Test that each run appends a JSON object with its counts and phases."""
+        path = tmp_path / "metrics.jsonl"
+        write_metrics(path, sample_metrics(3))
+        write_metrics(path, sample_metrics(0))
+
+        runs = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [run["exported"] for run in runs] == [3, 0]
+        assert runs[0]["remaining_daily"] == 950 and runs[0]["media_bytes"] == 123_456
+        assert runs[0]["phases"]["api.request"]["count"] == 3
+        assert runs[0]["phases"]["api.request"]["p95"] == 0.4
+
+    def test_prometheus_textfile_holds_the_latest_run(self, tmp_path):
+        """Test that the textfile is replaced, with a gauge per field and phase."""
+        path = tmp_path / "strava.prom"
+        assert metrics_format(path) == "prometheus"
+        write_metrics(path, sample_metrics(3))
+        write_metrics(path, sample_metrics(5))
+
+        lines = path.read_text().splitlines()
+        assert 'strava_to_obsidian_exported{command="sync"} 5' in lines
+        assert 'strava_to_obsidian_exported{command="sync"} 3' not in lines
+        assert "# TYPE strava_to_obsidian_remaining_15min gauge" in lines
+        assert 'strava_to_obsidian_success{command="sync"} 1' in lines
+        assert 'strava_to_obsidian_last_run_timestamp_seconds{command="sync"} 1750000000.5' in lines
+        assert 'strava_to_obsidian_phase_calls{command="sync",phase="api.request"} 3' in lines
+        assert [p.name for p in tmp_path.iterdir()] == ["strava.prom"]
+
+
+class TestUnchangedNotes:
+    """Tests for counting notes a forced re-export leaves as they were."""
+
+    def test_identical_note_is_not_rewritten(self, tmp_path):
+        """Test that re-rendering an identical note leaves the file alone."""
+        activity = Activity(
+            id=1, name="Run", sport_type="Run", start_date_local=datetime(2025, 6, 1, 7, 0)
+        )
+        exporter = ActivityExporter(tmp_path)
+        path = exporter.export_activity(activity)
+        os.utime(path, (0, 0))
+
+        assert exporter.export_activity(activity, force=True) == path
+        assert exporter.unchanged == 1
+        assert path.stat().st_mtime == 0
+
+        activity.name = "Evening Run"
+        exporter.export_activity(activity, force=True)
+        assert exporter.unchanged == 1
+        assert "Evening Run" in path.read_text()
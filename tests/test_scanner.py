@@ -0,0 +1,87 @@
+"""Tests for rebuilding the activity index from existing notes."""
+
+from datetime import datetime
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.index import ActivityIndex
+from strava_to_obsidian.layout import YEAR_MONTH
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.scanner import read_note_header, rebuild_index, scan_vault
+
+
+def make_activity(activity_id: int, name: str, day: int = 29) -> Activity:
+    """Create a minimal activity."""
+    return Activity(
+        id=activity_id,
+        name=name,
+        sport_type="Run",
+        start_date_local=datetime(2025, 11, day, 7, 30, 0),
+        distance=5000.0,
+    )
+
+
+class TestScanner:
+    """Tests for the vault scanner."""
+
+    def test_read_note_header(self, tmp_path):
+        """Test reading the ID and date from frontmatter."""
+        exporter = ActivityExporter(tmp_path)
+        path = exporter.export_activity(make_activity(42, "Morning Run"))
+
+        assert read_note_header(path) == (42, "2025-11-29")
+
+        other = tmp_path / "Journal.md"
+        other.write_text("# Not an activity\n")
+        assert read_note_header(other) is None
+
+    def test_scan_infers_layout(self, tmp_path):
+        """Test scanning a sharded vault that has no index."""
+        exporter = ActivityExporter(tmp_path, layout=YEAR_MONTH)
+        for i in range(1, 6):
+            exporter.export_activity(make_activity(i, f"Run {i}", day=i))
+        (tmp_path / "Journal.md").write_text("# Not an activity\n")
+
+        result = scan_vault(tmp_path)
+
+        assert result.layout == "year-month"
+        assert result.notes_scanned == 6
+        assert sorted(result.entries) == [1, 2, 3, 4, 5]
+        assert result.entries[3].file_path == "2025/2025-11/2025-11-03-run-3-3.md"
+
+    def test_empty_vault_keeps_requested_layout(self, tmp_path):
+        """Test that an existing directory without notes doesn't force the flat layout."""
+        exporter = ActivityExporter(tmp_path, layout=YEAR_MONTH)
+        exporter.ensure_index()
+
+        assert exporter.layout.name == exporter.index.layout == "year-month"
+        path = exporter.export_activity(make_activity(1, "Run"))
+        assert path.parent == tmp_path / "2025" / "2025-11"
+
+    def test_renamed_activity_reuses_note(self, tmp_path):
+        """Test that a renamed activity updates its existing note."""
+        exporter = ActivityExporter(tmp_path)
+        original = exporter.export_activity(make_activity(42, "Morning Run"))
+
+        # Fresh exporter over a vault without an index file
+        fresh = ActivityExporter(tmp_path)
+        assert not fresh.index.exists()
+        fresh.ensure_index()
+
+        renamed = make_activity(42, "Tempo Run")
+        assert fresh.activity_exists(renamed)
+        assert fresh.export_activity(renamed, force=True) == original
+        assert "Tempo Run" in original.read_text()
+        assert len(list(tmp_path.glob("*.md"))) == 1
+
+    def test_rebuild_reports_duplicates(self, tmp_path):
+        """Test that duplicate notes for one activity are reported."""
+        exporter = ActivityExporter(tmp_path)
+        first = exporter.export_activity(make_activity(42, "Morning Run"))
+        duplicate = tmp_path / make_activity(42, "Tempo Run").generate_filename()
+        duplicate.write_text(first.read_text())
+
+        index = ActivityIndex.load(tmp_path)
+        result = rebuild_index(tmp_path, index)
+
+        assert len(index) == 1
+        assert sorted(result.duplicates[42]) == sorted([first.name, duplicate.name])
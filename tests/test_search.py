@@ -0,0 +1,78 @@
+"""Tests for the full-text search index."""
+
+from datetime import datetime
+
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.search import SearchHook, SearchIndex
+
+
+def activity(activity_id: int, name: str, description: str = "", km: float = 5) -> Activity:
+    """A minimal run."""
+    return Activity(
+        id=activity_id,
+        name=name,
+        sport_type="Run",
+        start_date_local=datetime(2025, 4, activity_id, 7, 0, 0),
+        description=description,
+        distance=km * 1000,
+    )
+
+
+class TestSearch:
+    """Tests for indexing and searching."""
+
+    def test_export_updates_index(self, tmp_path):
+        """Test that exported notes are searchable, with filters."""
+        search_index = SearchIndex(tmp_path / "search.db")
+        exporter = ActivityExporter(tmp_path, hooks=[SearchHook(search_index, tmp_path)])
+        exporter.export_activity(activity(1, "Hill Repeats", "6x Cote de Montréal", km=8))
+        exporter.export_activity(activity(2, "Easy Run", "recovery after hills", km=5))
+        exporter.export_activity(activity(3, "Long Run", "river loop", km=21))
+        exporter.flush()
+
+        assert [r.strava_id for r in search_index.search("montreal")] == [1]
+        assert {r.strava_id for r in search_index.search("hill*")} == {1, 2}
+        assert [r.strava_id for r in search_index.search("hill*", min_distance=6000)] == [1]
+        assert [r.strava_id for r in search_index.search(
+            "run", after=datetime(2025, 4, 3))] == [3]
+        assert search_index.search("loop")[0].file_path == "2025-04-03-long-run-3.md"
+
+    def test_reexport_replaces_document(self, tmp_path):
+        """Test that re-exporting an activity doesn't duplicate it."""
+        search_index = SearchIndex(tmp_path / "search.db")
+        exporter = ActivityExporter(tmp_path, hooks=[SearchHook(search_index, tmp_path)])
+        exporter.export_activity(activity(1, "Tempo"))
+        exporter.flush()
+        exporter.export_activity(activity(1, "Threshold"), force=True)
+        exporter.flush()
+
+        assert len(search_index) == 1
+        assert search_index.search("tempo") == []
+        assert search_index.search("threshold")[0].strava_id == 1
+
+    def test_cli_builds_index_from_notes(self, tmp_path):
+        """Test that the first search indexes notes exported earlier."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.export_activity(activity(1, "Parkrun PB", 'new "best" time'))
+        exporter.flush()
+
+        result = CliRunner().invoke(main, ["search", "-o", str(tmp_path), "parkrun"])
+        assert result.exit_code == 0, result.output
+        assert "Parkrun PB" in result.output
+        assert "1 results" in result.output
+
+        # Text that isn't valid FTS5 syntax falls back to literal words
+        result = CliRunner().invoke(main, ["search", "-o", str(tmp_path), '"best'])
+        assert "Parkrun PB" in result.output
+
+    def test_cli_missing_output_dir(self, tmp_path):
+        """Test that searching a directory that doesn't exist fails without creating it."""
+        missing = tmp_path / "activities"
+        result = CliRunner().invoke(main, ["search", "-o", str(missing), "parkrun"])
+        assert result.exit_code == 1
+        assert "No activities" in result.output
+        assert not missing.exists()
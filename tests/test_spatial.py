@@ -0,0 +1,112 @@
+"""Tests for the spatial index and place tagging."""
+
+from datetime import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.spatial import (
+    Place,
+    PlaceFinder,
+    SpatialHook,
+    SpatialIndex,
+    distance_m,
+    load_places,
+)
+
+HOME = (51.5007, -0.1246)
+
+
+def activity(activity_id: int, start, end=None) -> Activity:
+    """A minimal activity between two points."""
+    return Activity(
+        id=activity_id,
+        name=f"Run {activity_id}",
+        sport_type="Run",
+        start_date_local=datetime(2025, 4, 1, 7, 0, 0),
+        start_latlng=list(start) if start else None,
+        end_latlng=list(end) if end else None,
+    )
+
+
+class TestSpatialIndex:
+    """Tests for radius queries."""
+
+    def test_near_start_and_end(self, tmp_path):
+        """Test that activities are found by whichever point is closer."""
+        index = SpatialIndex(tmp_path / "spatial.bin")
+        index.update(1, list(HOME), [51.6, -0.2])
+        index.update(2, [51.4, 0.0], [HOME[0] + 0.002, HOME[1]])  # ends ~220 m away
+        index.update(3, [51.51, -0.1246], None)  # ~1.1 km away
+        index.update(4, None, None)
+
+        matches = index.near(*HOME, radius=500)
+        assert [(m.activity_id, m.point) for m in matches] == [(1, "start"), (2, "end")]
+        assert matches[1].distance == pytest.approx(222, abs=2)
+        assert len(index.near(*HOME, radius=1500)) == 3
+
+    def test_update_moves_point_and_persists(self, tmp_path):
+        """Test replacing an activity's points and reloading the index."""
+        index = SpatialIndex(tmp_path / "spatial.bin")
+        index.update(1, list(HOME), None)
+        index.update(1, [48.8584, 2.2945], None)
+        index.save()
+
+        reloaded = SpatialIndex(tmp_path / "spatial.bin")
+        assert len(reloaded) == 1
+        assert reloaded.near(*HOME, radius=1000) == []
+        assert reloaded.near(48.8584, 2.2945, radius=10)[0].activity_id == 1
+
+
+class TestPlaces:
+    """Tests for place tagging."""
+
+    def test_load_and_find(self, tmp_path):
+        """Test reading a places CSV and matching points by radius."""
+        places_file = tmp_path / "places.csv"
+        places_file.write_text("name,lat,lon,radius\nWestminster,51.4995,-0.1248,300\n"
+                               "Hyde Park,51.5073,-0.1657,\n")
+        places = load_places(places_file)
+        assert places[1].radius == 1000
+
+        finder = PlaceFinder(places)
+        assert [p.name for p in finder.find(*HOME)] == ["Westminster"]
+        assert finder.find(51.6, -0.1) == []
+
+    def test_invalid_places_file(self, tmp_path):
+        """Test that a bad row is reported with its line number."""
+        places_file = tmp_path / "places.csv"
+        places_file.write_text("name,lat,lon\nSomewhere,north,0\n")
+        with pytest.raises(ValueError, match="places.csv:2"):
+            load_places(places_file)
+
+    def test_hook_tags_notes(self, tmp_path):
+        """Test that exported notes get places and tags, and are indexed."""
+        finder = PlaceFinder([
+            Place("Westminster", 51.4995, -0.1248, 300),
+            Place('Home: "The Flat" #2', 51.4995, -0.1248, 300),
+        ])
+        index = SpatialIndex(tmp_path / "spatial.bin")
+        exporter = ActivityExporter(tmp_path, hooks=[SpatialHook(index, finder)])
+        content = exporter.export_activity(activity(1, HOME, (51.6, -0.2))).read_text()
+        exporter.flush()
+
+        assert 'places:\n  - "Westminster"\n  - "Home: \\"The Flat\\" #2"\n' in content
+        assert "  - place/westminster\n" in content
+        assert "end_coordinates:\n  - 51.600000\n" in content
+        assert distance_m(*HOME, 51.4995, -0.1248) < 300
+        assert (tmp_path / "spatial.bin").exists()
+
+    def test_near_command_backfills(self, tmp_path):
+        """Test that 'near' indexes notes exported before the index existed."""
+        exporter = ActivityExporter(tmp_path)
+        exporter.export_activity(activity(7, HOME))
+        exporter.flush()
+
+        result = CliRunner().invoke(main, ["near", "-o", str(tmp_path), "51.5010,-0.1246"])
+        assert result.exit_code == 0, result.output
+        assert "start  2025-04-01-run-7-7.md" in result.output
+        assert "1 activities within 500 m" in result.output
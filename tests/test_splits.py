@@ -0,0 +1,77 @@
+"""Tests for stream-based splits."""
+
+from datetime import datetime
+
+from strava_to_obsidian.exporter import generate_markdown
+from strava_to_obsidian.models import Activity, Lap
+from strava_to_obsidian.splits import KM, MILE, compute_splits
+from strava_to_obsidian.streams import ActivityStreams
+
+
+def steady_run(seconds: int, speed: float = 4.0) -> ActivityStreams:
+    """Streams for a run at constant speed on a steady 1% climb."""
+    return ActivityStreams.from_api_response({
+        "time": list(range(seconds + 1)),
+        "distance": [speed * t for t in range(seconds + 1)],
+        "altitude": [100.0 + speed * t / 100 for t in range(seconds + 1)],
+        "heartrate": [150] * (seconds + 1),
+    })
+
+
+class TestSplits:
+    """Tests for split computation."""
+
+    def test_km_splits(self):
+        """Test full kilometre splits."""
+        splits = compute_splits(steady_run(1250), KM)
+
+        assert len(splits) == 5
+        assert [s.elapsed_time for s in splits] == [250] * 5
+        assert all(abs(s.average_speed - 4.0) < 1e-6 for s in splits)
+        assert all(abs(s.average_heartrate - 150) < 1e-6 for s in splits)
+        assert all(abs(s.total_elevation_gain - 10.0) < 1e-3 for s in splits)
+        assert splits[0].pace_per_km == "4:10"
+
+    def test_mile_splits_with_partial(self):
+        """Test that a trailing partial mile becomes its own split."""
+        splits = compute_splits(steady_run(1250), MILE)
+
+        assert len(splits) == 4
+        assert abs(splits[-1].distance - (5000 - 3 * MILE)) < 1e-3
+
+    def test_missing_streams(self):
+        """Test that splits need distance and time."""
+        streams = ActivityStreams.from_api_response({"heartrate": [150, 151]})
+        assert compute_splits(streams, KM) == []
+
+    def test_markdown_renders_splits(self):
+        """Test that splits replace an empty Laps section."""
+        activity = Activity(
+            id=42,
+            name="Morning Run",
+            sport_type="Run",
+            start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+            distance=5000.0,
+            streams=steady_run(1250),
+        )
+        markdown = generate_markdown(activity)
+
+        assert "## Laps" not in markdown
+        assert "## Splits (mi)" in markdown
+        assert "## Splits (km)" in markdown
+        assert "| 1 | 1.00 km | 4:10 | 4:10/km | 150 | +10 m |" in markdown
+
+    def test_markdown_falls_back_to_laps(self):
+        """Test that the API lap stays when the streams can't be split."""
+        activity = Activity(
+            id=42,
+            name="Gym Session",
+            sport_type="Workout",
+            start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+            laps=[Lap(lap_index=1, distance=0.0, elapsed_time=1800, average_speed=0.0)],
+            streams=ActivityStreams.from_api_response({"heartrate": [120, 130]}),
+        )
+        markdown = generate_markdown(activity)
+
+        assert "## Laps" in markdown
+        assert "## Splits" not in markdown
@@ -0,0 +1,53 @@
+"""Tests for archive statistics."""
+
+from datetime import date, timedelta
+
+from strava_to_obsidian.columnar import MetricsStore
+from strava_to_obsidian.stats import compute_stats
+
+
+def store_with(tmp_path, rows: list[tuple[date, str, float]]) -> MetricsStore:
+    """A metrics store holding (day, sport, km) rows."""
+    store = MetricsStore(tmp_path / "metrics.bin")
+    for i, (day, sport, km) in enumerate(rows, start=1):
+        store.upsert(i, day, sport, km * 1000, int(km * 300), int(km * 320), km * 5)
+    return store
+
+
+class TestStats:
+    """Tests for compute_stats."""
+
+    def test_totals_histogram_and_weekday(self, tmp_path):
+        """Test grouping by sport and year, distance bins and weekdays."""
+        store = store_with(tmp_path, [
+            (date(2024, 12, 28), "Run", 3),  # Saturday
+            (date(2025, 1, 4), "Run", 12),  # Saturday
+            (date(2025, 1, 6), "Ride", 120),  # Monday
+        ])
+        stats = compute_stats(store, today=date(2025, 2, 1))
+
+        assert stats.total.count == 3
+        assert stats.by_sport["Run"].count == 2
+        assert stats.by_sport["Ride"].distance == 120_000
+        assert {year: t.count for year, t in stats.by_year.items()} == {2024: 1, 2025: 2}
+        assert stats.distance_histogram == [1, 0, 1, 0, 0, 1]
+        assert stats.most_active_weekday == "Saturday"
+
+    def test_streaks(self, tmp_path):
+        """Test longest and current streaks of consecutive days."""
+        start = date(2025, 3, 1)
+        days = [start + timedelta(days=i) for i in (0, 1, 2, 3, 10, 11, 11, 20, 21)]
+        store = store_with(tmp_path, [(day, "Run", 5) for day in days])
+
+        stats = compute_stats(store, today=date(2025, 3, 23))
+        assert stats.longest_streak == 4
+        assert stats.longest_streak_end == date(2025, 3, 4)
+        assert stats.current_streak == 2
+
+        assert compute_stats(store, today=date(2025, 4, 1)).current_streak == 0
+
+    def test_empty_store(self, tmp_path):
+        """Test statistics for an archive with nothing exported."""
+        stats = compute_stats(MetricsStore(tmp_path / "metrics.bin"))
+        assert stats.total.count == 0
+        assert stats.most_active_weekday is None
@@ -0,0 +1,52 @@
+"""Tests for stream storage."""
+
+from strava_to_obsidian.streams import ActivityStreams, StreamStore
+
+
+def sample_response(points: int) -> dict:
+    """Build a key_by_type streams response."""
+    return {
+        "time": {"data": list(range(points))},
+        "distance": {"data": [i * 3.1 for i in range(points)]},
+        "altitude": {"data": [100.0 + (i % 50) for i in range(points)]},
+        "heartrate": {"data": [140 + (i % 20) for i in range(points)]},
+        "watts": {"data": [None if i % 10 == 0 else 200 for i in range(points)]},
+        "latlng": {"data": [[47.6062 + i * 1e-5, -122.3321] for i in range(points)]},
+    }
+
+
+class TestStreams:
+    """Tests for stream conversion and storage."""
+
+    def test_from_api_response(self):
+        """Test converting API streams to typed channels."""
+        streams = ActivityStreams.from_api_response(sample_response(10))
+
+        assert len(streams) == 10
+        assert streams["heartrate"][3] == 143
+        assert streams["watts"][0] == 0  # null gap
+        assert "cadence" not in streams
+        lat, lng = streams.latlng()[1]
+        assert abs(lat - 47.60621) < 1e-7
+        assert abs(lng + 122.3321) < 1e-7
+
+    def test_roundtrip_memory_mapped(self, tmp_path):
+        """Test saving and memory-mapping streams."""
+        store = StreamStore(tmp_path)
+        original = ActivityStreams.from_api_response(sample_response(20000))
+        path = store.save(42, original)
+
+        loaded = store.load(42)
+
+        assert loaded is not None
+        assert isinstance(loaded["time"], memoryview)
+        assert len(loaded) == 20000
+        assert list(loaded["time"][-3:]) == [19997, 19998, 19999]
+        assert abs(loaded["distance"][100] - 310.0) < 1e-3
+        assert loaded.latlng()[5] == original.latlng()[5]
+        # 6 stored channels at 20k points stays in the hundreds of KB
+        assert path.stat().st_size < 500_000
+
+    def test_load_missing(self, tmp_path):
+        """Test loading streams that were never stored."""
+        assert StreamStore(tmp_path).load(1) is None
@@ -0,0 +1,85 @@
+"""Tests for tabular export."""
+
+import csv
+from datetime import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from strava_to_obsidian.cli import main
+from strava_to_obsidian.database import DB_FILENAME, ActivityDatabase
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.layout import DATA_DIRNAME
+from strava_to_obsidian.models import Activity, Lap
+from strava_to_obsidian.tables import ACTIVITY_TYPES, write_table
+
+
+def activity(activity_id: int) -> Activity:
+    """A minimal activity with two laps."""
+    return Activity(
+        id=activity_id,
+        name=f"Run, {activity_id}",
+        sport_type="Run",
+        start_date_local=datetime(2025, 4, activity_id, 7, 0, 0),
+        distance=5000.0,
+        moving_time=1500,
+        laps=[Lap(lap_index=i, distance=2500, elapsed_time=750, average_speed=3.3)
+              for i in (1, 2)],
+    )
+
+
+class TestExportTable:
+    """Tests for the export-table command."""
+
+    def test_csv_from_notes(self, tmp_path):
+        """Test writing the activity table from note frontmatter alone."""
+        exporter = ActivityExporter(tmp_path)
+        for i in (1, 2, 3):
+            exporter.export_activity(activity(i))
+        exporter.flush()
+
+        table = tmp_path / "out" / "activities.csv"
+        result = CliRunner().invoke(
+            main, ["export-table", "-o", str(tmp_path), "--file", str(table)]
+        )
+        assert result.exit_code == 0, result.output
+
+        with open(table, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 3
+        assert list(rows[0]) == list(ACTIVITY_TYPES)
+        assert {row["name"] for row in rows} == {"Run, 1", "Run, 2", "Run, 3"}
+        assert rows[0]["distance"] == "5000.0"
+
+    def test_laps_from_database(self, tmp_path):
+        """Test writing activities and laps from the database."""
+        database = ActivityDatabase(tmp_path / DATA_DIRNAME / DB_FILENAME)
+        for i in (1, 2):
+            database.add(activity(i))
+        database.close()
+
+        table = tmp_path / "activities.csv"
+        result = CliRunner().invoke(
+            main, ["export-table", "-o", str(tmp_path), "--file", str(table), "--laps"]
+        )
+        assert result.exit_code == 0, result.output
+
+        with open(tmp_path / "activities_laps.csv", newline="") as f:
+            laps = list(csv.reader(f))
+        assert laps[0][:2] == ["activity_id", "lap_index"]
+        assert len(laps) == 5
+
+    def test_parquet(self, tmp_path):
+        """Test typed Parquet output, or a clear error without pyarrow."""
+        rows = [(1, "Run 1", "Run", "2025-04-01T07:00:00") + (None,) * 12]
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            with pytest.raises(RuntimeError, match="pyarrow"):
+                write_table(tmp_path / "t.parquet", ACTIVITY_TYPES, rows)
+            return
+
+        assert write_table(tmp_path / "t.parquet", ACTIVITY_TYPES, rows) == 1
+        table = pq.read_table(tmp_path / "t.parquet")
+        assert table.schema.field("id").type == "int64"
+        assert table.column("name").to_pylist() == ["Run 1"]
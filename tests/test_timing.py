@@ -0,0 +1,75 @@
+"""Tests for per-phase timing and profiling."""
+
+import json
+from datetime import datetime
+
+from strava_to_obsidian.cli import instrumented
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.timing import PROFILE_FILENAME, PhaseTimer, timings
+
+
+class TestPhaseTimer:
+    """Tests for collecting and summarising phase timings."""
+
+    def test_percentiles(self):
+        """Test nearest-rank percentiles over recorded calls."""
+        timer = PhaseTimer()
+        for ms in range(1, 101):
+            timer.add("api.request", ms / 1000)
+        timer.add("render.markdown", 0.5)
+
+        slowest, fastest = timer.stats()
+        assert (slowest.phase, slowest.count) == ("api.request", 100)
+        assert round(slowest.total, 3) == 5.05
+        assert (slowest.p50, slowest.p95, slowest.p99) == (0.05, 0.095, 0.099)
+        assert fastest.p99 == 0.5
+
+    def test_decorator_and_context_manager(self):
+        """Test that both ways of timing record a call, even when it raises."""
+        timer = PhaseTimer()
+
+        @timer.timed("parse")
+        def parse(value: str) -> int:
+            return int(value)
+
+        assert parse("3") == 3
+        try:
+            parse("x")
+        except ValueError:
+            pass
+        with timer.phase("write"):
+            pass
+        assert {s.phase: s.count for s in timer.stats()} == {"parse": 2, "write": 1}
+
+
+class TestInstrumentedRun:
+    """Tests for the instrumentation around an export."""
+
+    def test_export_phases_json_and_profile(self, tmp_path, capsys):
+        """Test that an export's phases are summarised, written as JSON and profiled."""
+        exporter = ActivityExporter(tmp_path)
+        json_file = tmp_path / "timings.json"
+        with instrumented(exporter.data_dir, json_file, profile=True):
+            activity = Activity.from_api_response({
+                "id": 1,
+                "name": "Morning Run",
+                "sport_type": "Run",
+                "start_date_local": "2025-06-01T07:00:00Z",
+            })
+            exporter.export_activity(activity)
+            exporter.export_activity(
+                Activity(id=2, name="Swim", sport_type="Swim",
+                         start_date_local=datetime(2025, 6, 2, 7, 0, 0))
+            )
+            exporter.flush()
+
+        phases = {p["phase"]: p for p in json.loads(json_file.read_text())["phases"]}
+        assert phases["render.markdown"]["count"] == 2
+        assert phases["write.note"]["count"] == 2
+        assert phases["parse.activity"]["count"] == 1
+        assert {"p50", "p95", "p99", "total"} <= set(phases["write.note"])
+        assert (exporter.data_dir / PROFILE_FILENAME).exists()
+        output = capsys.readouterr().out
+        assert "render.markdown" in output and "cumulative" in output
+        timings.reset()
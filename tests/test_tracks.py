@@ -0,0 +1,85 @@
+"""Tests for GPX and TCX track files."""
+
+from datetime import datetime
+
+from strava_to_obsidian.archive import parse_track
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.streams import ActivityStreams
+from strava_to_obsidian.tracks import TrackWriter, has_track, track_path
+
+STREAMS = {
+    "time": [0, 10, 20, 30],
+    "latlng": [[51.5, -0.12], None, [51.501, -0.12], [51.502, -0.1205]],
+    "altitude": [10.0, 11.0, 12.5, 12.0],
+    "heartrate": [120, 125, 131, 0],
+    "watts": [150, 160, 0, 170],
+}
+
+
+def activity(activity_id: int, name: str = "Lunch Ride") -> Activity:
+    """A minimal ride with streams and a UTC start time."""
+    return Activity(
+        id=activity_id,
+        name=name,
+        sport_type="Ride",
+        start_date_local=datetime(2025, 5, activity_id, 13, 0, 0),
+        streams=ActivityStreams.from_api_response(STREAMS),
+        raw_data={"start_date": f"2025-05-{activity_id:02d}T12:00:00Z"},
+    )
+
+
+class TestTrackFiles:
+    """Tests for writing tracks from streams."""
+
+    def test_gpx_round_trip(self, tmp_path):
+        """Test that a written GPX reads back, leaving out GPS gaps."""
+        exporter = ActivityExporter(tmp_path, track_format="gpx")
+        note = exporter.export_activity(activity(1, name="Fish & Chips"))
+        exporter.export_activity(activity(2))
+        exporter.flush()
+
+        assert 'track: "[[media/tracks/1.gpx]]"' in note.read_text()
+        path = tmp_path / track_path(1)
+        content = path.read_text()
+        assert "<name>Fish &amp; Chips</name>" in content
+        assert "<time>2025-05-01T12:00:00Z</time>" in content
+        with open(path, "rb") as f:
+            parsed = parse_track(f)
+        assert list(parsed["time"]) == [0, 20, 30]
+        assert list(parsed["heartrate"]) == [120, 131, 0]
+        assert list(parsed["watts"]) == [150, 0, 170]
+        assert parsed.latlng()[-1] == (51.502, -0.1205)
+        assert (tmp_path / track_path(2)).exists()
+        assert "media/tracks/1.gpx" in exporter.index.get(1).media_files
+
+    def test_tcx_keeps_every_sample(self, tmp_path):
+        """Test that TCX keeps points without a position."""
+        exporter = ActivityExporter(tmp_path, track_format="tcx")
+        exporter.export_activity(activity(1))
+        exporter.flush()
+
+        content = (tmp_path / track_path(1, "tcx")).read_text()
+        assert '<Activity Sport="Biking">' in content
+        with open(tmp_path / track_path(1, "tcx"), "rb") as f:
+            parsed = parse_track(f)
+        assert list(parsed["time"]) == [0, 10, 20, 30]
+        assert list(parsed["watts"]) == [150, 160, 0, 170]
+        assert not has_track(ActivityStreams.from_api_response({"time": [0, 1]}), "gpx")
+
+    def test_unchanged_tracks_are_not_rewritten(self, tmp_path):
+        """Test that a track is only rewritten when its streams or fields change."""
+        exporter = ActivityExporter(tmp_path, track_format="gpx")
+        exporter.export_activity(activity(1))
+        exporter.flush()
+
+        writer = TrackWriter(tmp_path / ".strava" / "tracks.json")
+        streams_path = exporter.streams.path(1)
+        path = tmp_path / track_path(1)
+        assert not writer.queue(activity(1), streams_path, path)
+        assert writer.queue(activity(1, name="Renamed"), streams_path, path)
+
+        changed = activity(1)
+        changed.streams = ActivityStreams.from_api_response({**STREAMS, "heartrate": [1] * 4})
+        exporter.streams.save(1, changed.streams)
+        assert TrackWriter(tmp_path / ".strava" / "tracks.json").queue(changed, streams_path, path)
@@ -0,0 +1,136 @@
+"""Tests for heart-rate zones and training load."""
+
+from datetime import date, datetime
+
+import pytest
+
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.models import Activity
+from strava_to_obsidian.streams import ActivityStreams
+from strava_to_obsidian.training import (
+    HeartRateProfile,
+    TrainingLoad,
+    TrainingLoadHook,
+    time_in_zones,
+    trimp_from_streams,
+)
+
+PROFILE = HeartRateProfile(max_heartrate=200, resting_heartrate=50)
+
+
+def hr_streams(readings: list[int]) -> ActivityStreams:
+    """One reading per second."""
+    return ActivityStreams.from_api_response({
+        "time": list(range(len(readings))),
+        "heartrate": readings,
+    })
+
+
+class TestZones:
+    """Tests for zone and TRIMP computation."""
+
+    def test_time_in_zones(self):
+        """Test bucketing by percentage of max heart rate."""
+        # Zone bounds at 120/140/160/180 bpm; the first sample only marks the start
+        streams = hr_streams([0] + [100] * 10 + [130] * 20 + [0] * 5 + [185] * 30)
+
+        assert time_in_zones(streams, PROFILE) == [10, 20, 0, 0, 30]
+
+    def test_trimp_increases_with_intensity(self):
+        """Test that harder efforts score higher."""
+        easy = trimp_from_streams(hr_streams([120] * 3601), PROFILE)
+        hard = trimp_from_streams(hr_streams([170] * 3601), PROFILE)
+
+        assert 0 < easy < hard
+
+
+class TestTrainingLoad:
+    """Tests for the incremental ATL/CTL state."""
+
+    def test_out_of_order_matches_in_order(self, tmp_path):
+        """Test that adding an older activity later gives the same totals."""
+        in_order = TrainingLoad(tmp_path / "a.json")
+        in_order.update(1, date(2025, 4, 1), 100)
+        in_order.update(2, date(2025, 4, 5), 50)
+
+        reversed_ = TrainingLoad(tmp_path / "b.json")
+        assert reversed_.update(2, date(2025, 4, 5), 50)
+        assert not reversed_.update(1, date(2025, 4, 1), 100)
+
+        assert reversed_.atl == pytest.approx(in_order.atl)
+        assert reversed_.ctl == pytest.approx(in_order.ctl)
+
+    def test_reexport_replaces_load(self, tmp_path):
+        """Test that exporting an activity again doesn't double count it."""
+        state = TrainingLoad(tmp_path / "load.json")
+        state.update(1, date(2025, 4, 1), 100)
+        atl, ctl = state.atl, state.ctl
+        state.update(1, date(2025, 4, 1), 100)
+
+        assert state.atl == pytest.approx(atl)
+        assert state.ctl == pytest.approx(ctl)
+
+    def test_preview_matches_update(self, tmp_path):
+        """Test that previewing an activity's load gives the values update() then sets."""
+        state = TrainingLoad(tmp_path / "load.json")
+        state.update(1, date(2025, 4, 1), 100)
+        state.update(2, date(2025, 4, 3), 80)
+        preview = state.preview(2, date(2025, 4, 6), 60)
+        assert state.preview(3, date(2025, 4, 2), 60) is None
+
+        state.update(2, date(2025, 4, 6), 60)
+        assert preview == pytest.approx((state.atl, state.ctl))
+
+    def test_state_persists(self, tmp_path):
+        """Test saving and reloading the state."""
+        state = TrainingLoad(tmp_path / "load.json")
+        state.update(1, date(2025, 4, 1), 100)
+        state.save()
+
+        reloaded = TrainingLoad(tmp_path / "load.json")
+        assert reloaded.ctl == pytest.approx(state.ctl)
+        assert reloaded.loads == state.loads
+
+    def test_hook_adds_frontmatter(self, tmp_path):
+        """Test that exported notes get zones and load fields."""
+        hook = TrainingLoadHook(tmp_path / "load.json", PROFILE)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        activity = Activity(
+            id=42,
+            name="Morning Run",
+            sport_type="Run",
+            start_date_local=datetime(2025, 11, 29, 7, 30, 0),
+            streams=hr_streams([150] * 601),
+        )
+        content = exporter.export_activity(activity).read_text()
+        exporter.flush()
+
+        assert "trimp: " in content
+        assert "hr_zones:\n  - 0\n  - 0\n  - 600\n" in content
+        assert "ctl: " in content
+        assert "## Heart Rate Zones" in content
+        assert (tmp_path / "load.json").exists()
+
+    def test_deleted_activity_stops_counting(self, tmp_path):
+        """Test that deleting an activity takes its load back out."""
+        hook = TrainingLoadHook(tmp_path / "load.json", PROFILE)
+        exporter = ActivityExporter(tmp_path, hooks=[hook])
+        for activity_id, day in ((1, 1), (2, 3)):
+            exporter.export_activity(Activity(
+                id=activity_id,
+                name=f"Run {activity_id}",
+                sport_type="Run",
+                start_date_local=datetime(2025, 4, day, 7, 0, 0),
+                streams=hr_streams([150] * 601),
+            ))
+        only_first = TrainingLoad(tmp_path / "other.json")
+        only_first.update(1, date(2025, 4, 1), hook.state.loads["1"][1])
+        only_first.update(0, date(2025, 4, 3), 0)  # same reference day, no load
+
+        exporter.delete_activity(2)
+        exporter.flush()
+
+        reloaded = TrainingLoad(tmp_path / "load.json")
+        assert "2" not in reloaded.loads
+        assert reloaded.atl == pytest.approx(only_first.atl)
+        assert reloaded.ctl == pytest.approx(only_first.ctl)
@@ -0,0 +1,230 @@
+"""Tests for the webhook receiver and its event queue."""
+
+import json
+import os
+import signal
+import socket
+import threading
+import time
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from strava_to_obsidian import cli
+from strava_to_obsidian.api import StravaAPIError
+from strava_to_obsidian.cli import apply_webhook_work, main
+from strava_to_obsidian.exporter import ActivityExporter
+from strava_to_obsidian.webhook import (
+    EventQueue,
+    EventSimulator,
+    WebhookEvent,
+    make_server,
+    process_events,
+)
+
+
+def event(aspect_type: str, object_id: int, event_time: int) -> WebhookEvent:
+    """An activity event."""
+    return WebhookEvent("activity", object_id, aspect_type, event_time=event_time)
+
+
+class FakeClient:
+    """Serves activity details by ID and counts the requests made."""
+
+    def __init__(self, titles: dict[int, str]):
+        self.titles = titles
+        self.requests: list[int] = []
+
+    def get_athlete(self) -> dict:
+        return {"id": 7}
+
+    def get_activity_detail(self, activity_id: int) -> dict:
+        self.requests.append(activity_id)
+        if activity_id not in self.titles:
+            raise StravaAPIError("Resource not found.", 404)
+        return {
+            "id": activity_id,
+            "name": self.titles[activity_id],
+            "sport_type": "Ride",
+            "start_date_local": f"2025-06-{activity_id:02d}T18:00:00Z",
+        }
+
+
+@pytest.fixture
+def receiver(tmp_path):
+    """A running receiver on a free port and a simulator pointed at it."""
+    queue = EventQueue(tmp_path / "queue.json")
+    server = make_server(queue, "s3cret", port=0, owner_id=7)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield queue, EventSimulator(f"http://localhost:{server.server_port}/", owner_id=7)
+    server.shutdown()
+    server.server_close()
+
+
+class TestEventQueue:
+    """Tests for coalescing and keeping queued work."""
+
+    def test_coalescing_and_reload(self, tmp_path):
+        """Test that updates fold into one export, a delete wins, and stale events drop."""
+        queue = EventQueue(tmp_path / "queue.json")
+        for aspect, object_id, when in [
+            ("create", 1, 10), ("update", 1, 11), ("update", 1, 12),
+            ("update", 2, 20), ("delete", 2, 21),
+        ]:
+            assert queue.push(event(aspect, object_id, when))
+        assert not queue.push(event("update", 2, 19))  # arrived after the delete
+        assert not queue.push(WebhookEvent("athlete", 7, "update", updates={"authorized": "false"}))
+
+        reloaded = EventQueue(tmp_path / "queue.json")
+        assert len(reloaded) == 2
+        first = reloaded.next(timeout=0)
+        assert (first.activity_id, first.action, first.version) == (1, "export", 3)
+        assert reloaded.get(2).action == "delete"
+
+        # An update arriving while the work is being done keeps it queued
+        reloaded.push(event("update", 1, 13))
+        assert not reloaded.done(first)
+        assert reloaded.done(reloaded.next(timeout=0))
+        assert reloaded.next(timeout=0).activity_id == 2
+
+
+class TestReceiver:
+    """Tests for the HTTP receiver, driven by the event simulator."""
+
+    def test_validation_handshake(self, receiver):
+        """Test that the challenge is echoed only for the right verify token."""
+        _, simulator = receiver
+        assert simulator.validate("s3cret", challenge="abc123") == "abc123"
+        assert simulator.validate("wrong") is None
+
+    def test_events_are_queued(self, receiver):
+        """Test that posted events are queued and malformed ones rejected."""
+        queue, simulator = receiver
+        assert simulator.send("create", 5).json() == {"queued": True}
+        assert simulator.send("update", 5, {"title": "Commute"}).status_code == 200
+        assert simulator.send("archive", 5).status_code == 400
+        assert len(queue) == 1 and queue.get(5).version == 2
+
+    def test_other_athletes_are_ignored(self, receiver):
+        """Test that events for another athlete are acknowledged but not queued."""
+        queue, simulator = receiver
+        stranger = EventSimulator(simulator.url, owner_id=8)
+        response = stranger.send("create", 6)
+        assert response.status_code == 200 and response.json() == {"queued": False}
+        assert queue.get(6) is None
+
+
+class TestProcessing:
+    """Tests for turning queued events into fetches and re-renders."""
+
+    def test_create_update_delete(self, tmp_path, receiver):
+        """Test that each activity costs one detail fetch however many events it got."""
+        queue, simulator = receiver
+        exporter = ActivityExporter(tmp_path / "vault")
+        client = FakeClient({1: "Morning Ride", 2: "Evening Ride"})
+        simulator.send("create", 1)
+        simulator.send("create", 2)
+        simulator.send("update", 1, {"title": "Renamed"})
+        simulator.send("create", 3)  # deleted on Strava before it could be fetched
+
+        def run() -> int:
+            stop = threading.Event()
+            return process_events(
+                queue,
+                lambda work: apply_webhook_work(client, exporter, work),
+                stop,
+                on_idle=lambda: (exporter.flush(), stop.set()),
+            )
+
+        assert run() == 3
+        assert sorted(client.requests) == [1, 2, 3]
+        note = tmp_path / "vault" / exporter.index.get(1).file_path
+        assert "Morning Ride" in note.read_text()
+
+        client.titles[1] = "Renamed"
+        simulator.send("update", 1, {"title": "Renamed"})
+        simulator.send("delete", 2)
+        assert run() == 2
+        assert client.requests[3:] == [1]  # the delete needed no request
+        assert "Renamed" in note.read_text()
+        assert 2 not in exporter.index and 2 not in exporter.metrics and 1 in exporter.metrics
+        assert not list((tmp_path / "vault").glob("2025-06-02-*.md"))
+        assert 2 not in ActivityExporter(tmp_path / "vault").index
+
+    def test_failing_activity_does_not_block_the_rest(self, tmp_path):
+        """Test that an activity that keeps failing is deferred while the others go ahead."""
+        queue = EventQueue(tmp_path / "queue.json")
+        for object_id in (1, 2, 3):
+            queue.push(event("create", object_id, object_id))
+        applied, errors = [], []
+
+        def apply(work) -> None:
+            if work.activity_id == 1:
+                raise KeyError("start_date_local")
+            applied.append(work.activity_id)
+
+        stop = threading.Event()
+        done = process_events(
+            queue,
+            apply,
+            stop,
+            on_idle=stop.set,
+            on_error=lambda work, e: errors.append((work.activity_id, type(e))),
+            retry_delay=3600,
+        )
+        assert done == 2 and applied == [2, 3]
+        assert errors == [(1, KeyError)]
+        assert len(queue) == 1 and queue.next(timeout=0) is None  # still queued, held back
+
+
+
+class TestCommands:
+    """Tests for the webhook and simulate-event commands together."""
+
+    def test_simulated_event_is_exported(self, tmp_path, monkeypatch):
+        """Test that an event sent with simulate-event is exported by a running receiver."""
+        monkeypatch.chdir(tmp_path)
+        tokens = {"access_token": "a", "refresh_token": "r", "expires_at": 2**40}
+        (tmp_path / ".strava_tokens.json").write_text(json.dumps(tokens))
+        client = FakeClient({5: "Lunch Ride"})
+        monkeypatch.setattr(cli, "StravaClient", lambda config: client)
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        url = f"http://localhost:{port}/"
+        vault = tmp_path / "vault"
+
+        def simulate() -> None:
+            try:
+                for _ in range(100):
+                    try:
+                        requests.get(url, timeout=1)
+                        break
+                    except requests.ConnectionError:
+                        time.sleep(0.05)
+                for owner_id in ("8", "7"):
+                    main.main(
+                        ["simulate-event", "create", "5", "--url", url, "--owner-id", owner_id],
+                        standalone_mode=False,
+                    )
+                for _ in range(100):
+                    if list(vault.glob("*.md")):
+                        break
+                    time.sleep(0.05)
+            finally:
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        thread = threading.Thread(target=simulate, daemon=True)
+        thread.start()
+        result = CliRunner().invoke(
+            main, ["webhook", "-o", str(vault), "--port", str(port), "--verify-token", "s3cret"]
+        )
+        thread.join(timeout=10)
+
+        assert result.exit_code == 0, result.output
+        assert "for athlete 7" in result.output
+        assert '{"queued": false}' in result.output and '{"queued": true}' in result.output
+        assert client.requests == [5]
+        assert "Lunch Ride" in next(vault.glob("*.md")).read_text()